@@ -0,0 +1,798 @@
+"""
+Benchmarks for the BabyDuck compiler.
+
+Every benchmark works on synthetic programs from generate_program(), so the
+numbers scale with a single size knob. Run a single benchmark with
+`python BabyBenchmark.py <name> [statements]`, or all of them without args.
+"""
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Sequence, Tuple, Any
+
+
+def generate_program(statements: int = 2000, name: str = "bench") -> str:
+    """Build a BabyDuck program with roughly `statements` statements in main."""
+    lines = [
+        f"program {name};",
+        "var a, b, c, i: int; x, y: float;",
+        "void step(p: int, q: float) [",
+        "    var t: int;",
+        "    {",
+        "        t = p * 2 + (a - 1) / 3;",
+        "        y = q * 1.5 + t;",
+        "    }",
+        "];",
+        "main {",
+        "    a = 1; b = 2; c = 3; i = 0; x = 0.5; y = 1.0;",
+    ]
+    for k in range(statements):
+        kind = k % 5
+        if kind == 0:
+            lines.append(f"    a = (b + {k % 7}) * (c - b) / 7 + {k % 13};")
+        elif kind == 1:
+            lines.append(f"    x = x * 0.5 - (y + {k}.25) / 3;")
+        elif kind == 2:
+            lines.append(f"    if (a > {k % 50}) {{ b = b + 1; }} else {{ c = c - 1; }};")
+        elif kind == 3:
+            lines.append(f"    while (i < {k % 4}) do {{ i = i + 1; c = c + i; }};")
+        else:
+            lines.append(f"    step(a + {k}, x * 2);")
+    lines.append("    print(a, b, c, x, y);")
+    lines.append("}")
+    lines.append("end")
+    return "\n".join(lines)
+
+
+def measure(fn: Callable[[], Any]) -> Tuple[float, int, Any]:
+    """Run fn once and return (seconds, peak traced bytes, result)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def report(label: str, seconds: float, peak: int) -> None:
+    print(f"  {label:<28} {seconds * 1000:10.2f} ms  {peak / 1024 / 1024:8.2f} MiB peak")
+
+
+def compile_variant(program: Any, passes: Sequence[Callable[[Any], Any]] = (), name: str = "bench") -> Any:
+    """
+    Object file data for a parsed program, with passes run over its
+    QuadProgram between codegen and temp allocation.
+    """
+    from BabyInterpreter import BabyInterpreter
+    from MemoryManager import MemoryManager
+    from SymbolTable import SymbolTable
+    from TempAllocator import TempAllocator
+    from gen_obj import build_function_descriptors
+    from obj_format import ObjData, ObjectFileMetadata
+    from optimizer.program import QuadProgram
+
+    memory_manager = MemoryManager()
+    symbol_table = SymbolTable(memory_manager=memory_manager)
+    interpreter = BabyInterpreter(symbol_table, memory_manager=memory_manager)
+    interpreter.generate_quads(program)
+    quad_program = QuadProgram(interpreter.quads, symbol_table, memory_manager, interpreter.debug_info)
+    for optimization_pass in passes:
+        optimization_pass(quad_program)
+    TempAllocator(interpreter.quads, symbol_table.scopes).allocate()
+    return ObjData(ObjectFileMetadata(name, ""), memory_manager.constants,
+                   build_function_descriptors(symbol_table, memory_manager), interpreter.quads)
+
+
+def recorded(fn: Callable[[Any], Any], record: Dict[str, Any]) -> Callable[[Any], Any]:
+    """fn, storing its time and result in record as "seconds" and "result"; for passes given to compile_variant."""
+    def wrapper(quad_program: Any) -> Any:
+        start = time.perf_counter()
+        record["result"] = fn(quad_program)
+        record["seconds"] = time.perf_counter() - start
+        return record["result"]
+    return wrapper
+
+
+def run_variants(objects: Dict[str, Any], repeats: int = 3) -> Dict[str, Tuple[float, int, str]]:
+    """(best VM seconds, instructions executed, output) of every compiled variant, by label."""
+    import contextlib
+    import io
+    from BabyVirtualMachine import BabyVirtualMachine
+
+    results: Dict[str, Tuple[float, int, str]] = {}
+    # Interleaved, so drift on a busy machine hits both variants alike
+    for _ in range(repeats):
+        for label, obj_data in objects.items():
+            vm = BabyVirtualMachine(obj_data)
+            output = io.StringIO()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(output):
+                vm.run()
+            seconds = time.perf_counter() - start
+            if label in results:
+                seconds = min(seconds, results[label][0])
+            results[label] = (seconds, vm.instructions_executed, output.getvalue())
+    return results
+
+
+def report_variants(objects: Dict[str, Any], results: Dict[str, Tuple[float, int, str]]) -> None:
+    """One line per variant from run_variants(), and a warning if their outputs differ."""
+    for label, (seconds, executed, _) in results.items():
+        print(f"  {label:<28} {seconds * 1000:10.2f} ms  {len(objects[label].quads):8d} quads  "
+              f"{executed:10d} executed")
+    if len({output for _, _, output in results.values()}) != 1:
+        print("  outputs differ!")
+
+
+def bench_parse(statements: int) -> None:
+    """Parse tree + BabyTransformer pass against the inline (tree-less) parse."""
+    from BabyParser import get_parser
+    from BabyTransformer import BabyTransformer
+    from gen_obj import parse_program
+
+    source = generate_program(statements)
+    get_parser().parse("program warm; main { } end")
+    parse_program("program warm; main { } end")
+
+    print(f"parse ({statements} statements, {len(source)} chars)")
+    seconds, peak, _ = measure(lambda: BabyTransformer().transform(get_parser().parse(source)))
+    report("tree + transform", seconds, peak)
+    seconds, peak, _ = measure(lambda: parse_program(source, frontend="lark"))
+    report("inline transformer", seconds, peak)
+
+
+def bench_frontends(statements: int) -> None:
+    """Time every gen_obj frontend on the same source."""
+    from gen_obj import parse_program, FRONTENDS
+
+    source = generate_program(statements)
+    print(f"frontends ({statements} statements)")
+    for frontend in FRONTENDS:
+        try:
+            parse_program("program warm; main { } end", frontend=frontend)
+        except RuntimeError as e:
+            print(f"  {frontend:<28} skipped: {e}")
+            continue
+        seconds, peak, _ = measure(lambda: parse_program(source, frontend=frontend))
+        report(frontend, seconds, peak)
+
+
+def bench_ast(statements: int) -> None:
+    """Memory held by the Program tree of a large program."""
+    from BabyNativeParser import parse
+
+    source = generate_program(statements)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    program = parse(source)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"ast ({statements} statements)")
+    print(f"  {'Program tree':<28} {(after - before) / 1024 / 1024:10.2f} MiB retained")
+    del program
+
+
+def count_nodes(root: Any) -> int:
+    """Number of tree_nodes objects reachable from root."""
+    from dataclasses import fields, is_dataclass
+
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if is_dataclass(node):
+            count += 1
+            stack.extend(getattr(node, f.name) for f in fields(node))
+        elif isinstance(node, (list, tuple)):
+            stack.extend(node)
+    return count
+
+
+def bench_codegen(statements: int) -> None:
+    """Quad generation throughput in AST nodes per second."""
+    from BabyNativeParser import parse
+    from BabyInterpreter import BabyInterpreter
+    from MemoryManager import MemoryManager
+    from SymbolTable import SymbolTable
+
+    # Programs are compiled in chunks, the size earlier runs of this benchmark used
+    chunk = min(statements, 150)
+    programs = [parse(generate_program(chunk)) for _ in range(max(1, statements // chunk))]
+    nodes = sum(count_nodes(program) for program in programs)
+
+    # Best of a few passes, quad generation is short enough to be noisy
+    best = float("inf")
+    for _ in range(5):
+        quads = 0
+        elapsed = 0.0
+        for program in programs:
+            start = time.perf_counter()
+            memory_manager = MemoryManager()
+            interpreter = BabyInterpreter(SymbolTable(memory_manager=memory_manager), memory_manager=memory_manager)
+            interpreter.generate_quads(program)
+            elapsed += time.perf_counter() - start
+            quads += len(interpreter.quads)
+        best = min(best, elapsed)
+    elapsed = best
+
+    print(f"codegen ({statements} statements, {nodes} nodes, {quads} quads)")
+    print(f"  {'generate_quads':<28} {elapsed * 1000:10.2f} ms  {nodes / elapsed:12.0f} nodes/s")
+
+
+def generate_identifier_program(statements: int = 2000, variables: int = 40) -> str:
+    """Program whose expressions are almost all identifiers, split over main and a function."""
+    names = [f"v{k}" for k in range(variables)]
+    locals_ = [f"l{k}" for k in range(variables // 4)]
+    lines = [
+        "program idents;",
+        f"var {', '.join(names)}: int;",
+        f"void work(p: int, q: int) [",
+        f"    var {', '.join(locals_)}: int;",
+        "    {",
+    ]
+    for k in range(statements // 2):
+        a, b, c = names[k % variables], names[(k * 7) % variables], locals_[k % len(locals_)]
+        lines.append(f"        {c} = {a} + {b} * p - {c} / q + {names[(k * 3) % variables]};")
+    lines += ["    }", "];", "main {"]
+    for k in range(statements - statements // 2):
+        a, b, c = names[k % variables], names[(k * 5) % variables], names[(k * 11) % variables]
+        lines.append(f"    {a} = {b} * {c} + {a} - {names[(k * 13) % variables]};")
+    lines += ["}", "end"]
+    return "\n".join(lines)
+
+
+def bench_symbols(statements: int) -> None:
+    """Identifier resolution: raw SymbolTable lookups and codegen of an identifier-heavy program."""
+    from BabyNativeParser import parse
+    from BabyInterpreter import BabyInterpreter
+    from MemoryManager import MemoryManager
+    from SymbolTable import SymbolTable
+
+    # Chunked like bench_codegen, so the two stay comparable
+    chunk = min(statements, 200)
+    programs = [parse(generate_identifier_program(chunk)) for _ in range(max(1, statements // chunk))]
+
+    best_codegen = float("inf")
+    for _ in range(5):
+        elapsed = 0.0
+        for program in programs:
+            memory_manager = MemoryManager()
+            symbol_table = SymbolTable(memory_manager=memory_manager)
+            start = time.perf_counter()
+            BabyInterpreter(symbol_table, memory_manager=memory_manager).generate_quads(program)
+            elapsed += time.perf_counter() - start
+        best_codegen = min(best_codegen, elapsed)
+
+    # The same probe pattern as codegen: a declared check, then the lookup
+    queries = [(f"v{k % 40}", "work" if k % 3 else "global") for k in range(5000)]
+    queries += [(f"l{k % 10}", "work") for k in range(5000)]
+    best_lookup = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for name, scope_name in queries:
+            if symbol_table.is_symbol_declared(name, scope_name):
+                symbol_table.get_symbol(name, scope_name)
+        best_lookup = min(best_lookup, time.perf_counter() - start)
+
+    print(f"symbols ({statements} statements, {len(queries)} lookups)")
+    print(f"  {'generate_quads':<28} {best_codegen * 1000:10.2f} ms")
+    print(f"  {'declared + get_symbol':<28} {best_lookup * 1000:10.2f} ms  {len(queries) / best_lookup:12.0f} lookups/s")
+
+
+def bench_temps(statements: int) -> None:
+    """Temp slots per frame before and after TempAllocator, and the time the pass takes."""
+    from BabyNativeParser import parse
+    from BabyInterpreter import BabyInterpreter
+    from MemoryManager import MemoryManager
+    from SymbolTable import SymbolTable
+    from TempAllocator import TempAllocator
+    from custom_classes.memory import AllocCategory
+
+    memory_manager = MemoryManager()
+    symbol_table = SymbolTable(memory_manager=memory_manager)
+    interpreter = BabyInterpreter(symbol_table, memory_manager=memory_manager)
+    interpreter.generate_quads(parse(generate_program(statements)))
+    # Temps are counted by the scope that allocated them, which for call
+    # arguments is the callee, so the before column only adds up overall
+    temp_categories = (AllocCategory.TEMP_INT, AllocCategory.TEMP_FLOAT)
+    before = {
+        name: sum(counts.get(category, 0) for category in temp_categories)
+        for name, counts in memory_manager.size_per_local.items()
+    }
+    # Main's temps come straight from the global ranges
+    before["global"] = sum(
+        memory_manager.address_ranges[category].current - memory_manager.address_ranges[category].start
+        for category in temp_categories
+    )
+
+    start = time.perf_counter()
+    temp_counts = TempAllocator(interpreter.quads, symbol_table.scopes).allocate()
+    elapsed = time.perf_counter() - start
+
+    print(f"temps ({statements} statements, {len(interpreter.quads)} quads)")
+    print(f"  {'TempAllocator':<28} {elapsed * 1000:10.2f} ms")
+    for name in sorted(set(before) | set(temp_counts)):
+        after = sum(temp_counts.get(name, {}).values())
+        print(f"  {name:<28} {before.get(name, 0):10d} -> {after} temp slots")
+
+
+def bench_vm(statements: int) -> None:
+    """VM execution time of one large program, dominated by memory accesses."""
+    import contextlib
+    import io
+    from BabyNativeParser import parse
+    from BabyInterpreter import BabyInterpreter
+    from BabyVirtualMachine import BabyVirtualMachine
+    from MemoryManager import MemoryManager
+    from SymbolTable import SymbolTable
+    from TempAllocator import TempAllocator
+    from gen_obj import build_function_descriptors
+    from obj_format import ObjData, ObjectFileMetadata
+
+    memory_manager = MemoryManager()
+    symbol_table = SymbolTable(memory_manager=memory_manager)
+    interpreter = BabyInterpreter(symbol_table, memory_manager=memory_manager)
+    interpreter.generate_quads(parse(generate_program(statements)))
+    TempAllocator(interpreter.quads, symbol_table.scopes).allocate()
+    obj_data = ObjData(ObjectFileMetadata("bench", ""), memory_manager.constants,
+                       build_function_descriptors(symbol_table, memory_manager), interpreter.quads)
+
+    best = float("inf")
+    for _ in range(3):
+        vm = BabyVirtualMachine(obj_data)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            vm.run()
+        best = min(best, time.perf_counter() - start)
+
+    print(f"vm ({statements} statements, {len(interpreter.quads)} quads)")
+    print(f"  {'run':<28} {best * 1000:10.2f} ms")
+
+
+def generate_loop_program(iterations: int = 10000) -> str:
+    """Arithmetic-heavy loop where most operands are small literals."""
+    return "\n".join([
+        "program loop;",
+        "var i, s: int; x: float;",
+        "main {",
+        "    i = 0; s = 0; x = 0.5;",
+        f"    while (i < {iterations}) do {{",
+        "        s = s + i * 3 - (i - 2) / 4;",
+        "        x = x * 0.5 + 1.25 - 0.75 * 2;",
+        "        i = i + 1;",
+        "    };",
+        "    print(s, x);",
+        "}",
+        "end",
+    ])
+
+
+def bench_immediates(statements: int) -> None:
+    """VM time of a literal-heavy loop with inline immediates against the constant pool."""
+    import contextlib
+    import io
+    from BabyNativeParser import parse
+    from BabyInterpreter import BabyInterpreter
+    from BabyVirtualMachine import BabyVirtualMachine
+    from MemoryManager import MemoryManager
+    from SymbolTable import SymbolTable
+    from TempAllocator import TempAllocator
+    from gen_obj import build_function_descriptors
+    from obj_format import ObjData, ObjectFileMetadata
+
+    iterations = statements * 5
+    program = parse(generate_loop_program(iterations))
+    objects = {}
+    for label, use_immediates in (("constant pool", False), ("immediates", True)):
+        memory_manager = MemoryManager(use_immediates=use_immediates)
+        symbol_table = SymbolTable(memory_manager=memory_manager)
+        interpreter = BabyInterpreter(symbol_table, memory_manager=memory_manager)
+        interpreter.generate_quads(program)
+        TempAllocator(interpreter.quads, symbol_table.scopes).allocate()
+        objects[label] = ObjData(ObjectFileMetadata("loop", ""), memory_manager.constants,
+                                 build_function_descriptors(symbol_table, memory_manager), interpreter.quads)
+
+    # Interleaved, so drift on a busy machine hits both variants alike
+    best = {label: float("inf") for label in objects}
+    outputs = {}
+    for _ in range(3):
+        for label, obj_data in objects.items():
+            vm = BabyVirtualMachine(obj_data)
+            output = io.StringIO()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(output):
+                vm.run()
+            best[label] = min(best[label], time.perf_counter() - start)
+            outputs[label] = output.getvalue()
+
+    print(f"immediates ({iterations} iterations)")
+    for label, seconds in best.items():
+        print(f"  {label:<28} {seconds * 1000:10.2f} ms  {len(objects[label].constants):6d} pooled constants")
+    if len(set(outputs.values())) != 1:
+        print("  outputs differ!")
+
+
+def bench_load(statements: int) -> None:
+    """Object file size and load time of the binary format against a pickle of the same ObjData."""
+    import os
+    import pickle
+    import tempfile
+    from BabyNativeParser import parse
+    from BabyInterpreter import BabyInterpreter
+    from MemoryManager import MemoryManager
+    from SymbolTable import SymbolTable
+    from TempAllocator import TempAllocator
+    from gen_obj import build_function_descriptors, build_debug_symbols
+    from obj_format import ObjData, ObjectFileMetadata, write_obj, load_obj
+
+    memory_manager = MemoryManager()
+    symbol_table = SymbolTable(memory_manager=memory_manager)
+    interpreter = BabyInterpreter(symbol_table, memory_manager=memory_manager)
+    interpreter.generate_quads(parse(generate_program(statements)))
+    TempAllocator(interpreter.quads, symbol_table.scopes).allocate()
+    obj_data = ObjData(ObjectFileMetadata("bench", ""), memory_manager.constants,
+                       build_function_descriptors(symbol_table, memory_manager), interpreter.quads,
+                       interpreter.debug_info, build_debug_symbols(symbol_table))
+
+    def load_pickle(path):
+        with open(path, "rb") as file:
+            return pickle.load(file)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pickle_path = os.path.join(tmp_dir, "bench.pickle")
+        binary_path = os.path.join(tmp_dir, "bench.obj")
+        with open(pickle_path, "wb") as file:
+            pickle.dump(obj_data, file)
+        write_obj(binary_path, obj_data)
+
+        variants = {"pickle": (pickle_path, load_pickle), "binary": (binary_path, load_obj)}
+        best = {label: float("inf") for label in variants}
+        for _ in range(5):
+            for label, (path, load) in variants.items():
+                start = time.perf_counter()
+                load(path)
+                best[label] = min(best[label], time.perf_counter() - start)
+
+        print(f"load ({statements} statements, {len(interpreter.quads)} quads)")
+        for label, (path, _) in variants.items():
+            print(f"  {label:<28} {best[label] * 1000:10.2f} ms  {os.path.getsize(path) / 1024:10.1f} KiB")
+
+
+def generate_library_program(functions: int, statements: int = 40) -> str:
+    """Program with many functions of `statements` statements each, of which main only calls the first."""
+    lines = ["program library;", "var a, b: int; x: float;"]
+    for f in range(functions):
+        lines += [f"void f{f}(p: int, q: float) [", "    var t, u: int; w: float;", "    {"]
+        for k in range(statements):
+            lines.append(f"        t = p * {k} + (a - 1) / 3; w = q * 1.5 + t; if (t > {k}) {{ u = u + 1; }};")
+        lines += ["    }", "];"]
+    lines += ["main {", "    a = 1; b = 2; x = 0.5;", "    f0(a, x);", "    print(a, b, x);", "}", "end"]
+    return "\n".join(lines)
+
+
+def bench_lazy(statements: int) -> None:
+    """Time to run a program that calls one of its many functions, loading code sections lazily or all up front."""
+    import contextlib
+    import io
+    import os
+    import tempfile
+    from BabyVirtualMachine import BabyVirtualMachine
+    from gen_obj import gen_obj
+    from obj_format import load_obj
+
+    functions = max(statements // 10, 2)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, "library.baby"), "w") as source_file:
+            source_file.write(generate_library_program(functions))
+        with contextlib.redirect_stdout(io.StringIO()):
+            gen_obj(tmp_dir, "library.baby", output_path=tmp_dir, frontend="native", use_cache=False)
+        obj_path = os.path.join(tmp_dir, "library.obj")
+
+        def run(eager: bool):
+            obj_data = load_obj(obj_path)
+            if eager:
+                # Reading a full column joins every code section
+                obj_data.quads.op_vdir
+            with contextlib.redirect_stdout(io.StringIO()):
+                BabyVirtualMachine(obj_data).run()
+            return obj_data.quads
+
+        best = {"lazy": float("inf"), "eager": float("inf")}
+        for _ in range(5):
+            for label in best:
+                start = time.perf_counter()
+                quads = run(label == "eager")
+                best[label] = min(best[label], time.perf_counter() - start)
+                if label == "lazy":
+                    loaded = quads.loaded_segments
+
+        print(f"lazy ({functions} functions, {len(quads)} quads, {os.path.getsize(obj_path) / 1024:.1f} KiB)")
+        total = quads.loaded_segments
+        print(f"  {'lazy load + run':<28} {best['lazy'] * 1000:10.2f} ms  {loaded}/{total} code sections read")
+        print(f"  {'eager load + run':<28} {best['eager'] * 1000:10.2f} ms  {total}/{total} code sections read")
+
+
+def bench_listing(statements: int) -> None:
+    """Cost of the .ovejota listing against codegen, and gen_obj() with each --emit choice."""
+    import io
+    import os
+    import tempfile
+    from BabyNativeParser import parse
+    from BabyInterpreter import BabyInterpreter
+    from MemoryManager import MemoryManager
+    from SymbolTable import SymbolTable
+    from TempAllocator import TempAllocator
+    from gen_obj import gen_obj, write_listing
+
+    source = generate_program(statements)
+    program = parse(source)
+    best = {"codegen": float("inf"), "listing": float("inf")}
+    for _ in range(3):
+        start = time.perf_counter()
+        memory_manager = MemoryManager()
+        symbol_table = SymbolTable(memory_manager=memory_manager)
+        interpreter = BabyInterpreter(symbol_table, memory_manager=memory_manager)
+        interpreter.generate_quads(program)
+        TempAllocator(interpreter.quads, symbol_table.scopes).allocate()
+        best["codegen"] = min(best["codegen"], time.perf_counter() - start)
+
+        listing = io.StringIO()
+        start = time.perf_counter()
+        write_listing(listing, "bench", "", symbol_table, memory_manager, interpreter.quads)
+        best["listing"] = min(best["listing"], time.perf_counter() - start)
+
+    emits = {"obj,listing": ("obj", "listing"), "obj": ("obj",), "none": ()}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, "bench.baby"), "w") as source_file:
+            source_file.write(source)
+        for label, emit in emits.items():
+            seconds = float("inf")
+            for _ in range(3):
+                start = time.perf_counter()
+                gen_obj(tmp_dir, "bench.baby", output_path=tmp_dir, frontend="native", use_cache=False, emit=emit)
+                seconds = min(seconds, time.perf_counter() - start)
+            best[f"gen_obj --emit={label}"] = seconds
+
+    print(f"listing ({statements} statements, {len(interpreter.quads)} quads, {len(listing.getvalue()) / 1024:.1f} KiB)")
+    for label, seconds in best.items():
+        print(f"  {label:<28} {seconds * 1000:10.2f} ms")
+
+
+def generate_arithmetic_program(statements: int = 2000) -> str:
+    """Straight-line assignments and prints over literals, in the style of tests/arithmetic.baby."""
+    lines = [
+        "program arithmetic;",
+        "var a1, _b: int; c3, _d4: float;",
+        "main {",
+    ]
+    for k in range(statements):
+        kind = k % 4
+        if kind == 0:
+            lines.append(f"    a1 = ({k % 9} - 2) * 3 + {k % 5};")
+        elif kind == 1:
+            lines.append(f"    _b = a1 * 2 - (a1 + {k % 7}) / 2;")
+        elif kind == 2:
+            lines.append(f"    c3 = 2.0 + a1 * 0.5 - {k % 3}.25;")
+        else:
+            lines.append(f"    _d4 = c3 * 4 + _b; print(a1, _b, c3, _d4);")
+    lines.append("}")
+    lines.append("end")
+    return "\n".join(lines)
+
+
+def bench_fold(statements: int) -> None:
+    """Quads generated and executed with and without constant folding, and the VM time."""
+    from BabyNativeParser import parse
+    from optimizer.constants import fold_constants
+
+    programs = {
+        "arithmetic": generate_arithmetic_program(statements),
+        "loop": generate_loop_program(statements * 5),
+    }
+    for program_name, source in programs.items():
+        program = parse(source)
+        folding: Dict[str, Any] = {}
+        objects = {
+            "unfolded": compile_variant(program, (), program_name),
+            "folded": compile_variant(program, [recorded(fold_constants, folding)], program_name),
+        }
+        results = run_variants(objects)
+
+        print(f"fold {program_name} ({statements} statements, pass took {folding['seconds'] * 1000:.2f} ms)")
+        report_variants(objects, results)
+
+
+def generate_branchy_program(statements: int = 2000) -> str:
+    """Loops ending in nested if/else, whose jumps codegen chains through each other."""
+    lines = [
+        "program branchy;",
+        "var i, a, b: int;",
+        "main {",
+        "    a = 0; b = 0;",
+    ]
+    for k in range(statements // 4):
+        lines.append(f"    i = 0; while (i < {k % 5 + 2}) do {{ i = i + 1;")
+        lines.append(f"        if (i > 2) {{ if (a > {k % 3}) {{ a = a - 1; }} else {{ b = b + 1; }}; }}")
+        lines.append("        else { a = a + 2; }; };")
+    lines.append("    print(a, b);")
+    lines.append("}")
+    lines.append("end")
+    return "\n".join(lines)
+
+
+def bench_controlflow(statements: int) -> None:
+    """CFG build time, and blocks, quads and instructions run with and without jump threading."""
+    from BabyNativeParser import parse
+    from optimizer.cfg import ControlFlowGraph
+    from optimizer.controlflow import simplify_control_flow
+
+    def count_blocks(quad_program: Any) -> int:
+        return len(ControlFlowGraph(quad_program).blocks)
+
+    program = parse(generate_branchy_program(statements))
+    blocks: Dict[str, Dict[str, Any]] = {"as generated": {}, "simplified": {}}
+    simplifying: Dict[str, Any] = {}
+    objects = {
+        "as generated": compile_variant(program, [recorded(count_blocks, blocks["as generated"])], "branchy"),
+        "simplified": compile_variant(
+            program, [recorded(simplify_control_flow, simplifying), recorded(count_blocks, blocks["simplified"])],
+            "branchy"),
+    }
+    results = run_variants(objects)
+
+    cfg_seconds = min(record["seconds"] for record in blocks.values())
+    print(f"controlflow ({statements} statements, CFG built in {cfg_seconds * 1000:.2f} ms, "
+          f"pass took {simplifying['seconds'] * 1000:.2f} ms, "
+          f"{blocks['as generated']['result']} -> {blocks['simplified']['result']} blocks)")
+    report_variants(objects, results)
+
+
+def generate_common_program(iterations: int = 10000) -> str:
+    """Loop whose statements repeat the same subexpressions, like fibonacci.baby's a + b."""
+    return "\n".join([
+        "program common;",
+        "var i, a, b, c: int; x, y, z: float;",
+        "main {",
+        "    i = 0; a = 1; b = 2; c = 0; x = 0.5; y = 1.5; z = 0.0;",
+        f"    while (i < {iterations}) do {{",
+        "        c = (a + b) * (a + b) - (a + b) / 2;",
+        "        z = x * y + (x * y) / (a + b) - x * y;",
+        "        print(a + b, c, z, x * y);",
+        "        a = i - a; b = a * a + 2;",
+        "        i = i + 1;",
+        "    };",
+        "}",
+        "end",
+    ])
+
+
+def bench_numbering(statements: int) -> None:
+    """Quads removed and VM instructions saved by local value numbering, and the VM time."""
+    from BabyNativeParser import parse
+    from optimizer.numbering import number_values
+
+    iterations = statements
+    program = parse(generate_common_program(iterations))
+    objects = {
+        "as generated": compile_variant(program, (), "common"),
+        "value numbered": compile_variant(program, [number_values], "common"),
+    }
+    results = run_variants(objects)
+
+    before, after = objects["as generated"], objects["value numbered"]
+    print(f"numbering ({iterations} iterations, {len(before.quads) - len(after.quads)} quads removed, "
+          f"{results['as generated'][1] - results['value numbered'][1]} instructions saved)")
+    report_variants(objects, results)
+
+
+def generate_assignments_program(iterations: int = 10000) -> str:
+    """Loop of plain assignments, some of them overwritten before anything reads them."""
+    return "\n".join([
+        "program assignments;",
+        "var i, a, b, c: int; x: float;",
+        "main {",
+        "    i = 0; a = 1; b = 2; c = 0; x = 0.0;",
+        f"    while (i < {iterations}) do {{",
+        "        c = a * 2;",
+        "        x = a + 0.5;",
+        "        a = b - a; b = a + i;",
+        "        c = a + b; x = c * 1.5;",
+        "        print(c, x);",
+        "        i = i + 1;",
+        "    };",
+        "}",
+        "end",
+    ])
+
+
+def bench_deadcode(statements: int) -> None:
+    """Quads removed and VM instructions saved by copy propagation and dead code elimination, and the VM time."""
+    import optimizer
+    from BabyNativeParser import parse
+
+    iterations = statements
+    program = parse(generate_assignments_program(iterations))
+    dataflow_passes = ("copies", "deadcode")
+    objects = {
+        "other passes": compile_variant(
+            program, [p for name, p in optimizer.PASSES if name not in dataflow_passes], "assignments"),
+        "copies + dead code": compile_variant(program, [p for _, p in optimizer.PASSES], "assignments"),
+    }
+    results = run_variants(objects)
+
+    before, after = objects["other passes"], objects["copies + dead code"]
+    print(f"deadcode ({iterations} iterations, {len(before.quads) - len(after.quads)} quads removed, "
+          f"{results['other passes'][1] - results['copies + dead code'][1]} instructions saved)")
+    report_variants(objects, results)
+
+
+def generate_nested_loops_program(iterations: int = 100) -> str:
+    """Two nested loops whose condition and body recompute values fixed outside them."""
+    return "\n".join([
+        "program nested;",
+        "var i, j, n, s: int; x, y: float;",
+        "main {",
+        f"    i = 0; n = {iterations}; s = 0; x = 0.5; y = 0.0;",
+        "    while (i < n) do {",
+        "        j = 0;",
+        "        while (j < n * 2 - 1) do {",
+        "            s = s + n * n - (n + 1) * (n - 1) + i * 2;",
+        "            y = x * 3.0 + j;",
+        "            j = j + 1;",
+        "        };",
+        "        i = i + 1;",
+        "    };",
+        "    print(s, y);",
+        "}",
+        "end",
+    ])
+
+
+def bench_loops(statements: int) -> None:
+    """Quads moved and VM instructions saved by loop-invariant code motion on nested loops, and the VM time."""
+    import optimizer
+    from BabyNativeParser import parse
+
+    # statements inner iterations in all, split evenly between the two loops
+    iterations = max(1, int((statements / 2) ** 0.5))
+    program = parse(generate_nested_loops_program(iterations))
+    hoisting: Dict[str, Any] = {}
+    passes = [(name, recorded(optimization_pass, hoisting) if name == "loops" else optimization_pass)
+              for name, optimization_pass in optimizer.PASSES]
+    objects = {
+        "other passes": compile_variant(program, [p for name, p in passes if name != "loops"], "nested"),
+        "invariants hoisted": compile_variant(program, [p for _, p in passes], "nested"),
+    }
+    results = run_variants(objects)
+
+    print(f"loops ({iterations} x {iterations * 2 - 1} iterations, {hoisting['result']} quads moved, "
+          f"{results['other passes'][1] - results['invariants hoisted'][1]} instructions saved)")
+    report_variants(objects, results)
+
+
+BENCHMARKS: Dict[str, Callable[[int], None]] = {
+    "parse": bench_parse,
+    "frontends": bench_frontends,
+    "ast": bench_ast,
+    "codegen": bench_codegen,
+    "symbols": bench_symbols,
+    "temps": bench_temps,
+    "vm": bench_vm,
+    "immediates": bench_immediates,
+    "load": bench_load,
+    "lazy": bench_lazy,
+    "listing": bench_listing,
+    "fold": bench_fold,
+    "controlflow": bench_controlflow,
+    "numbering": bench_numbering,
+    "deadcode": bench_deadcode,
+    "loops": bench_loops,
+}
+
+
+if __name__ == "__main__":
+    names = [sys.argv[1]] if len(sys.argv) > 1 else list(BENCHMARKS)
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    for bench_name in names:
+        BENCHMARKS[bench_name](size)
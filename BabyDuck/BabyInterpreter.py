@@ -2,7 +2,8 @@ from typing import List, Optional
 
 from custom_classes.tree_nodes import *
 from custom_classes.memory import Operations, AllocCategory
-from custom_classes.classes import Quad
+from custom_classes.classes import QuadBuffer, DebugInfo
+from custom_classes.values import TYPE_INT, TYPE_NAMES
 
 from SemanticCube import SemanticCube
 from SymbolTable import SymbolTable
@@ -14,8 +15,29 @@ class BabyInterpreter:
         self.current_scope = "global"
         self.scope_stack: List[str] = [self.current_scope]
         self.semantic_cube = SemanticCube()
-        self.quads: List[Quad] = []
+        self.quads = QuadBuffer()
         self.memory_manager = memory_manager
+        self.debug_info = DebugInfo()
+        self.work: List[tuple] = []
+
+        self.expression_handlers = {
+            Expression: self.eval_expression_node,
+            Exp: self.eval_exp_node,
+            Term: self.eval_term_node,
+            Factor: self.eval_factor_node,
+        }
+        self.statement_handlers = {
+            Program: self.gen_quads_program,
+            Vars: self.gen_quads_vars,
+            VarDeclaration: self.gen_quads_var_declaration,
+            Function: self.gen_quads_function,
+            Assign: self.gen_quads_assign,
+            Print: self.gen_quads_print,
+            Condition: self.gen_quads_condition,
+            Cycle: self.gen_quads_cycle,
+            Body: self.gen_quads_body,
+            FCall: self.gen_quads_f_call,
+        }
 
     def add_quad(
             self, 
@@ -24,155 +46,151 @@ class BabyInterpreter:
             vdir2: Optional[int] = None, 
             storage_vdir: Optional[int] = None,
             label: Optional[str] = None,
-            ) -> Quad:
-        """Add a quadruple to the list of quads."""
-
-        quad = Quad(op_vdir=op.value, vdir1=vdir1, vdir2=vdir2, storage_vdir=storage_vdir, scope=self.current_scope, label=label)
-        self.quads.append(quad)
-        return quad
+            ) -> int:
+        """Add a quadruple to the quad buffer and return its index."""
+        return self.quads.append(op.value, vdir1, vdir2, storage_vdir, label, self.current_scope)
 
     def evaluate_expression(self, current_tree_node) -> int:
-        if isinstance(current_tree_node, Expression):
-            left_vdir = self.evaluate_expression(current_tree_node.left_expr)
-
-            if current_tree_node.op is None or current_tree_node.right_expr is None:
-                return left_vdir
-            
-            right_vdir = self.evaluate_expression(current_tree_node.right_expr)
-    
-            op = current_tree_node.op
-            alloc_vdir = self.memory_manager.allocate(AllocCategory.TEMP_INT, local_name=self.current_scope)
-            quad = self.add_quad(op=op, vdir1=left_vdir, vdir2=right_vdir, storage_vdir=alloc_vdir)
-            assert quad.storage_vdir is not None, "Quadruple storage_vdir should not be None"
-            return quad.storage_vdir
-            
-        
-        elif isinstance(current_tree_node, Exp):
-            left_vdir = self.evaluate_expression(current_tree_node.left_term)
-            for op, term in current_tree_node.operations:
-                right_vdir = self.evaluate_expression(term)
-
-                left_vdir_type = self.memory_manager.get_address_type(left_vdir)
-                right_vdir_type = self.memory_manager.get_address_type(right_vdir)
-
-                result_type = self.semantic_cube.get_resulting_type(
-                    left_vdir_type, right_vdir_type, op
-                )
-
-                storage_vdir = self.memory_manager.allocate(
-                    AllocCategory.TEMP_INT if result_type == "int" else AllocCategory.TEMP_FLOAT,
-                    local_name=self.current_scope
-                )
-                quad = self.add_quad(
-                    op=op, 
-                    vdir1=left_vdir, 
-                    vdir2=right_vdir,
-                    storage_vdir=storage_vdir
-                    )
-                left_vdir = storage_vdir
-            return left_vdir
-        
-        elif isinstance(current_tree_node, Term):
-            left_vdir = self.evaluate_expression(current_tree_node.left_factor)
-            for op, factor in current_tree_node.operations:
-                right_vdir = self.evaluate_expression(factor)
-
-                left_vdir_type = self.memory_manager.get_address_type(left_vdir)
-                right_vdir_type = self.memory_manager.get_address_type(right_vdir)
-
-                result_type = self.semantic_cube.get_resulting_type(
-                    left_vdir_type, right_vdir_type, op
-                )
-
-                storage_vdir = self.memory_manager.allocate(
-                    AllocCategory.TEMP_INT if result_type == "int" else AllocCategory.TEMP_FLOAT,
-                    local_name=self.current_scope
-                )
-                quad = self.add_quad(
-                    op=op, 
-                    vdir1=left_vdir, 
-                    vdir2=right_vdir,
-                    storage_vdir=storage_vdir
-                    )
-                left_vdir = storage_vdir
-            return left_vdir
-        
-        elif isinstance(current_tree_node, Factor):
-            if isinstance(current_tree_node.value, str):
-                # Check if the value is a variable
-                if not self.symbol_table.is_symbol_declared(current_tree_node.value, self.current_scope):
-                    raise ValueError(f"Variable {current_tree_node.value} is not declared.")
-                
-                symbol = self.symbol_table.get_symbol(
-                    current_tree_node.value, 
-                    self.current_scope,
-                )
-                return symbol.vdir # Stored in the symbol table                    
-
-            elif isinstance(current_tree_node.value, (int, float)):
-                if current_tree_node.sign == '-':
-                    value = current_tree_node.value * -1
+        """
+        Emit the quads for an expression and return the vdir holding its value.
+
+        Nodes are walked with an explicit work stack instead of recursion, so
+        deeply nested parentheses don't hit the Python recursion limit. The
+        stack holds nodes still to be evaluated and (op, is_comparison) pairs
+        for the quads waiting on them; operand vdirs are kept on the values
+        stack until the quad that consumes them is emitted. Node handlers
+        return the child to evaluate first, or None.
+        """
+        handlers = self.expression_handlers
+        values: List[int] = []
+        work: list = [current_tree_node]
+        while work:
+            item = work.pop()
+            if type(item) is tuple:
+                op, is_comparison = item
+                right_vdir = values.pop()
+                left_vdir = values.pop()
+                if is_comparison:
+                    category = AllocCategory.TEMP_INT
                 else:
-                    value = current_tree_node.value
-                    
-                vdir = self.memory_manager.allocate(
-                    AllocCategory.CONSTANT, 
-                    const_value=value, 
-                    local_name=self.current_scope
-                )
-                return vdir
-                
-            elif isinstance(current_tree_node.value, Expression):
-                return self.evaluate_expression(current_tree_node.value)
-            
-            else:
-                raise ValueError(f"Unsupported factor type: {type(current_tree_node.value)}")
-        
-        else :
-            raise ValueError(f"Unsupported expression type: {current_tree_node.__class__.__name__}")
-    
-    
-    def generate_quads(self, ir):    
-        if isinstance(ir, Program): 
-            self.gen_quads_program(ir)
-
-        elif isinstance(ir, Vars):
-            self.gen_quads_vars(ir)
-
-        elif isinstance(ir, VarDeclaration):
-            self.gen_quads_var_declaration(ir)
-
-        elif isinstance(ir, Function):
-            self.gen_quads_function(ir)
-
-        elif isinstance(ir, Assign):
-            self.gen_quads_assign(ir)
-
-        elif isinstance(ir, Print):
-            self.gen_quads_print(ir)
-
-        elif isinstance(ir, Condition):
-            self.gen_quads_condition(ir)
-
-        elif isinstance(ir, Cycle):
-            self.gen_quads_cycle(ir)
-
-        elif isinstance(ir, Body):
-            self.gen_quads_body(ir)
+                    result_type = self.semantic_cube.get_resulting_type_code(
+                        self.memory_manager.get_address_type_code(left_vdir),
+                        self.memory_manager.get_address_type_code(right_vdir),
+                        op
+                    )
+                    category = AllocCategory.TEMP_INT if result_type == TYPE_INT else AllocCategory.TEMP_FLOAT
+                storage_vdir = self.memory_manager.allocate(category, local_name=self.current_scope)
+                self.add_quad(op=op, vdir1=left_vdir, vdir2=right_vdir, storage_vdir=storage_vdir)
+                values.append(storage_vdir)
+                continue
+
+            while item is not None:
+                handler = handlers.get(type(item))
+                if handler is None:
+                    raise ValueError(f"Unsupported expression type: {item.__class__.__name__}")
+                item = handler(item, work, values)
+        return values.pop()
+
+    def eval_expression_node(self, node: Expression, work: list, values: List[int]):
+        if node.op is None or node.right_expr is None:
+            return node.left_expr
+        # Pushed in reverse: right is evaluated after left, then the comparison
+        work.append((node.op, True))
+        work.append(node.right_expr)
+        return node.left_expr
+
+    def eval_exp_node(self, node: Exp, work: list, values: List[int]):
+        for op, term in reversed(node.operations):
+            work.append((op, False))
+            work.append(term)
+        return node.left_term
+
+    def eval_term_node(self, node: Term, work: list, values: List[int]):
+        for op, factor in reversed(node.operations):
+            work.append((op, False))
+            work.append(factor)
+        return node.left_factor
+
+    def eval_factor_node(self, node: Factor, work: list, values: List[int]):
+        value = node.value
+        if isinstance(value, str):
+            # Check if the value is a variable
+            symbol = self.symbol_table.find_symbol(value, self.current_scope)
+            if symbol is None:
+                raise ValueError(f"Variable {value} is not declared.")
+            values.append(symbol.vdir) # Stored in the symbol table
+
+        elif isinstance(value, (int, float)):
+            if node.sign == '-':
+                value = value * -1
+
+            vdir = self.memory_manager.allocate(
+                AllocCategory.CONSTANT,
+                const_value=value,
+                local_name=self.current_scope
+            )
+            values.append(vdir)
 
-        elif isinstance(ir, FCall):
-            self.gen_quads_f_call(ir)
+        elif isinstance(value, Expression):
+            return value
 
+        else:
+            raise ValueError(f"Unsupported factor type: {type(value)}")
+
+
+    def generate_quads(self, ir):
+        """
+        Emit the quads for ir and everything below it.
+
+        Statement handlers don't recurse into nested bodies. They push the
+        children, followed by whatever has to run once the children are done
+        (backpatching jumps, leaving a scope), as tasks on self.work, and this
+        loop runs them until the stack is back where it started.
+        """
+        work = self.work
+        base = len(work)
+        work.append((self.visit, ir))
+        try:
+            while len(work) > base:
+                task, arg = work.pop()
+                task(arg)
+        finally:
+            # Drop whatever a failed node left queued
+            del work[base:]
+
+    def visit(self, ir):
+        handler = self.statement_handlers.get(type(ir))
+        if handler is not None:
+            handler(ir)
+
+    def schedule(self, *tasks):
+        """Queue tasks so they run in the given order."""
+        self.work.extend(reversed(tasks))
+
+    def patch_goto(self, quad_pos: int):
+        self.quads.vdir1[quad_pos] = len(self.quads)
+
+    def mark_position(self, ir: Optional[Statement] = None):
+        """Record that the next quads come from ir, or from no statement."""
+        if ir is None:
+            self.debug_info.mark(len(self.quads), None, None)
+        else:
+            self.debug_info.mark(len(self.quads), ir.line, ir.column)
     
     def gen_quads_program(self, ir: Program):
         self.add_quad(op=Operations.GOTO, vdir1=-1)
         main_goto_pos = len(self.quads) - 1
         if ir.vars is not None: 
             self.gen_quads_vars(ir.vars)
-        for func in ir.funcs:
-            self.gen_quads_function(func)
-        self.quads[main_goto_pos].vdir1 = len(self.quads)
-        self.gen_quads_body(ir.body)
+        self.schedule(
+            *[(self.gen_quads_function, func) for func in ir.funcs],
+            (self.patch_goto, main_goto_pos),
+            (self.gen_quads_body, ir.body),
+            (self.end_program, None),
+        )
+
+    def end_program(self, _):
+        self.mark_position()
         self.add_quad(op=Operations.END)
 
     def gen_quads_vars(self, ir: Vars): 
@@ -195,20 +213,23 @@ class BabyInterpreter:
         
         if ir.vars is not None: 
             self.gen_quads_vars(ir.vars)
-        self.gen_quads_body(ir.body)
-        
+        self.schedule((self.gen_quads_body, ir.body), (self.end_function, None))
+
+    def end_function(self, _):
+        self.mark_position()
         self.scope_stack.pop()
         self.current_scope = self.scope_stack[-1]
         self.add_quad(op=Operations.ENDFUNC)
 
     def gen_quads_assign(self, ir: Assign): 
+        self.mark_position(ir)
         expr_vdir = self.evaluate_expression(ir.expr)
         expr_type = self.memory_manager.get_address_type(expr_vdir)
 
-        if not self.symbol_table.is_symbol_declared(ir.id, self.current_scope):
+        symbol = self.symbol_table.find_symbol(ir.id, self.current_scope)
+        if symbol is None:
             raise ValueError(f"Variable {ir.id} is not declared.")
         
-        symbol = self.symbol_table.get_symbol(ir.id, self.current_scope)
         var_type = symbol.data_type
         is_valid_decl = self.semantic_cube.is_decl_valid(from_type=expr_type, to_type=var_type)
         if not is_valid_decl:
@@ -217,6 +238,7 @@ class BabyInterpreter:
         self.add_quad(op=Operations.ASSIGN, vdir1=symbol.vdir, vdir2=expr_vdir)
 
     def gen_quads_print(self, ir: Print): 
+        self.mark_position(ir)
         for content in ir.contents:
             if isinstance(content, str):
                 allocated_const = self.memory_manager.allocate(
@@ -231,46 +253,53 @@ class BabyInterpreter:
                 self.add_quad(op=Operations.PRINT, vdir1=expr_vdir)
 
     def gen_quads_condition(self, ir: Condition): 
+        self.mark_position(ir)
         expr_vdir = self.evaluate_expression(ir.expr)
-        expr_type = self.memory_manager.get_address_type(expr_vdir)
-        if expr_type != "int":
-            raise ValueError(f"Condition expression must be of type int, got {expr_type}.")
+        expr_type = self.memory_manager.get_address_type_code(expr_vdir)
+        if expr_type != TYPE_INT:
+            raise ValueError(f"Condition expression must be of type int, got {TYPE_NAMES[expr_type]}.")
         
         self.add_quad(op=Operations.GOTOF, vdir1=expr_vdir)
         gotof_pos = len(self.quads) - 1
         
-        self.gen_quads_body(ir.if_body)
-        
+        self.schedule((self.gen_quads_body, ir.if_body), (self.end_if_body, (ir, gotof_pos)))
+
+    def end_if_body(self, args):
+        ir, gotof_pos = args
+        self.mark_position(ir)
         if ir.else_body is not None:
             self.add_quad(op=Operations.GOTO, vdir1=-1)
             goto_quad_pos = len(self.quads) - 1
-            self.quads[gotof_pos].vdir2 = len(self.quads)            
+            self.quads.vdir2[gotof_pos] = len(self.quads)            
 
-            self.gen_quads_body(ir.else_body)
-            self.quads[goto_quad_pos].vdir1 = len(self.quads)
+            self.schedule((self.gen_quads_body, ir.else_body), (self.patch_goto, goto_quad_pos))
         else:
-            self.quads[gotof_pos].vdir2 = len(self.quads)
+            self.quads.vdir2[gotof_pos] = len(self.quads)
 
     def gen_quads_cycle(self, ir: Cycle): 
+        self.mark_position(ir)
         quad_pos_bef_eval = len(self.quads)
         expr_vdir = self.evaluate_expression(ir.expr)
-        expr_type = self.memory_manager.get_address_type(expr_vdir)
-        if expr_type != "int":
-            raise ValueError(f"Condition expression must be of type int, got {expr_type}.")
+        expr_type = self.memory_manager.get_address_type_code(expr_vdir)
+        if expr_type != TYPE_INT:
+            raise ValueError(f"Condition expression must be of type int, got {TYPE_NAMES[expr_type]}.")
         
         self.add_quad(op=Operations.GOTOF, vdir1=expr_vdir)
         open_pos = len(self.quads) - 1
         
-        self.gen_quads_body(ir.body)
+        self.schedule((self.gen_quads_body, ir.body), (self.end_cycle, (ir, quad_pos_bef_eval, open_pos)))
 
+    def end_cycle(self, args):
+        ir, quad_pos_bef_eval, open_pos = args
+        self.mark_position(ir)
         self.add_quad(op=Operations.GOTO, vdir1=quad_pos_bef_eval)
-        self.quads[open_pos].vdir2 = len(self.quads)
+        self.quads.vdir2[open_pos] = len(self.quads)
 
     def gen_quads_body(self, ir: Body): 
-        for statement in ir.statements:
-            self.generate_quads(statement)
+        self.schedule(*[(self.visit, statement) for statement in ir.statements])
 
     def gen_quads_f_call(self, ir: FCall): 
+        self.mark_position(ir)
         self.current_scope = ir.id
         self.scope_stack.append(self.current_scope)
 
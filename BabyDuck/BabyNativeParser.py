@@ -0,0 +1,430 @@
+"""
+Hand-written frontend for BabyDuck.
+
+A single-pass regex scanner feeds a recursive descent parser for statements
+and a precedence-climbing parser for the expression -> exp -> term -> factor
+chain of grammar.lark. It builds the same custom_classes.tree_nodes objects as
+BabyTransformer, so both frontends are interchangeable in gen_obj.
+
+Like Lark's contextual lexer, a word is only treated as a keyword where that
+keyword can appear; anywhere else it is an ID. Syntax errors are raised as
+lark's UnexpectedToken / UnexpectedCharacters (imported only on the error
+path) with the same line and column Lark reports.
+"""
+import re
+from typing import List, NoReturn, Optional, Set, Tuple, Union
+
+from custom_classes.tree_nodes import *
+from custom_classes.memory import Operations
+
+# (type, value, start_pos); line and column are only worked out for errors
+Token = Tuple[str, str, int]
+
+# Leading whitespace is skipped as part of each match, like %ignore WS
+_TOKEN_REGEX = re.compile(r"""
+    [ \t\f\r\n]*
+    (?:
+        (?P<FLOAT>[0-9]+[eE][+-]?[0-9]+|(?:[0-9]+\.(?:[0-9]+)?|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)
+        | (?P<INT>[0-9]+)
+        | (?P<NAME>[A-Za-z_][A-Za-z0-9_]*)
+        | (?P<ESCAPED_STRING>".*?(?<!\\)(?:\\\\)*?")
+        | (?P<PUNCT>!=|[-+*/=<>(){}\[\],;:])
+        | (?P<EOF>\Z)
+        | (?P<ERROR>[\s\S])
+    )
+""", re.VERBOSE)
+
+KEYWORDS = {
+    "program": "PROGRAM",
+    "end": "END",
+    "main": "MAIN",
+    "void": "VOID",
+    "var": "VAR",
+    "while": "WHILE",
+    "do": "DO",
+    "if": "IF",
+    "else": "ELSE",
+    "print": "PRINT",
+    # Anonymous "int" / "float" terminals of type_ in grammar.lark
+    "int": "__ANON_0",
+    "float": "__ANON_1",
+}
+
+PUNCTUATION = {
+    "(": "OPEN_PAREN",
+    ")": "CLOSE_PAREN",
+    "{": "OPEN_KEY",
+    "}": "CLOSE_KEY",
+    "[": "OPEN_BRACKET",
+    "]": "CLOSE_BRACKET",
+    "*": "MULT",
+    "/": "DIV",
+    "=": "EQUAL",
+    "+": "ADD",
+    "-": "SUB",
+    ">": "GREATER",
+    "<": "LESS",
+    "!=": "DIFFERENT",
+    ",": "COMMA",
+    ";": "SEMICOLON",
+    ":": "COLON",
+}
+
+COMPARISON_OPS = {
+    "<": Operations.LESS_THAN,
+    ">": Operations.GREATER_THAN,
+    "!=": Operations.NOT_EQUAL,
+}
+
+# Binary operators, lowest precedence first. Each level is left associative
+# and becomes the operations of an Exp or a Term.
+ADDITIVE_OPS = {"+": Operations.PLUS, "-": Operations.MINUS}
+MULTIPLICATIVE_OPS = {"*": Operations.MULT, "/": Operations.DIV}
+
+FACTOR_START = {"ADD", "SUB", "INT", "FLOAT", "ID", "OPEN_PAREN"}
+
+
+def scan(text: str) -> List[Token]:
+    """
+    Split source text into tokens. Words are left as NAME for the parser and
+    the list always ends with a $END token.
+    """
+    tokens: List[Token] = []
+    append = tokens.append
+
+    for m in _TOKEN_REGEX.finditer(text):
+        kind = m.lastgroup
+        if kind == "PUNCT":
+            value = m.group(kind)
+            append((PUNCTUATION[value], value, m.start(kind)))
+        elif kind == "EOF":
+            break
+        elif kind == "ERROR":
+            _raise_unexpected_characters(text, m.start(kind))
+        else:
+            append((kind, m.group(kind), m.start(kind)))
+
+    # Lark places its end token on the last real token
+    append(("$END", "", tokens[-1][2] if tokens else 0))
+    return tokens
+
+
+def line_column(text: str, pos: int) -> Tuple[int, int]:
+    """1-based line and column of a character offset, as Lark counts them."""
+    line_start = text.rfind("\n", 0, pos) + 1
+    return text.count("\n", 0, pos) + 1, pos - line_start + 1
+
+
+def _raise_unexpected_characters(text: str, pos: int) -> NoReturn:
+    from lark import UnexpectedCharacters
+    raise UnexpectedCharacters(text, pos, *line_column(text, pos))
+
+
+class BabyNativeParser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = scan(text)
+        self.index = 0
+        # Last offset handed to position() and its line, so statement
+        # positions are counted incrementally instead of from the start
+        self.line_pos = 0
+        self.line = 1
+
+    def parse(self) -> Program:
+        program = self.parse_program()
+        if self.tokens[self.index][0] != "$END":
+            self.error(["$END"])
+        return program
+
+    # ---- token helpers ----
+
+    def peek_type(self) -> str:
+        """Type of the next token, with words reported as NAME."""
+        return self.tokens[self.index][0]
+
+    def peek_word(self) -> Optional[str]:
+        """The next token's text if it is a word, else None."""
+        token = self.tokens[self.index]
+        return token[1] if token[0] == "NAME" else None
+
+    def expect(self, token_type: str) -> str:
+        token = self.tokens[self.index]
+        if token[0] != token_type:
+            self.error([token_type])
+        self.index += 1
+        return token[1]
+
+    def expect_keyword(self, keyword: str) -> None:
+        if self.peek_word() != keyword:
+            self.error([KEYWORDS[keyword]])
+        self.index += 1
+
+    def expect_id(self) -> str:
+        return self.expect("NAME")
+
+    def position(self) -> Tuple[int, int]:
+        """line_column() of the next token."""
+        pos = self.tokens[self.index][2]
+        if pos < self.line_pos:
+            self.line_pos, self.line = 0, 1
+        self.line += self.text.count("\n", self.line_pos, pos)
+        self.line_pos = pos
+        return self.line, pos - (self.text.rfind("\n", 0, pos) + 1) + 1
+
+    def error(self, expected: List[str], keywords: Set[str] = frozenset()) -> NoReturn:
+        """
+        Raise lark's UnexpectedToken for the current token.
+
+        `keywords` are the words that would have been keywords at this point;
+        any other word is reported as an ID, like Lark's contextual lexer.
+        """
+        from lark import Token as LarkToken, UnexpectedToken
+
+        expected = ["ID" if name == "NAME" else name for name in expected]
+        token_type, value, start_pos = self.tokens[self.index]
+        if token_type == "NAME":
+            if value in keywords or "ID" not in expected:
+                token_type = KEYWORDS.get(value, "ID")
+            else:
+                token_type = "ID"
+        line, column = line_column(self.text, start_pos)
+        raise UnexpectedToken(LarkToken(token_type, value, start_pos, line, column), set(expected))
+
+    # ---- declarations ----
+
+    def parse_program(self) -> Program:
+        self.expect_keyword("program")
+        program_id = self.expect_id()
+        self.expect("SEMICOLON")
+
+        vars = None
+        if self.peek_word() == "var":
+            vars = self.parse_vars()
+
+        funcs: List[Function] = []
+        while self.peek_word() == "void":
+            funcs.append(self.parse_function())
+
+        if self.peek_word() != "main":
+            expected = ["VOID", "MAIN"] if vars is not None or funcs else ["VAR", "VOID", "MAIN"]
+            self.error(expected, keywords={"var", "void", "main"})
+        self.index += 1
+        body = self.parse_body()
+        self.expect_keyword("end")
+        return Program(id=program_id, vars=vars, funcs=funcs, body=body)
+
+    def parse_vars(self) -> Vars:
+        self.expect_keyword("var")
+        declarations = [self.parse_var_declaration()]
+        # In Lark's LALR tables "void" and "main" may follow a declaration
+        # list, both in a program and in a function, so they end it
+        while self.peek_type() == "NAME" and self.peek_word() not in ("void", "main"):
+            declarations.append(self.parse_var_declaration())
+        return Vars(declarations=declarations)
+
+    def parse_var_declaration(self) -> VarDeclaration:
+        names = [self.expect_id()]
+        while self.peek_type() == "COMMA":
+            self.index += 1
+            names.append(self.expect_id())
+        self.expect("COLON")
+        type_ = self.parse_type()
+        self.expect("SEMICOLON")
+        return VarDeclaration(type_=type_, names=names)
+
+    def parse_type(self) -> VariableType:
+        word = self.peek_word()
+        if word != "int" and word != "float":
+            self.error(["__ANON_0", "__ANON_1"], keywords={"int", "float"})
+        self.index += 1
+        return word
+
+    def parse_function(self) -> Function:
+        self.expect_keyword("void")
+        function_id = self.expect_id()
+        self.expect("OPEN_PAREN")
+        params: List[Param] = []
+        if self.peek_type() != "CLOSE_PAREN":
+            params = self.parse_params()
+        self.expect("CLOSE_PAREN")
+        self.expect("OPEN_BRACKET")
+
+        vars = None
+        if self.peek_word() == "var":
+            vars = self.parse_vars()
+        elif self.peek_type() != "OPEN_KEY":
+            self.error(["VAR", "OPEN_KEY"], keywords={"var"})
+        body = self.parse_body()
+
+        self.expect("CLOSE_BRACKET")
+        self.expect("SEMICOLON")
+        return Function(id=function_id, params=params, vars=vars, body=body)
+
+    def parse_params(self) -> List[Param]:
+        params = []
+        while True:
+            name = self.expect_id()
+            self.expect("COLON")
+            params.append(Param(name=name, type_=self.parse_type()))
+            if self.peek_type() != "COMMA":
+                return params
+            self.index += 1
+
+    # ---- statements ----
+
+    def parse_body(self) -> Body:
+        self.expect("OPEN_KEY")
+        statements: List[Statement] = []
+        while self.peek_type() != "CLOSE_KEY":
+            statements.append(self.parse_statement())
+        self.index += 1
+        return Body(statements=statements)
+
+    def parse_statement(self) -> Statement:
+        word = self.peek_word()
+        if word is None:
+            self.error(["ID", "IF", "WHILE", "PRINT", "CLOSE_KEY"])
+        if word == "if":
+            return self.parse_condition()
+        if word == "while":
+            return self.parse_cycle()
+        if word == "print":
+            return self.parse_print()
+
+        line, column = self.position()
+        self.index += 1
+        next_type = self.peek_type()
+        if next_type == "EQUAL":
+            self.index += 1
+            expr = self.parse_expression()
+            self.expect("SEMICOLON")
+            return Assign(id=word, expr=expr, line=line, column=column)
+        if next_type == "OPEN_PAREN":
+            return self.parse_f_call(word, line, column)
+        self.error(["EQUAL", "OPEN_PAREN"])
+
+    def parse_f_call(self, function_id: str, line: int, column: int) -> FCall:
+        self.expect("OPEN_PAREN")
+        args: List[Expression] = []
+        if self.peek_type() != "CLOSE_PAREN":
+            args.append(self.parse_expression())
+            while self.peek_type() == "COMMA":
+                self.index += 1
+                args.append(self.parse_expression())
+        self.expect("CLOSE_PAREN")
+        self.expect("SEMICOLON")
+        return FCall(id=function_id, args=args, line=line, column=column)
+
+    def parse_print(self) -> Print:
+        line, column = self.position()
+        self.expect_keyword("print")
+        self.expect("OPEN_PAREN")
+        contents = [self.parse_print_content()]
+        while self.peek_type() == "COMMA":
+            self.index += 1
+            contents.append(self.parse_print_content())
+        self.expect("CLOSE_PAREN")
+        self.expect("SEMICOLON")
+        return Print(contents=contents, line=line, column=column)
+
+    def parse_print_content(self) -> Union[Expression, str]:
+        if self.peek_type() == "ESCAPED_STRING":
+            self.index += 1
+            return self.tokens[self.index - 1][1][1:-1]
+        return self.parse_expression()
+
+    def parse_condition(self) -> Condition:
+        line, column = self.position()
+        self.expect_keyword("if")
+        self.expect("OPEN_PAREN")
+        expr = self.parse_expression()
+        self.expect("CLOSE_PAREN")
+        if_body = self.parse_body()
+
+        else_body = None
+        if self.peek_word() == "else":
+            self.index += 1
+            else_body = self.parse_body()
+        elif self.peek_type() != "SEMICOLON":
+            self.error(["SEMICOLON", "ELSE"], keywords={"else"})
+        self.expect("SEMICOLON")
+        return Condition(expr=expr, if_body=if_body, else_body=else_body, line=line, column=column)
+
+    def parse_cycle(self) -> Cycle:
+        line, column = self.position()
+        self.expect_keyword("while")
+        self.expect("OPEN_PAREN")
+        expr = self.parse_expression()
+        self.expect("CLOSE_PAREN")
+        self.expect_keyword("do")
+        body = self.parse_body()
+        self.expect("SEMICOLON")
+        return Cycle(expr=expr, body=body, line=line, column=column)
+
+    # ---- expressions ----
+
+    def parse_expression(self) -> Expression:
+        left = self.parse_exp()
+        op = COMPARISON_OPS.get(self.tokens[self.index][1])
+        if op is None:
+            return Expression(left_expr=left)
+        self.index += 1
+        return Expression(left_expr=left, op=op, right_expr=self.parse_exp())
+
+    def parse_exp(self) -> Exp:
+        tokens = self.tokens
+        left = self.parse_term()
+        op = ADDITIVE_OPS.get(tokens[self.index][1])
+        if op is None:
+            return Exp(left_term=left)
+        operations = []
+        while op is not None:
+            self.index += 1
+            operations.append((op, self.parse_term()))
+            op = ADDITIVE_OPS.get(tokens[self.index][1])
+        return Exp(left_term=left, operations=tuple(operations))
+
+    def parse_term(self) -> Term:
+        tokens = self.tokens
+        left = self.parse_factor()
+        op = MULTIPLICATIVE_OPS.get(tokens[self.index][1])
+        if op is None:
+            return Term(left_factor=left)
+        operations = []
+        while op is not None:
+            self.index += 1
+            operations.append((op, self.parse_factor()))
+            op = MULTIPLICATIVE_OPS.get(tokens[self.index][1])
+        return Term(left_factor=left, operations=tuple(operations))
+
+    def parse_factor(self) -> Factor:
+        token_type, value = self.tokens[self.index][:2]
+
+        if token_type == "OPEN_PAREN":
+            self.index += 1
+            expr = self.parse_expression()
+            self.expect("CLOSE_PAREN")
+            return Factor(value=expr)
+
+        sign = "+"
+        if token_type == "ADD" or token_type == "SUB":
+            sign = "+" if token_type == "ADD" else "-"
+            self.index += 1
+            token_type, value = self.tokens[self.index][:2]
+            if token_type not in ("INT", "FLOAT", "NAME"):
+                self.error(["INT", "FLOAT", "ID"])
+
+        if token_type == "INT":
+            self.index += 1
+            return Factor(value=int(value), sign=sign)
+        if token_type == "FLOAT":
+            self.index += 1
+            return Factor(value=float(value), sign=sign)
+        if token_type == "NAME":
+            self.index += 1
+            return Factor(value=value, sign=sign)
+        self.error(sorted(FACTOR_START))
+
+
+def parse(text: str) -> Program:
+    return BabyNativeParser(text).parse()
@@ -0,0 +1,110 @@
+"""
+Shared factory for the BabyDuck LALR parser.
+
+Building the LALR tables for grammar.lark costs more than compiling a small
+program, so the tables are built once, serialized to CACHE_DIR and reused by
+every later process. The cache file name is derived from a hash of the grammar
+text, the parser options and the lark version, so editing the grammar never
+loads stale tables.
+"""
+import hashlib
+import os
+import sys
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import lark
+from lark import Lark, Transformer
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GRAMMAR_PATH = os.path.join(BASE_DIR, "grammar.lark")
+CACHE_DIR = os.environ.get("BABYDUCK_CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+
+# Parsers already built in this process, keyed by (id of the transformer, options).
+# Each entry keeps its transformer alive, so the id can't be reused by another object.
+_parsers: Dict[Tuple[Any, ...], Tuple[Optional[Transformer], Lark]] = {}
+
+# How the last parser was obtained: "memory", "warm" (loaded from the on-disk
+# cache) or "cold" (tables built from the grammar), and how long it took.
+last_load: Dict[str, Any] = {}
+
+
+def read_grammar() -> str:
+    with open(GRAMMAR_PATH, "r") as file:
+        return file.read()
+
+
+def grammar_hash(grammar: str, **options) -> str:
+    """Hash of everything that affects the generated tables."""
+    key = grammar + repr(sorted(options.items())) + lark.__version__ + str(sys.version_info[:2])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def get_cache_path(grammar: str, **options) -> str:
+    return os.path.join(CACHE_DIR, f"grammar-{grammar_hash(grammar, **options)[:32]}.lark")
+
+
+def get_parser(transformer: Optional[Transformer] = None, **options) -> Lark:
+    """
+    Return the BabyDuck LALR parser, building its tables at most once.
+
+    Args:
+        transformer: Optional transformer applied inline while parsing. The
+            parser is bound to this instance, so each instance gets its own
+            parser; the tables still come from the shared on-disk cache.
+        options: Extra Lark options (e.g. propagate_positions)
+    """
+    key = (id(transformer) if transformer is not None else None, tuple(sorted(options.items())))
+    if key in _parsers:
+        last_load.update(mode="memory", seconds=0.0, cache_path=None)
+        return _parsers[key][1]
+
+    grammar = read_grammar()
+    cache_path = get_cache_path(grammar, **options)
+    mode = "warm" if os.path.exists(cache_path) else "cold"
+    if not os.path.exists(CACHE_DIR):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+
+    start = time.perf_counter()
+    parser = Lark(
+        grammar,
+        start="start",
+        parser="lalr",
+        transformer=transformer,
+        cache=cache_path,
+        **options
+    )
+    last_load.update(mode=mode, seconds=time.perf_counter() - start, cache_path=cache_path)
+
+    _parsers[key] = (transformer, parser)
+    return parser
+
+
+def clear_cache() -> None:
+    """Forget the in-process parsers and delete the serialized tables."""
+    _parsers.clear()
+    if not os.path.exists(CACHE_DIR):
+        return
+    for filename in os.listdir(CACHE_DIR):
+        if filename.startswith("grammar-") and filename.endswith(".lark"):
+            os.remove(os.path.join(CACHE_DIR, filename))
+
+
+def main():
+    """Report how long a cold table build and a warm cache load take."""
+    clear_cache()
+    get_parser()
+    cold = dict(last_load)
+
+    _parsers.clear()
+    get_parser()
+    warm = dict(last_load)
+
+    print(f"Cache file: {warm['cache_path']}")
+    print(f"Cold build ({cold['mode']}): {cold['seconds'] * 1000:.2f} ms")
+    print(f"Warm load ({warm['mode']}): {warm['seconds'] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,24 @@ import logging
 import sys
 import os
 import contextlib
-from lark import Lark, logger, UnexpectedInput
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+from lark import logger, UnexpectedInput
+from BabyParser import get_parser
 from BabyTransformer import BabyTransformer
 from BabyInterpreter import BabyInterpreter
 from SymbolTable import SymbolTable
 from MemoryManager import MemoryManager
+from TempAllocator import TempAllocator
+from BabyVirtualMachine import BabyVirtualMachine
+from gen_obj import parse_program, build_function_descriptors, FRONTENDS
+from obj_format import ObjData, ObjectFileMetadata
+import optimizer
+from optimizer.program import QuadProgram
+from custom_classes.tree_nodes import Condition, Cycle
 
-from custom_classes.memory import Operations, AllocCategory
+from custom_classes.memory import Operations, AllocCategory, address_offset, decode_immediate
 
 logger.setLevel(logging.DEBUG)
 
@@ -17,25 +28,21 @@ logger.setLevel(logging.DEBUG)
 # parser.add_argument("input_file", help="Path to the BabyScript input file")
 # args = parser.parse_args()
 
-# Import grammar from file
-with open('grammar.lark', 'r') as file:
-    grammar = file.read()
-
-# Create the Lark parser
-babyParser = Lark(grammar, start='start', parser='lalr', debug=True)
+# Create the Lark parser (tables are loaded from the shared cache)
+babyParser = get_parser(debug=True)
 baby = babyParser.parse
 
 def get_symbol_name(symbol_table: SymbolTable, mem_mgr: MemoryManager, vdir: int, scope_name: str = "global") -> str:
-    if vdir < mem_mgr.address_ranges[AllocCategory.GLOBAL_INT].start:
-        raise ValueError("Invalid variable directory (vdir)")
-    if vdir < mem_mgr.address_ranges[AllocCategory.TEMP_INT].start:
-        return symbol_table.get_symbol(vdir, scope_name=scope_name).name
-    if vdir <= mem_mgr.address_ranges[AllocCategory.TEMP_INT].end:
-        return "ti"+str(vdir-mem_mgr.address_ranges[AllocCategory.TEMP_INT].start)
-    if vdir <= mem_mgr.address_ranges[AllocCategory.TEMP_FLOAT].end:
-        return "tf"+str(vdir-mem_mgr.address_ranges[AllocCategory.TEMP_FLOAT].start)
-    else:
+    category = AllocCategory.get_category_from_address(vdir)
+    if category == AllocCategory.TEMP_INT:
+        return "ti"+str(address_offset(vdir))
+    if category == AllocCategory.TEMP_FLOAT:
+        return "tf"+str(address_offset(vdir))
+    if category == AllocCategory.CONSTANT:
         return str(mem_mgr.constants[vdir])
+    if category == AllocCategory.IMMEDIATE:
+        return str(decode_immediate(vdir))
+    return symbol_table.get_symbol(vdir, scope_name=scope_name).name
     
 
 def parse_code(input_code, memory_manager: MemoryManager, symbol_table: SymbolTable):
@@ -63,7 +70,267 @@ def parse_code(input_code, memory_manager: MemoryManager, symbol_table: SymbolTa
         print(f"Parsing failed: {e}")
         raise e  # Re-raise the exception for further handling
 
+# Programas con errores de sintaxis; todos los frontends deben reportarlos igual
+SYNTAX_ERROR_SAMPLES = [
+    "",
+    "program x; main { x = ; } end",
+    "program x; main { x = 1 $ 2; } end",
+    "program x; main { x = 1; }",
+    "program x; main { x = 1; } end end",
+    "program x; var y: foo; main { } end",
+    "program x; y: int; main { } end",
+    "program x; main { if (x < 1 < 2) { }; } end",
+    "program x; main { x = 1..2; } end",
+    "program 1x; main { } end",
+    "program x; main { x = \"abc; } end",
+    "program x; main { if (x) { } foo; } end",
+    "program x; var a: int; void f() [ main { } ]; main { } end",
+    "program x; main { x = - - 1; } end",
+    "program x; main { x = -(1); } end",
+    "program x; main { f(1,); } end",
+    "program x;\nmain {\n\tx = 1 !! 2; } end",
+    "program x; main { while (1) { }; } end",
+    "program x; main { print(); } end",
+]
+
+def statement_positions(program):
+    """(node type, line, column) of every statement, in source order."""
+    positions = []
+    bodies = [program.body] + [func.body for func in program.funcs]
+    while bodies:
+        body = bodies.pop(0)
+        for statement in body.statements:
+            positions.append((type(statement).__name__, statement.line, statement.column))
+            if isinstance(statement, Condition):
+                bodies += [statement.if_body] + ([statement.else_body] if statement.else_body else [])
+            elif isinstance(statement, Cycle):
+                bodies.append(statement.body)
+    return positions
+
+def compare_frontends(source_dirs, frontends=FRONTENDS):
+    """
+    Parse every .baby file in source_dirs with each frontend and check that
+    they all produce the same Program tree, with the same statement
+    positions. Returns the mismatching files.
+    """
+    mismatches = []
+    for source_dir in source_dirs:
+        for filename in sorted(os.listdir(source_dir)):
+            if not filename.endswith(".baby"):
+                continue
+            input_filename = os.path.join(source_dir, filename)
+            with open(input_filename, 'r', encoding='utf-8') as input_file:
+                program = input_file.read()
+
+            expected = parse_program(program, frontend=frontends[0])
+            for frontend in frontends[1:]:
+                got = parse_program(program, frontend=frontend)
+                if got != expected:
+                    mismatches.append(f"{input_filename} ({frontends[0]} != {frontend})")
+                elif statement_positions(got) != statement_positions(expected):
+                    mismatches.append(f"{input_filename} (positions: {frontends[0]} != {frontend})")
+    return mismatches
+
+def compare_frontend_errors(samples, frontends=FRONTENDS):
+    """
+    Check that every frontend rejects each sample with the same kind of
+    UnexpectedInput at the same line and column. Returns the mismatches.
+    """
+    def describe(program, frontend):
+        try:
+            parse_program(program, frontend=frontend)
+            return "accepted"
+        except Exception as e:
+            # The standalone frontend raises its own copy of lark's exceptions
+            return f"{type(e).__name__} at {getattr(e, 'line', '?')}:{getattr(e, 'column', '?')}"
+
+    mismatches = []
+    for program in samples:
+        expected = describe(program, frontends[0])
+        for frontend in frontends[1:]:
+            got = describe(program, frontend)
+            if got != expected:
+                mismatches.append(f"{program!r}: {frontends[0]} {expected}, {frontend} {got}")
+    return mismatches
+
+def compile_program(program, frontend="lark", optimize=True):
+    """Compile program like gen_obj() does; returns the interpreter, symbol table and memory manager."""
+    memory_manager = MemoryManager()
+    symbol_table = SymbolTable(memory_manager=memory_manager)
+    baby_interpreter = BabyInterpreter(symbol_table, memory_manager=memory_manager)
+    baby_interpreter.generate_quads(parse_program(program, frontend=frontend))
+    if optimize:
+        optimizer.optimize(QuadProgram(baby_interpreter.quads, symbol_table, memory_manager, baby_interpreter.debug_info))
+    TempAllocator(baby_interpreter.quads, symbol_table.scopes).allocate()
+    return baby_interpreter, symbol_table, memory_manager
+
+def compile_fingerprint(program, frontend="lark"):
+    """Everything a compile produces that ends up in the object file."""
+    baby_interpreter, symbol_table, memory_manager = compile_program(program, frontend)
+    quads = [
+        (quad.op_vdir, quad.vdir1, quad.vdir2, quad.storage_vdir, quad.label, quad.scope)
+        for quad in baby_interpreter.quads
+    ]
+    return quads, dict(memory_manager.constants), symbol_table.to_string()
+
+# Programas para comparar la salida con y sin optimizador; cubren los casos
+# donde doblar constantes podria cambiar el resultado
+OPTIMIZER_SAMPLES = [
+    "program x; var a: int; main { a = 7 / 2; print(a, 7 / 2.0, -7 / 2, 1 - 2 * 3); } end",
+    "program x; var a: int; x: float; main { x = 7 / 2; a = 2; x = x + a / 4; print(x, 0.1 + 0.2, 3.0 * 2); } end",
+    "program x; var a: int; main { a = 0; print(1 / a); } end",
+    "program x; var a: int; main { a = 3; print(a / 0); } end",
+    "program x; var a: int; main { a = 3; print(a / (a - 3)); } end",
+    "program x; var x: float; main { x = 0.0; x = -x; print(x, 0.0 * -1, -0.0); } end",
+    "program x; var a: int; main { a = 99999 * 99999; a = a * a; print(a, a * a); } end",
+    "program x; var a: int; main { a = 1; if (a > 0) { print(\"si\"); } else { print(\"no\"); }; if (a < 0) { print(1); }; } end",
+    "program x; var a: int; main { a = 0; while (a < 3) do { a = a + 1; print(a); }; while (1 < 0) do { print(a); }; } end",
+    "program x; var a, b: int; void f(p: int) [ { a = a + p; } ]; main { a = 1; b = a + 1; f(10); print(a + 1, b); } end",
+    "program x; var a: int; void f(p: int, q: float) [ var t: int; { t = 2; print(p, q, t * 3, p + t); } ]; "
+    "main { a = 4; f(a + 1, a); f(2 * 3, 1.5 / 2); } end",
+    "program x; var a: int; x: float; main { a = 5; x = a; print(x, a < 5, a > 4.5, a != 5.0, 2.5 > 2); } end",
+    "program x; var a, b: int; main { a = 1; b = a; while (b < 4) do { b = b + a; }; print(b); } end",
+    "program x; var i, j: int; main { i = 0; while (i < 6) do { if (i > 2) { if (i > 4) { print(i); } "
+    "else { print(0 - i); }; } else { print(i * 10); }; i = i + 1; }; } end",
+    "program x; var n: int; void f(k: int) [ var i, j: int; { i = 0; while (i < k) do { j = 0; "
+    "while (j < i) do { j = j + 1; if (j > 1) { print(i, j); }; }; i = i + 1; }; if (1 > 2) { print(k); }; } ]; "
+    "main { n = 4; f(n); if (n > 3) { } else { print(n); }; } end",
+    "program x; var a, b, c, d: int; void f(p: int) [ { a = a + p; } ]; "
+    "main { a = 1; b = 2; print(a + b); f(5); print(a + b); c = a + b; a = 0; d = a + b; print(c, d, a * b, b * a); } end",
+    "program x; var a, b, c: int; void g(p: int, q: int, r: float) [ var t: int; { t = p * q; print(p, q, r, t); } ]; "
+    "main { a = 2; b = 3; c = (a + b) * (a - b); g(a + b, (a - b) * (a + b), a + b); g(a + b, c, a + b); "
+    "print((a * b) + (a * b) * (a * b), c); } end",
+    "program x; var x, y: float; a: int; main { a = 3; x = a; y = a; x = x / 0.5; print(x * y, y * x, x / y, y / x); } end",
+    "program x; var a, b, c, d: int; void f(p: int) [ { print(p); } ]; void g(p: int) [ { a = p; b = p + 1; } ]; "
+    "main { g(3); c = a + b; d = a * b; f(a * b + (c - d)); } end",
+    "program x; var a, b: int; main { a = 5; b = a * 2; a = 6; b = 1; print(a + b); a = a + 1; a = a + 1; print(a); } end",
+    "program x; var a, b: int; main { a = b + 1; a = 2; print(a); } end",
+    "program x; var a, b: int; main { a = 0; b = 7 / a; b = 1; print(b); } end",
+    "program x; var a, b: int; x: float; main { a = 99999 * 99999 * 99999; a = a * a * a * a * a * a * a * a * a * a * a; "
+    "a = a * a * a * a * a * a * a * a; x = a; x = 1.5; print(x); } end",
+    "program x; var a, b: int; void f(p: int) [ { print(a + p); } ]; main { a = 1; b = a + 2; a = b; f(b); a = 3; } end",
+    "program x; var a, b: int; main { a = 1; while (a < 20) do { b = a; a = a + a; if (1 > 0) { b = b + 1; }; }; "
+    "print(a); } end",
+    "program x; var i, n, a, b: int; x: float; main { i = 0; n = 3; a = 2; b = 5; "
+    "while (i < n * 2) do { x = a * b + i; print(x, a + b, (a + b) * i); i = i + 1; }; print(x); } end",
+    "program x; var i, a, b, c, d: int; main { a = 0; i = 5; while (i < 3) do { b = 7 / a; c = d + 1; i = i + 1; }; "
+    "print(i); while (i < 6) do { c = a + 1; i = i + 1; }; print(c); } end",
+    "program x; var i, c, d: int; main { i = 5; c = 1; while (i < 3) do { c = i * 0 + 4; d = c + 1; i = i + 1; }; "
+    "print(c); } end",
+    "program x; var i, j, n, s: int; main { i = 0; n = 4; s = 0; while (i < n) do { j = 0; "
+    "while (j < n + 1) do { s = s + n * n + i; if (j > 1) { s = s - n * 2; } else { s = s + 1; }; j = j + 1; }; "
+    "i = i + 1; }; print(s); } end",
+    "program x; var i, g: int; void f(p: int) [ { g = g + p; } ]; main { i = 0; g = 1; "
+    "while (i < 3) do { f(g * 2); print(g * 2, i * 3); i = i + 1; }; } end",
+    "program x; var k: int; void f(n: int) [ var i, t: int; { while (i < n) do { t = n * 2; print(t); i = i + 1; }; } ]; "
+    "main { k = 2; f(k); } end",
+    "program x; void f(n: int) [ var i, t: int; { i = 0; while (i < n) do { t = n * 2 + i; print(t); i = i + 1; }; } ]; "
+    "main { f(2); f(0); f(3); } end",
+    "program x; var i, j: int; x, y: float; main { i = 0; x = 1.5; while (i < 3) do { j = 0; "
+    "while (j < 2) do { y = x * 2.0 + j; j = j + 1; print(y, x * x, i + 1); }; i = i + 1; }; } end",
+]
+
+def run_program(program, optimize=True):
+    """
+    Compile and run program; returns (output, error, quads, instructions run).
+
+    Error messages lose the instruction index, which differs between the two
+    compiles, but keep the source position.
+    """
+    baby_interpreter, symbol_table, memory_manager = compile_program(program, optimize=optimize)
+    obj_data = ObjData(ObjectFileMetadata("optimizer", ""), memory_manager.constants,
+                       build_function_descriptors(symbol_table, memory_manager), baby_interpreter.quads,
+                       debug_info=baby_interpreter.debug_info)
+    vm = BabyVirtualMachine(obj_data)
+    output = io.StringIO()
+    error = None
+    try:
+        with contextlib.redirect_stdout(output):
+            vm.run()
+    except Exception as e:
+        error = re.sub(r"instruction \d+", "instruction", str(e))
+    return output.getvalue(), error, len(baby_interpreter.quads), vm.instructions_executed
+
+def compare_optimizer(source_dirs, samples=OPTIMIZER_SAMPLES):
+    """
+    Run every .baby file in source_dirs and every sample compiled with and
+    without the optimizer, and check both print the same and fail the same
+    way. Returns the mismatches and the (quads, instructions run) totals of
+    each compile.
+    """
+    programs = []
+    for source_dir in source_dirs:
+        for filename in sorted(os.listdir(source_dir)):
+            if filename.endswith(".baby"):
+                with open(os.path.join(source_dir, filename), 'r', encoding='utf-8') as input_file:
+                    programs.append((os.path.join(source_dir, filename), input_file.read()))
+    programs += [(f"sample {i}", program) for i, program in enumerate(samples)]
+
+    mismatches = []
+    totals = {False: [0, 0], True: [0, 0]}
+    for name, program in programs:
+        results = {}
+        for optimize in (False, True):
+            output, error, quads, executed = run_program(program, optimize)
+            results[optimize] = (output, error)
+            totals[optimize][0] += quads
+            totals[optimize][1] += executed
+        if results[True] != results[False]:
+            mismatches.append(f"{name}: {results[False]!r} != {results[True]!r}")
+    return mismatches, totals
+
+def stress_concurrent_compiles(source_dirs, threads=8, rounds=4, frontend="lark"):
+    """
+    Compile every .baby file in source_dirs serially, then `rounds` more times
+    at once from a thread pool, and check every concurrent compile produced
+    the same output as the serial one. Returns the mismatching files.
+    """
+    programs = {}
+    for source_dir in source_dirs:
+        for filename in sorted(os.listdir(source_dir)):
+            if filename.endswith(".baby"):
+                with open(os.path.join(source_dir, filename), 'r', encoding='utf-8') as input_file:
+                    programs[os.path.join(source_dir, filename)] = input_file.read()
+
+    expected = {path: compile_fingerprint(program, frontend) for path, program in programs.items()}
+
+    jobs = [path for _ in range(rounds) for path in programs]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = executor.map(lambda path: compile_fingerprint(programs[path], frontend), jobs)
+        mismatches = sorted({path for path, result in zip(jobs, results) if result != expected[path]})
+    return mismatches
+
 if __name__ == "__main__":
+    # python BabyTester.py --stress
+    # Compila ./input y ./tests en paralelo desde varios hilos y compara con la compilacion en serie
+    if len(sys.argv) > 1 and sys.argv[1] == "--stress":
+        mismatches = stress_concurrent_compiles(["./input", "./tests"])
+        for mismatch in mismatches:
+            print(f"Concurrent compile mismatch: {mismatch}")
+        print("Concurrent compiles match serial compiles" if not mismatches else f"{len(mismatches)} mismatches")
+        sys.exit(1 if mismatches else 0)
+
+    # python BabyTester.py --frontends
+    # Verifica que todos los frontends generen el mismo arbol para ./input y ./tests
+    if len(sys.argv) > 1 and sys.argv[1] == "--frontends":
+        mismatches = compare_frontends(["./input", "./tests"])
+        mismatches += compare_frontend_errors(SYNTAX_ERROR_SAMPLES)
+        for mismatch in mismatches:
+            print(f"Frontend mismatch: {mismatch}")
+        print("Frontends agree" if not mismatches else f"{len(mismatches)} mismatches")
+        sys.exit(1 if mismatches else 0)
+
+    # python BabyTester.py --optimizer
+    # Ejecuta ./input, ./tests y OPTIMIZER_SAMPLES con y sin optimizador y compara la salida
+    if len(sys.argv) > 1 and sys.argv[1] == "--optimizer":
+        mismatches, totals = compare_optimizer(["./input", "./tests"])
+        for mismatch in mismatches:
+            print(f"Optimizer mismatch: {mismatch}")
+        print(f"Quads: {totals[False][0]} -> {totals[True][0]}, "
+              f"instructions run: {totals[False][1]} -> {totals[True][1]}")
+        print("Optimized programs behave the same" if not mismatches else f"{len(mismatches)} mismatches")
+        sys.exit(1 if mismatches else 0)
+
     # Toma todos los archivos de la carpeta ./tests, realiza el parseo y guarda
     # el output en un archivo .out por cada uno de los archivos .baby
     # en la carpeta ./output
@@ -1,6 +1,5 @@
 from typing import cast, List
 from lark import Transformer, v_args
-from lark import Lark
 
 from custom_classes.tree_nodes import *
 from custom_classes.memory import Operations
@@ -19,18 +18,18 @@ class BabyTransformer(Transformer):
     """
 
     def program_no_vars_no_funcs(self, *args):
-        return Program(id=args[1], vars=None, funcs=[], body=args[-2])  
+        return Program(id=str(args[1]), vars=None, funcs=[], body=args[-2])  
     
     def program_no_vars(self, *args):
-        funcs = cast(List[Function], args[3:-3])
-        return Program(id=args[1], vars=None, funcs=funcs, body=args[-2])
+        funcs = cast(List[Function], list(args[3:-3]))
+        return Program(id=str(args[1]), vars=None, funcs=funcs, body=args[-2])
     
     def program_no_funcs(self, *args):
-        return Program(id=args[1], vars=args[3], funcs=[], body=args[-2])
+        return Program(id=str(args[1]), vars=args[3], funcs=[], body=args[-2])
     
     def program_all(self, *args):
-        funcs = cast(List[Function], args[4:-3])
-        return Program(id=args[1], vars=args[3], funcs=funcs, body=args[-2])
+        funcs = cast(List[Function], list(args[4:-3]))
+        return Program(id=str(args[1]), vars=args[3], funcs=funcs, body=args[-2])
 
     """
     ?statement: assign -> statement_assign
@@ -58,7 +57,7 @@ class BabyTransformer(Transformer):
     assign: ID EQUAL expression SEMICOLON
     """
     def assign(self, *args):
-        return Assign(id=args[0], expr=args[2])
+        return Assign(id=str(args[0]), expr=args[2], line=args[0].line, column=args[0].column)
 
     """
     vars: VAR (var_declaration)+
@@ -66,17 +65,17 @@ class BabyTransformer(Transformer):
         | ID (COMMA ID)+ COLON type_ SEMICOLON -> var_declaration_multiple
     """
     def vars(self, var_token, *declarations):
-        decls = cast(List[VarDeclaration], declarations)
+        decls = cast(List[VarDeclaration], list(declarations))
         return Vars(declarations=decls)
     
     def var_declaration_single(self, *args):
-        return VarDeclaration(type_ = args[-2], names=[args[0]])
+        return VarDeclaration(type_ = args[-2], names=[str(args[0])])
     
     def var_declaration_multiple(self, *args):
-        var_list = [args[0]]
+        var_list = [str(args[0])]
         for i in range(2, len(args)-3, 2):
             id = args[i]
-            var_list.append(id)
+            var_list.append(str(id))
         return VarDeclaration(type_ = args[-2], names=var_list)
 
 
@@ -87,16 +86,16 @@ class BabyTransformer(Transformer):
             | (VOID | type_) ID OPEN_PAREN params CLOSE_PAREN OPEN_BRACKET vars body CLOSE_BRACKET SEMICOLON -> funcs_all
     """
     def funcs_no_params_no_vars(self, *args):
-        return Function(id=args[1], params=[], vars=None, body=args[-3])
+        return Function(id=str(args[1]), params=[], vars=None, body=args[-3])
     
     def funcs_no_params(self, *args):
-        return Function(id=args[1], params=[], vars=args[-4], body=args[-3])
+        return Function(id=str(args[1]), params=[], vars=args[-4], body=args[-3])
     
     def funcs_no_vars(self, *args):
-        return Function(id=args[1], params=args[3], vars=None, body=args[6])
+        return Function(id=str(args[1]), params=args[3], vars=None, body=args[6])
     
     def funcs_all(self, *args):
-        return Function(id=args[1], params=args[3], vars=args[6], body=args[7])
+        return Function(id=str(args[1]), params=args[3], vars=args[6], body=args[7])
 
 
     """
@@ -104,14 +103,14 @@ class BabyTransformer(Transformer):
             | ID COLON type_ (COMMA ID COLON type_)+ -> params_multiple
     """
     def params_single(self, id, _, type_):
-        return [Param(name=id, type_=type_)]
+        return [Param(name=str(id), type_=type_)]
     
     def params_multiple(self, first_id, _, first_type, *rest):
-        params = [Param(name=first_id, type_=first_type)]
+        params = [Param(name=str(first_id), type_=first_type)]
         for i in range(0, len(rest), 4):
             id = rest[i+1]
             type_ = rest[i+3]
-            params.append(Param(name=id, type_=type_))
+            params.append(Param(name=str(id), type_=type_))
         return params
     
 
@@ -122,11 +121,11 @@ class BabyTransformer(Transformer):
             | expression (COMMA expression)+ -> arguments_multiple
     """
     def f_call_no_args(self, id):
-        return FCall(id=id, args=[])
+        return FCall(id=str(id), args=[], line=id.line, column=id.column)
     
     def f_call_with_args(self, id, *rest):
         args = cast(List[Expression], rest[1])
-        return FCall(id=id, args=args)
+        return FCall(id=str(id), args=args, line=id.line, column=id.column)
     
     def arguments_single(self, expr):
         return [expr]
@@ -144,14 +143,14 @@ class BabyTransformer(Transformer):
             | ESCAPED_STRING -> print_string
     """
     def print_single(self, *args):
-        return Print(contents=[args[2]])
+        return Print(contents=[args[2]], line=args[0].line, column=args[0].column)
     
     def print_multiple(self, *args):
         print_contents = [args[2]]
         for i in range(3, len(args)-2, 2):
             print_contents.append(args[i+1])
             
-        return Print(contents=print_contents)
+        return Print(contents=print_contents, line=args[0].line, column=args[0].column)
     
     def print_expression(self, expr):
         return expr
@@ -164,16 +163,16 @@ class BabyTransformer(Transformer):
             | IF OPEN_PAREN expression CLOSE_PAREN body (ELSE body) SEMICOLON -> condition_else
     """
     def condition_if(self, *args):
-        return Condition(expr=args[2], if_body=args[-2], else_body=None)
+        return Condition(expr=args[2], if_body=args[-2], else_body=None, line=args[0].line, column=args[0].column)
     
     def condition_else(self, *args):
-        return Condition(expr=args[2], if_body=args[-4], else_body=args[-2])
+        return Condition(expr=args[2], if_body=args[-4], else_body=args[-2], line=args[0].line, column=args[0].column)
 
     """
     cycle: WHILE OPEN_PAREN expression CLOSE_PAREN DO body SEMICOLON
     """
     def cycle(self, *args):
-        return Cycle(expr=args[2], body=args[-2])
+        return Cycle(expr=args[2], body=args[-2], line=args[0].line, column=args[0].column)
 
     """
     ?body: OPEN_KEY CLOSE_KEY -> body_empty
@@ -183,7 +182,7 @@ class BabyTransformer(Transformer):
         return Body(statements=[])
     
     def body_block(self, *statements):
-        statements = cast(List[Statement], statements[1:-1])
+        statements = cast(List[Statement], list(statements[1:-1]))
         return Body(statements=statements)
     
 
@@ -208,7 +207,7 @@ class BabyTransformer(Transformer):
         | term ((SUB | ADD) term)+ -> exp_compound
     """
     def exp_simple(self, term):
-        return Exp(left_term=term, operations=[])
+        return Exp(left_term=term)
     
     def exp_compound(self, *terms):
         opers = []
@@ -219,14 +218,14 @@ class BabyTransformer(Transformer):
                 op = Operations.MINUS
             term = terms[i+1]
             opers.append((op, term))
-        return Exp(left_term=terms[0], operations=opers)
+        return Exp(left_term=terms[0], operations=tuple(opers))
 
     """
     ?term: factor -> term_simple
         | factor ((MULT | DIV) factor)+ -> term_compound
     """
     def term_simple(self, factor):
-        return Term(left_factor=factor, operations=[])
+        return Term(left_factor=factor)
     
     def term_compound(self, *factors):
         opers = []
@@ -237,7 +236,7 @@ class BabyTransformer(Transformer):
                 op = Operations.DIV
             term = factors[i+1]
             opers.append((op, term))
-        return Term(left_factor=factors[0], operations=opers)
+        return Term(left_factor=factors[0], operations=tuple(opers))
     
     """
     ?factor: OPEN_PAREN expression CLOSE_PAREN -> factor_expression
@@ -255,19 +254,19 @@ class BabyTransformer(Transformer):
         return Factor(value=cte, sign='+')
 
     def factor_id(self, id):
-        return Factor(value=id, sign='+')
+        return Factor(value=str(id), sign='+')
 
     def factor_cte_add(self, add, cte):
         return Factor(value=cte, sign='+')
 
     def factor_id_add(self, add, id):
-        return Factor(value=id, sign='+')
+        return Factor(value=str(id), sign='+')
 
     def factor_cte_sub(self, sub, cte):
         return Factor(value=cte, sign='-')
 
     def factor_id_sub(self, sub, id):
-        return Factor(value=id, sign='-')
+        return Factor(value=str(id), sign='-')
 
     
     """
@@ -277,6 +276,9 @@ class BabyTransformer(Transformer):
     cte: INT -> int
             | FLOAT -> float
     ID: CNAME
+
+    ID tokens are left as lark Tokens so statements can read their line and
+    column; nodes store them as plain str.
     """
     def type_int(self):
         return "int"
@@ -290,15 +292,11 @@ class BabyTransformer(Transformer):
     def float(self, value):
         return float(value)
     
-    def ID(self, id):
-        return str(id)
-    
     def comparison_op(self, op):
         return str(op)
     
     
 # Load the grammar and create the parser
 def get_parser():
-    with open("grammar.lark", "r") as f:
-        grammar = f.read()
-    return Lark(grammar, parser="lalr", transformer=BabyTransformer())
\ No newline at end of file
+    from BabyParser import get_parser as get_shared_parser
+    return get_shared_parser(transformer=BabyTransformer())
\ No newline at end of file
@@ -1,8 +1,9 @@
 import sys
 from typing import Dict, List, Any, Optional, Tuple, Callable
 
-from custom_classes.memory import AllocCategory, Operations
-from custom_classes.classes import Quad
+from custom_classes.memory import AllocCategory, Operations, CATEGORY_SHIFT, IMMEDIATE_CODE, address_type_code, decode_immediate
+from custom_classes.values import TYPE_FLOAT
+from custom_classes.classes import NO_OPERAND
 
 from read_obj import read_obj_file, ObjData
 
@@ -19,6 +20,11 @@ class BabyVirtualMachine:
     def __init__(self, obj_data: ObjData):
         self.obj_data = obj_data
         self.quads = obj_data.quads
+        # The VM runs straight off the columns of one code segment at a time,
+        # see enter_segment(); an empty range makes the first quad load one
+        self.segment_start = self.segment_end = 0
+        self.op_vdir = self.vdir1 = self.vdir2 = self.storage_vdir = None
+        self.labels = self.quads.labels
         self.constants = obj_data.constants
         self.functions = obj_data.functions
         
@@ -26,6 +32,8 @@ class BabyVirtualMachine:
         self.call_stack: List[ActivationRecord] = []
         
         self.instruction_pointer = 0
+        # Quads run by the last run(), for comparing the code different compiles produce
+        self.instructions_executed = 0
         
         self.operations = {
             Operations.PLUS.value: self._op_plus,
@@ -52,6 +60,8 @@ class BabyVirtualMachine:
         """Get a value from the appropriate memory segment"""
         if address is None:
             raise ValueError("Cannot access memory with None address")
+        if address >> CATEGORY_SHIFT == IMMEDIATE_CODE:
+            return decode_immediate(address)
 
         try:
             category = AllocCategory.get_category_from_address(address)
@@ -66,7 +76,7 @@ class BabyVirtualMachine:
                     raise ValueError(f"No active function context for {category.name} memory")
 
                 ar = self.call_stack[-1]
-                memory = ar.temp_memory if category in (AllocCategory.TEMP_INT, AllocCategory.TEMP_FLOAT) else ar.local_memory
+                memory = ar.temp_memory if category.is_temp else ar.local_memory
                 
                 if address in memory:
                     return memory[address]
@@ -88,17 +98,17 @@ class BabyVirtualMachine:
         try:
             category = AllocCategory.get_category_from_address(address)
             
-            if category == AllocCategory.CONSTANT:
+            if category in (AllocCategory.CONSTANT, AllocCategory.IMMEDIATE):
                 raise ValueError(f"Cannot modify constant at address {address}")
             
-            value_to_store = float(value) if category.is_float else int(value)
+            value_to_store = float(value) if address_type_code(address) == TYPE_FLOAT else int(value)
             
             if category.is_local:
                 if not self.call_stack:
                     raise ValueError(f"No active function context for {category.name} memory")
                 
                 ar = self.call_stack[-1]
-                if category in (AllocCategory.TEMP_INT, AllocCategory.TEMP_FLOAT):
+                if category.is_temp:
                     ar.temp_memory[address] = value_to_store
                 else:
                     ar.local_memory[address] = value_to_store
@@ -109,127 +119,158 @@ class BabyVirtualMachine:
         except ValueError as e:
             raise ValueError(f"Memory write error: {str(e)}")
     
-    def validate_operation_args(self, quad: Quad, required_args: Tuple[str, ...]) -> None:
-        """Validate that required arguments are present in the quadruple"""
+    def validate_operation_args(self, i: int, required_args: Tuple[str, ...]) -> None:
+        """Validate that required arguments are present in quadruple i"""
         for arg_name in required_args:
-            if getattr(quad, arg_name) is None:
-                raise ValueError(f"Missing required argument: {arg_name} for operation {Operations(quad.op_vdir).name}")
+            if arg_name == 'label':
+                missing = self.instruction_pointer not in self.labels
+            else:
+                missing = getattr(self, arg_name)[i] == NO_OPERAND
+            if missing:
+                raise ValueError(f"Missing required argument: {arg_name} for operation {Operations(self.op_vdir[i]).name}")
     
+    def enter_segment(self, quad_index: int) -> None:
+        """Run from the code segment holding quad_index, which a lazily loaded object file maps in on first use."""
+        (self.segment_start, self.segment_end,
+         self.op_vdir, self.vdir1, self.vdir2, self.storage_vdir) = self.quads.segment_at(quad_index)
+
     def run(self) -> None:
-        """Execute the program"""
+        """
+        Execute the program.
+
+        Handlers get the quad's index within the current segment's columns;
+        instruction_pointer, jump targets and labels are program-wide indices.
+        """
         self.instruction_pointer = 0
+        quad_count = len(self.quads)
+        operations = self.operations
+        jumps = {Operations.GOTO.value, Operations.GOTOF.value,
+                 Operations.GOSUB.value, Operations.ENDFUNC.value,
+                 Operations.END.value}
         
-        while self.instruction_pointer < len(self.quads):
-            quad = self.quads[self.instruction_pointer]
-            
-            if quad.op_vdir in self.operations:
-                try:
-                    self.operations[quad.op_vdir](quad)
-                except Exception as e:
-                    raise RuntimeError(f"Error executing instruction {self.instruction_pointer}: {e}")
-            else:
-                raise ValueError(f"Unknown operation code: {quad.op_vdir}")
-                
-            if quad.op_vdir not in [Operations.GOTO.value, Operations.GOTOF.value, 
-                                   Operations.GOSUB.value, Operations.ENDFUNC.value,
-                                   Operations.END.value]:
-                self.instruction_pointer += 1
+        executed = 0
+        try:
+            while self.instruction_pointer < quad_count:
+                ip = self.instruction_pointer
+                if not self.segment_start <= ip < self.segment_end:
+                    self.enter_segment(ip)
+                i = ip - self.segment_start
+                op_vdir = self.op_vdir[i]
+                executed += 1
+
+                if op_vdir in operations:
+                    try:
+                        operations[op_vdir](i)
+                    except Exception as e:
+                        raise RuntimeError(f"Error executing instruction {ip}{self.describe_position(ip)}: {e}")
+                else:
+                    raise ValueError(f"Unknown operation code: {op_vdir}")
+
+                if op_vdir not in jumps:
+                    self.instruction_pointer += 1
+        finally:
+            self.instructions_executed = executed
+
+    def describe_position(self, quad_index: int) -> str:
+        """Source position of a quad for error messages, empty when unknown."""
+        # Object files written before the debug table existed have no debug_info
+        debug_info = getattr(self.obj_data, "debug_info", None)
+        position = debug_info.lookup(quad_index) if debug_info is not None else None
+        if position is None:
+            return ""
+        return f" (line {position[0]}, column {position[1]})"
 
-    def _execute_binary_operation(self, quad: Quad, operation: Callable[[Any, Any], Any]) -> None:
+    def _execute_binary_operation(self, i: int, operation: Callable[[Any, Any], Any]) -> None:
         """Execute a binary operation with the given function"""
-        self.validate_operation_args(quad, ('vdir1', 'vdir2', 'storage_vdir'))
-        val1 = self.get_memory_value(quad.vdir1)
-        val2 = self.get_memory_value(quad.vdir2)
+        self.validate_operation_args(i, ('vdir1', 'vdir2', 'storage_vdir'))
+        val1 = self.get_memory_value(self.vdir1[i])
+        val2 = self.get_memory_value(self.vdir2[i])
         result = operation(val1, val2)
-        self.set_memory_value(quad.storage_vdir, result)
+        self.set_memory_value(self.storage_vdir[i], result)
     
-    def _op_plus(self, quad: Quad) -> None:
-        self._execute_binary_operation(quad, lambda a, b: a + b)
+    def _op_plus(self, i: int) -> None:
+        self._execute_binary_operation(i, lambda a, b: a + b)
     
-    def _op_minus(self, quad: Quad) -> None:
-        self._execute_binary_operation(quad, lambda a, b: a - b)
+    def _op_minus(self, i: int) -> None:
+        self._execute_binary_operation(i, lambda a, b: a - b)
     
-    def _op_mult(self, quad: Quad) -> None:
-        self._execute_binary_operation(quad, lambda a, b: a * b)
+    def _op_mult(self, i: int) -> None:
+        self._execute_binary_operation(i, lambda a, b: a * b)
     
-    def _op_div(self, quad: Quad) -> None:
-        self._execute_binary_operation(quad, lambda a, b: a / b if b != 0 else (_ for _ in ()).throw(ZeroDivisionError("Division by zero")))
+    def _op_div(self, i: int) -> None:
+        self._execute_binary_operation(i, lambda a, b: a / b if b != 0 else (_ for _ in ()).throw(ZeroDivisionError("Division by zero")))
     
-    def _execute_comparison(self, quad: Quad, comparison: Callable[[Any, Any], bool]) -> None:
+    def _execute_comparison(self, i: int, comparison: Callable[[Any, Any], bool]) -> None:
         """Execute a comparison operation with the given function"""
-        self.validate_operation_args(quad, ('vdir1', 'vdir2', 'storage_vdir'))
-        val1 = self.get_memory_value(quad.vdir1)
-        val2 = self.get_memory_value(quad.vdir2)
+        self.validate_operation_args(i, ('vdir1', 'vdir2', 'storage_vdir'))
+        val1 = self.get_memory_value(self.vdir1[i])
+        val2 = self.get_memory_value(self.vdir2[i])
         result = 1 if comparison(val1, val2) else 0
-        self.set_memory_value(quad.storage_vdir, result)
+        self.set_memory_value(self.storage_vdir[i], result)
     
-    def _op_less_than(self, quad: Quad) -> None:
-        self._execute_comparison(quad, lambda a, b: a < b)
+    def _op_less_than(self, i: int) -> None:
+        self._execute_comparison(i, lambda a, b: a < b)
     
-    def _op_greater_than(self, quad: Quad) -> None:
-        self._execute_comparison(quad, lambda a, b: a > b)
+    def _op_greater_than(self, i: int) -> None:
+        self._execute_comparison(i, lambda a, b: a > b)
     
-    def _op_not_equal(self, quad: Quad) -> None:
-        self._execute_comparison(quad, lambda a, b: a != b)
+    def _op_not_equal(self, i: int) -> None:
+        self._execute_comparison(i, lambda a, b: a != b)
     
-    def _op_assign(self, quad: Quad) -> None:
-        self.validate_operation_args(quad, ('vdir1', 'vdir2'))
-        val = self.get_memory_value(quad.vdir2)
-        self.set_memory_value(quad.vdir1, val)
+    def _op_assign(self, i: int) -> None:
+        self.validate_operation_args(i, ('vdir1', 'vdir2'))
+        val = self.get_memory_value(self.vdir2[i])
+        self.set_memory_value(self.vdir1[i], val)
     
-    def _op_print(self, quad: Quad) -> None:
-        self.validate_operation_args(quad, ('vdir1',))
-        val = self.get_memory_value(quad.vdir1)
+    def _op_print(self, i: int) -> None:
+        self.validate_operation_args(i, ('vdir1',))
+        val = self.get_memory_value(self.vdir1[i])
         print(val)
     
-    def _op_gotof(self, quad: Quad) -> None:
-        self.validate_operation_args(quad, ('vdir1', 'vdir2'))
-        condition = self.get_memory_value(quad.vdir1)
+    def _op_gotof(self, i: int) -> None:
+        self.validate_operation_args(i, ('vdir1', 'vdir2'))
+        condition = self.get_memory_value(self.vdir1[i])
         if condition == 0:
-            assert quad.vdir2 is not None, "GOTOF requires a valid vdir2"
-            self.instruction_pointer = quad.vdir2
+            self.instruction_pointer = self.vdir2[i]
         else:
             self.instruction_pointer += 1
     
-    def _op_goto(self, quad: Quad) -> None:
-        self.validate_operation_args(quad, ('vdir1',))
-        assert quad.vdir1 is not None, "GOTO requires a valid vdir1"
-        self.instruction_pointer = quad.vdir1
+    def _op_goto(self, i: int) -> None:
+        self.validate_operation_args(i, ('vdir1',))
+        self.instruction_pointer = self.vdir1[i]
     
-    def _op_end(self, quad: Quad) -> None:
+    def _op_end(self, i: int) -> None:
         self.instruction_pointer = len(self.quads)
     
-    def _op_alloc(self, quad: Quad) -> None:
+    def _op_alloc(self, i: int) -> None:
         # No validation needed - just a no-op for VM
         pass
     
-    def _op_param(self, quad: Quad) -> None:
-        self.validate_operation_args(quad, ('vdir1',))
-        val = self.get_memory_value(quad.vdir1)
+    def _op_param(self, i: int) -> None:
+        self.validate_operation_args(i, ('vdir1',))
+        val = self.get_memory_value(self.vdir1[i])
         if self.call_stack:
             self.call_stack[-1].parameters.append(val)
     
-    def _op_gosub(self, quad: Quad) -> None:
-        self.validate_operation_args(quad, ('vdir1', 'label'))
-        function_name = quad.label
+    def _op_gosub(self, i: int) -> None:
+        self.validate_operation_args(i, ('vdir1', 'label'))
+        function_name = self.labels.get(self.instruction_pointer)
         if function_name not in self.functions:
             raise ValueError(f"Function '{function_name}' not defined")
-        function_scope = self.functions[function_name]
+        function = self.functions[function_name]
         
         ar = ActivationRecord(function_name, self.instruction_pointer + 1)
         
         current_params = self.call_stack[-1].parameters
         self.call_stack[-1].parameters = []
         
-        for i, param in enumerate(function_scope.param_list):
-            if i < len(current_params):
-                ar.local_memory[param.vdir] = current_params[i]
+        for param_vdir, value in zip(function.param_vdirs, current_params):
+            ar.local_memory[param_vdir] = value
         
         self.call_stack.append(ar)
-        assert quad.vdir1 is not None, "GOSUB requires a valid vdir1"
-        self.instruction_pointer = quad.vdir1
+        self.instruction_pointer = self.vdir1[i]
     
-    def _op_endfunc(self, quad: Quad) -> None:
+    def _op_endfunc(self, i: int) -> None:
         if len(self.call_stack) <= 1:
             raise RuntimeError("Cannot return from global scope")
             
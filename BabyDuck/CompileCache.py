@@ -0,0 +1,257 @@
+"""
+Content-addressed cache for compiled BabyDuck programs.
+
+gen_obj() writes an object file and a listing for a program. Both are a
+pure function of the program name, its source text, the compile options,
+the grammar and the compiler itself, so they are stored under a hash of
+those inputs and copied back out on a hit without parsing or generating
+quads. An entry always has the object file, and the listing once some
+compile emitted one. Entries are evicted least recently used first once
+the cache grows past MAX_BYTES.
+
+Run `python CompileCache.py stats` for hit/miss counts and `clear` to empty it.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(
+    os.environ.get("BABYDUCK_CACHE_DIR", os.path.join(BASE_DIR, ".cache")), "objects"
+)
+MAX_BYTES = int(os.environ.get("BABYDUCK_COMPILE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+STATS_PATH = os.path.join(CACHE_DIR, "stats.json")
+STATS_LOCK_PATH = os.path.join(CACHE_DIR, "stats.lock")
+
+# Everything that changes the generated output; editing any of them starts a new cache
+COMPILER_SOURCES = [
+    "grammar.lark",
+    "BabyTransformer.py",
+    "BabyNativeParser.py",
+    "BabyInterpreter.py",
+    "SymbolTable.py",
+    "MemoryManager.py",
+    "SemanticCube.py",
+    "TempAllocator.py",
+    "gen_obj.py",
+    "obj_format.py",
+    os.path.join("optimizer", "__init__.py"),
+    os.path.join("optimizer", "program.py"),
+    os.path.join("optimizer", "constants.py"),
+    os.path.join("optimizer", "cfg.py"),
+    os.path.join("optimizer", "controlflow.py"),
+    os.path.join("optimizer", "numbering.py"),
+    os.path.join("optimizer", "dataflow.py"),
+    os.path.join("optimizer", "deadcode.py"),
+    os.path.join("optimizer", "loops.py"),
+    os.path.join("custom_classes", "classes.py"),
+    os.path.join("custom_classes", "memory.py"),
+    os.path.join("custom_classes", "tree_nodes.py"),
+    os.path.join("custom_classes", "values.py"),
+]
+
+_compiler_version: Optional[str] = None
+
+
+def compiler_version() -> str:
+    """Hash of the compiler sources, computed once per process."""
+    global _compiler_version
+    if _compiler_version is None:
+        digest = hashlib.sha256()
+        for relative_path in COMPILER_SOURCES:
+            with open(os.path.join(BASE_DIR, relative_path), "rb") as file:
+                digest.update(relative_path.encode("utf-8"))
+                digest.update(file.read())
+        _compiler_version = digest.hexdigest()
+    return _compiler_version
+
+
+def source_hash(source: str) -> str:
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def cache_key(name: str, source: str, options: str = "") -> str:
+    """
+    Key of a program; the name is part of it because it is written into the
+    output, and so are the compile options that change the output.
+    """
+    key = f"{name}\0{source_hash(source)}\0{options}\0{compiler_version()}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def entry_paths(key: str) -> Tuple[str, str]:
+    """Paths of an entry's object file and listing."""
+    return os.path.join(CACHE_DIR, key + ".obj"), os.path.join(CACHE_DIR, key + ".ovejota")
+
+
+def lookup(key: str, obj_path: Optional[str], listing_path: Optional[str]) -> bool:
+    """
+    Copy a cached entry to obj_path and listing_path, skipping either one
+    that is None.
+
+    Returns False, copying nothing, when the entry is missing, or when a
+    listing is asked for and the entry was stored without one.
+    """
+    cached_obj, cached_listing = entry_paths(key)
+    try:
+        # The mtime of the object file is the entry's last use, for LRU eviction
+        os.utime(cached_obj)
+        if listing_path is not None:
+            shutil.copyfile(cached_listing, listing_path)
+        if obj_path is not None:
+            shutil.copyfile(cached_obj, obj_path)
+    except FileNotFoundError:
+        record("misses")
+        return False
+    record("hits")
+    return True
+
+
+def store(key: str, obj_path: str, listing_path: Optional[str]) -> None:
+    """
+    Add freshly compiled outputs to the cache, then trim it to MAX_BYTES.
+    An entry always has the object file; its listing is kept from an
+    earlier store when listing_path is None.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cached_obj, cached_listing = entry_paths(key)
+    # The listing goes in first: an entry only counts once its .obj exists
+    if listing_path is not None:
+        _atomic_copy(listing_path, cached_listing)
+    _atomic_copy(obj_path, cached_obj)
+    evict(MAX_BYTES)
+
+
+def _atomic_copy(source_path: str, target_path: str) -> None:
+    # Concurrent compiles may store the same key, so never expose a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def entries() -> List[Tuple[float, int, str]]:
+    """(last use, size in bytes, key) of every entry, least recently used first."""
+    if not os.path.exists(CACHE_DIR):
+        return []
+    result = []
+    for filename in os.listdir(CACHE_DIR):
+        key, suffix = os.path.splitext(filename)
+        if suffix != ".obj":
+            continue
+        size = 0
+        for path in entry_paths(key):
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        result.append((os.path.getmtime(os.path.join(CACHE_DIR, filename)), size, key))
+    result.sort()
+    return result
+
+
+def evict(max_bytes: int) -> int:
+    """Remove least recently used entries until the cache fits max_bytes."""
+    current = entries()
+    total = sum(size for _, size, _ in current)
+    removed = 0
+    for _, size, key in current:
+        if total <= max_bytes:
+            break
+        for path in entry_paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed += 1
+    if removed:
+        record("evictions", removed)
+    return removed
+
+
+def read_stats() -> Dict[str, int]:
+    try:
+        with open(STATS_PATH, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+@contextlib.contextmanager
+def _stats_lock() -> Iterator[None]:
+    """Hold an exclusive lock on the statistics, which compile_all's worker processes update at once."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(STATS_LOCK_PATH, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def record(counter: str, amount: int = 1) -> None:
+    with _stats_lock():
+        stats = read_stats()
+        stats[counter] = stats.get(counter, 0) + amount
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            json.dump(stats, file)
+        os.replace(tmp_path, STATS_PATH)
+
+
+def clear() -> None:
+    """Delete every entry and reset the statistics."""
+    if os.path.exists(CACHE_DIR):
+        shutil.rmtree(CACHE_DIR)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "clear":
+        clear()
+        print(f"Compile cache cleared: {CACHE_DIR}")
+        return
+    if command != "stats":
+        print("Usage: python CompileCache.py [stats|clear]")
+        sys.exit(1)
+
+    stats = read_stats()
+    current = entries()
+    hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+    lookups = hits + misses
+    print(f"Cache dir: {CACHE_DIR}")
+    print(f"Entries: {len(current)} ({sum(size for _, size, _ in current) / 1024:.1f} KiB of {MAX_BYTES / 1024:.0f} KiB)")
+    print(f"Hits: {hits}")
+    print(f"Misses: {misses}")
+    print(f"Hit rate: {hits / lookups * 100:.1f}%" if lookups else "Hit rate: -")
+    print(f"Evictions: {stats.get('evictions', 0)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
-from typing import Dict, Literal, Optional, Union, List
-from custom_classes.memory import DATA_RANGES, AllocCategory
-from custom_classes.values import ConstantValue
+from typing import Dict, Literal, Optional, Union, List, Tuple
+from custom_classes.memory import MEMORY_LAYOUT, TYPE_SHIFT, AllocCategory, address_type_code, build_address_ranges, format_address, make_immediate
+from custom_classes.values import ConstantValue, TYPE_FLOAT, TYPE_STR, TYPE_NAMES
 
 
 class MemoryManager:
-    def __init__(self):
-        self.address_ranges = DATA_RANGES
+    def __init__(self, layout: Optional[Dict[AllocCategory, Tuple[int, int]]] = None, use_immediates: bool = True):
+        # Each manager owns its ranges, so compiles in one process never share counters
+        self.address_ranges = build_address_ranges(layout if layout is not None else MEMORY_LAYOUT)
 
         self.size_per_local: Dict[str, Dict[AllocCategory, int]] = dict()
 
@@ -13,6 +14,8 @@ class MemoryManager:
         self.constants_int: Dict[int, int] = dict()
         self.constants_float: Dict[float, int] = dict()
         self.constants: Dict[int, ConstantValue] = dict()
+        # Small literals are encoded in their address instead of the constant pool
+        self.use_immediates = use_immediates
 
     def _allocate_local(self, local_name: str, var_type: AllocCategory) -> int:
         if local_name not in self.size_per_local:
@@ -31,7 +34,18 @@ class MemoryManager:
     def _allocate_constant(self, value: Optional[ConstantValue]) -> int:
         if value is None:
             raise ValueError("Constant value must be provided for constant variables.")
-        address = self.address_ranges[AllocCategory.CONSTANT].current
+        if self.use_immediates:
+            immediate = make_immediate(value)
+            if immediate is not None:
+                return immediate
+        range_info = self.address_ranges[AllocCategory.CONSTANT]
+        # The constant segment has one offset counter; the type bits come from the value
+        if isinstance(value, str):
+            address = range_info.current | (TYPE_STR << TYPE_SHIFT)
+        elif isinstance(value, float):
+            address = range_info.current | (TYPE_FLOAT << TYPE_SHIFT)
+        else:
+            address = range_info.current
         
         if isinstance(value, str):
             if value in self.constants_string.keys():
@@ -51,8 +65,10 @@ class MemoryManager:
             else:
                 self.constants_float[value] = address
 
+        if range_info.current > range_info.end:
+            raise OverflowError(f"No more memory in {AllocCategory.CONSTANT.name} range")
         self.constants[address] = value
-        self.address_ranges[AllocCategory.CONSTANT].current += 1
+        range_info.current += 1
         return address
 
 
@@ -81,37 +97,15 @@ class MemoryManager:
         range_info.current += 1
         return address
     
-    def get_address_type(self, address: int) -> Union[Literal["int"], Literal["float"], Literal["str"]]:
+    def get_address_type_code(self, address: int) -> int:
+        """Type code (TYPE_INT, TYPE_FLOAT or TYPE_STR) of the value stored at address."""
+        category = AllocCategory.get_category_from_address(address)
+        if category == AllocCategory.CONSTANT and address not in self.constants:
+            raise ValueError(f"Address {address} does not exist in constants")
+        return address_type_code(address)
 
-        if address < self.address_ranges[AllocCategory.GLOBAL_INT].start \
-            or address > self.address_ranges[AllocCategory.CONSTANT].end:
-            raise ValueError("Invalid address")
-        elif address < self.address_ranges[AllocCategory.GLOBAL_INT].end:
-            return "int"
-        elif address < self.address_ranges[AllocCategory.GLOBAL_FLOAT].end:
-            return "float"
-        elif address < self.address_ranges[AllocCategory.LOCAL_INT].end:
-            return "int"
-        elif address < self.address_ranges[AllocCategory.LOCAL_FLOAT].end:
-            return "float"
-        elif address < self.address_ranges[AllocCategory.TEMP_INT].end:
-            return "int"
-        elif address < self.address_ranges[AllocCategory.TEMP_FLOAT].end:
-            return "float"
-        elif address < self.address_ranges[AllocCategory.CONSTANT].end:
-            constant = self.constants.get(address)
-            if constant is None:
-                raise ValueError(f"Address {address} does not exist in constants")
-            if isinstance(constant, str):
-                return "str"
-            if isinstance(constant, int):
-                return "int"
-            if isinstance(constant, float):
-                return "float"
-            else:
-                raise ValueError(f"Invalid constant type: {type(constant)}")
-        else:
-            raise ValueError(f"Invalid address: {address}")
+    def get_address_type(self, address: int) -> Union[Literal["int"], Literal["float"], Literal["str"]]:
+        return TYPE_NAMES[self.get_address_type_code(address)]
         
     def to_string(self) -> str:
         """Return a string representation of the memory manager state for debugging."""
@@ -120,7 +114,8 @@ class MemoryManager:
         # Address ranges
         result.append("\nAddress Ranges:")
         for category, range_info in self.address_ranges.items():
-            result.append(f"  {category.name}: {range_info.start}-{range_info.end} (current: {range_info.current})")
+            result.append(f"  {category.name}: {format_address(range_info.start)}-{format_address(range_info.end)} "
+                          f"(current: {format_address(range_info.current)})")
         
         # Local allocations
         if self.size_per_local:
@@ -135,16 +130,16 @@ class MemoryManager:
         if self.constants_int:
             result.append("  Integers:")
             for value, addr in self.constants_int.items():
-                result.append(f"    {value} -> {addr}")
+                result.append(f"    {value} -> {format_address(addr)}")
         
         if self.constants_float:
             result.append("  Floats:")
             for value, addr in self.constants_float.items():
-                result.append(f"    {value} -> {addr}")
+                result.append(f"    {value} -> {format_address(addr)}")
         
         if self.constants_string:
             result.append("  Strings:")
             for value, addr in self.constants_string.items():
-                result.append(f"    '{value}' -> {addr}")
+                result.append(f"    '{value}' -> {format_address(addr)}")
         
         return "\n".join(result)
\ No newline at end of file
@@ -1,8 +1,11 @@
-from typing import Dict
+from typing import Dict, List
 
-from custom_classes.values import VariableType, ValueType
+from custom_classes.values import VariableType, ValueType, TYPE_NAMES, TYPE_CODES
 from custom_classes.memory import Operations
 
+OPERATION_COUNT = max(op.value for op in Operations) + 1
+INVALID_TYPE = -1
+
 class SemanticCube:
     def __init__(self):
         self.cube: Dict[str, Dict[str, Dict[Operations, VariableType]]] = {
@@ -52,6 +55,26 @@ class SemanticCube:
             }
         }
 
+        # The cube flattened into one list indexed by type and operation codes,
+        # see table_index(). Pairs the cube doesn't define hold INVALID_TYPE.
+        self.table: List[int] = [INVALID_TYPE] * (len(TYPE_NAMES) * len(TYPE_NAMES) * OPERATION_COUNT)
+        for type1, by_type2 in self.cube.items():
+            for type2, by_operation in by_type2.items():
+                for operation, result_type in by_operation.items():
+                    index = self.table_index(TYPE_CODES[type1], TYPE_CODES[type2], operation.value)
+                    self.table[index] = TYPE_CODES[result_type]
+
+    @staticmethod
+    def table_index(type1_code: int, type2_code: int, operation_code: int) -> int:
+        return (type1_code * len(TYPE_NAMES) + type2_code) * OPERATION_COUNT + operation_code
+
+    def get_resulting_type_code(self, type1_code: int, type2_code: int, operation: Operations) -> int:
+        """get_resulting_type() on type codes, the version codegen uses."""
+        result = self.table[(type1_code * len(TYPE_NAMES) + type2_code) * OPERATION_COUNT + operation.value]
+        if result == INVALID_TYPE:
+            # Let the string version report what exactly is wrong
+            self.get_resulting_type(TYPE_NAMES[type1_code], TYPE_NAMES[type2_code], operation)
+        return result
 
     def get_resulting_type(self, type1: ValueType, type2: ValueType, operation: Operations) -> ValueType:
         for cur_type in [type1, type2]:
@@ -2,7 +2,7 @@ from typing import Union, Optional, Any, List, Dict
 from MemoryManager import MemoryManager
 
 from custom_classes.values import VariableType
-from custom_classes.memory import AllocCategory
+from custom_classes.memory import AllocCategory, format_address
 from custom_classes.classes import Symbol
 from custom_classes.tree_nodes import Param, Body
 
@@ -15,6 +15,8 @@ class Scope:
         self.param_list: List[Symbol] = []
         self.body: Optional[Body] = body
         self.starting_quad: int = starting_quad
+        self.handle: int = -1  # Index in SymbolTable.scope_list, set by add_scope
+        self.temp_counts: Dict[AllocCategory, int] = {}  # Frame temp slots, set by TempAllocator
 
     def add_symbol(self, symbol: Symbol) -> None:
         """Add any symbol to the scope."""
@@ -31,6 +33,12 @@ class Scope:
 class SymbolTable:
     def __init__(self, memory_manager: MemoryManager):
         self.scopes: Dict[str, Scope] = {}
+        # Indexed by scope handle: the scopes, the scopes searched when
+        # resolving a name in each one (itself, then global), and the
+        # names each one has already resolved
+        self.scope_list: List[Scope] = []
+        self.scope_chains: List[List[Scope]] = []
+        self.resolved: List[Dict[str, Symbol]] = []
         self.add_scope(Scope(name="global", starting_quad=0, body=None))
         self.memory_manager = memory_manager
 
@@ -50,6 +58,28 @@ class SymbolTable:
         if name not in self.scopes:
             raise ValueError(f"Scope {name} not found.")
         return self.scopes[name]    
+
+    def get_scope_handle(self, name: str) -> int:
+        scope = self.scopes.get(name)
+        if scope is None:
+            raise ValueError(f"Scope {name} not found.")
+        return scope.handle
+
+    def resolve(self, name: str, handle: int) -> Optional[Symbol]:
+        """Symbol a name refers to inside the scope with this handle, or None."""
+        resolved = self.resolved[handle]
+        symbol = resolved.get(name)
+        if symbol is None:
+            for scope in self.scope_chains[handle]:
+                symbol = scope.symbols.get(name)
+                if symbol is not None:
+                    resolved[name] = symbol
+                    break
+        return symbol
+
+    def find_symbol(self, name: str, scope_name: str = "global") -> Optional[Symbol]:
+        """is_symbol_declared() and get_symbol() in one lookup: the symbol, or None."""
+        return self.resolve(name, self.get_scope_handle(scope_name))
     
     def get_symbol(self, identifier: Union[str, int], scope_name: str = "global") -> Symbol:
         """Unified symbol lookup in local and global scopes
@@ -58,19 +88,17 @@ class SymbolTable:
             identifier: Either name (str) or vdir (int)
             scope_name: Current scope to check first
         """
-        local_scope = self.get_scope(scope_name)
-        global_scope = self.get_scope("global")
-        
         by_name = isinstance(identifier, str)
         # Check local and global scopes
         if by_name:
             # By name lookup
-            if identifier in local_scope.symbols:
-                return local_scope.symbols[identifier]
-            elif identifier in global_scope.symbols:
-                return global_scope.symbols[identifier]
+            symbol = self.find_symbol(identifier, scope_name)
+            if symbol is not None:
+                return symbol
         else:
             # By vdir lookup
+            local_scope = self.get_scope(scope_name)
+            global_scope = self.get_scope("global")
             if identifier in local_scope.symbols_by_vdir:
                 return local_scope.symbols_by_vdir[identifier]
             elif identifier in global_scope.symbols_by_vdir:
@@ -82,12 +110,21 @@ class SymbolTable:
         if scope.name in self.scopes:
             raise ValueError(f"Scope {scope.name} already exists.")
         self.scopes[scope.name] = scope
+        scope.handle = len(self.scope_list)
+        self.scope_list.append(scope)
+        chain = [scope] if scope.name == "global" else [scope, self.scopes["global"]]
+        self.scope_chains.append(chain)
+        self.resolved.append({})
         
     def add_symbol(self, symbol: Symbol, scope_name: str) -> None:
         scope = self.get_scope(scope_name)
         if symbol.vdir == 0:
             symbol.vdir = self._allocate_vdir(symbol.data_type, scope_name)
         scope.add_symbol(symbol)
+        # A new symbol can shadow what a name resolved to before
+        for handle, chain in enumerate(self.scope_chains):
+            if scope in chain:
+                self.resolved[handle].pop(symbol.name, None)
 
     def add_symbol_by_attrs(
             self, 
@@ -119,19 +156,8 @@ class SymbolTable:
             )
 
     def is_symbol_declared(self, name: str, scope_name: str) -> bool:
-        local_scope = self.get_scope(scope_name)
-        global_scope = self.get_scope("global")
-        
-        for local_param in local_scope.param_list:
-            if local_param.name == name:
-                return True
-        for global_param in global_scope.param_list:
-            if global_param.name == name:
-                return True
-
-        found_in_local = name in local_scope.symbols
-        found_in_global = name in global_scope.symbols
-        return found_in_local or found_in_global
+        # Params are in scope.symbols too, so the chain covers them
+        return self.find_symbol(name, scope_name) is not None
     
     def is_function_declared(self, name: str) -> bool:
         return name in self.scopes and self.scopes[name].body is not None
@@ -141,10 +167,12 @@ class SymbolTable:
         result: str = ""
         for scope_name, scope in self.scopes.items():
             result += f"Scope: {scope_name}\n"
+            if scope.temp_counts:
+                result += f"  Temps: {', '.join(f'{category.name} {count}' for category, count in scope.temp_counts.items())}\n"
             for symbol in scope.symbols.values():
-                result += f"  {symbol.name} - {symbol.vdir}: {symbol.data_type} = {symbol.value}\n"
+                result += f"  {symbol.name} - {format_address(symbol.vdir)}: {symbol.data_type} = {symbol.value}\n"
             for param in scope.param_list:
-                result += f"  Param: {param.name} - {param.vdir}: {param.data_type} = {param.value}\n"
+                result += f"  Param: {param.name} - {format_address(param.vdir)}: {param.data_type} = {param.value}\n"
         return result
     
     
\ No newline at end of file
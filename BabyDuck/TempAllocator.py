@@ -0,0 +1,158 @@
+"""
+Temp recycling for generated quads.
+
+BabyInterpreter gives every intermediate result a fresh temp, so a frame
+ends up with one slot per expression node in its function. This pass renames
+the temps after codegen the way a linear-scan register allocator assigns
+registers: each temp value lives from the quad that writes it to the last
+quad that reads it, and once it is dead its slot goes back to a free list for
+the next one. Codegen never reads a temp before writing it in quad order,
+which is what lets the intervals be read straight off the quad list.
+
+Temps are renamed per code region, the quads that run in one frame: a
+function's body up to its ENDFUNC, and everything else for main. That is not
+always the quad's scope, since call arguments are evaluated with the callee
+as the current scope but run in the caller's frame.
+"""
+import heapq
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+
+from SymbolTable import Scope
+from custom_classes.classes import QuadBuffer, NO_OPERAND
+from custom_classes.memory import AllocCategory, Operations, JUMP_FIELDS, CATEGORY_SHIFT, OFFSET_MASK
+
+TEMP_CATEGORY_CODES = frozenset(category.value for category in AllocCategory if category.is_temp)
+
+
+class TempAllocator:
+    def __init__(self, quads: QuadBuffer, functions: Dict[str, Scope]):
+        self.quads = quads
+        self.functions = functions
+
+    def regions(self) -> Dict[str, List[int]]:
+        """Indices of the quads that run in each function's frame, by function name."""
+        starts = {
+            scope.starting_quad: name for name, scope in self.functions.items() if name != "global"
+        }
+        regions: Dict[str, List[int]] = {"global": []}
+        current = "global"
+        for i, op_vdir in enumerate(self.quads.op_vdir):
+            if i in starts:
+                current = starts[i]
+                regions.setdefault(current, [])
+            regions[current].append(i)
+            if op_vdir == Operations.ENDFUNC.value:
+                current = "global"
+        return regions
+
+    def operands(self, index: int) -> List[Tuple[str, int]]:
+        """(field name, address) of every temp the quad at index uses, the one it writes last."""
+        op_vdir = self.quads.op_vdir[index]
+        jump_field = JUMP_FIELDS.get(op_vdir)
+        result = []
+        for field_name in self.read_fields(op_vdir) + (self.write_field(op_vdir),):
+            address = getattr(self.quads, field_name)[index]
+            if address == NO_OPERAND or field_name == jump_field:
+                continue
+            if (address >> CATEGORY_SHIFT) in TEMP_CATEGORY_CODES:
+                result.append((field_name, address))
+        return result
+
+    @staticmethod
+    def write_field(op_vdir: int) -> str:
+        return "vdir1" if op_vdir == Operations.ASSIGN.value else "storage_vdir"
+
+    @staticmethod
+    def read_fields(op_vdir: int) -> Tuple[str, ...]:
+        return ("vdir2",) if op_vdir == Operations.ASSIGN.value else ("vdir1", "vdir2")
+
+    def live_intervals(self, indices: List[int]) -> Tuple[List[List[int]], List[Tuple[int, str, int]]]:
+        """
+        Live intervals of the temp values computed by the quads at indices.
+
+        Every write starts a new value, even to an address that was written
+        before: call arguments take their temps from the callee's counter, so
+        the same address can hold unrelated values in one frame. Returns
+        [first quad, last quad, address] per value, and (quad index, field
+        name, value) for every temp operand.
+        """
+        intervals: List[List[int]] = []
+        occurrences: List[Tuple[int, str, int]] = []
+        current: Dict[int, int] = {}  # address -> value it holds now
+        back_edges = []
+        gosub = Operations.GOSUB.value
+        op_column = self.quads.op_vdir
+        for i in indices:
+            write_field = self.write_field(op_column[i])
+            for field_name, address in self.operands(i):
+                if field_name == write_field or address not in current:
+                    current[address] = len(intervals)
+                    intervals.append([i, i, address])
+                value = current[address]
+                intervals[value][1] = i
+                occurrences.append((i, field_name, value))
+            jump_field = JUMP_FIELDS.get(op_column[i])
+            if jump_field is not None and op_column[i] != gosub:
+                target = getattr(self.quads, jump_field)[i]
+                if 0 <= target <= i:
+                    back_edges.append((target, i))
+
+        # A value that is live on entry to a loop must survive every iteration,
+        # so it lives until the jump back, a GOTO or, once the optimizer has
+        # threaded jumps, a GOTOF. Extending an interval can carry it
+        # into an enclosing loop, hence the repeat until it stops growing.
+        back_edges.sort()
+        targets = [target for target, _ in back_edges]
+        for interval in intervals:
+            while True:
+                entered = back_edges[bisect_right(targets, interval[0]):bisect_right(targets, interval[1])]
+                furthest = max((jump for _, jump in entered), default=interval[1])
+                if furthest <= interval[1]:
+                    break
+                interval[1] = furthest
+        return intervals, occurrences
+
+    def allocate(self) -> Dict[str, Dict[AllocCategory, int]]:
+        """
+        Rename the temps of every region in place and return the number of
+        temp slots each function's frame needs, by category.
+
+        Each function's counts are also stored in its Scope as temp_counts.
+        """
+        temp_counts: Dict[str, Dict[AllocCategory, int]] = {}
+        for name, indices in self.regions().items():
+            intervals, occurrences = self.live_intervals(indices)
+            renamed, counts = self.assign_slots(intervals)
+            for i, field_name, value in occurrences:
+                getattr(self.quads, field_name)[i] = renamed[value]
+            temp_counts[name] = counts
+            if name in self.functions:
+                self.functions[name].temp_counts = counts
+        return temp_counts
+
+    @staticmethod
+    def assign_slots(intervals: List[List[int]]) -> Tuple[List[int], Dict[AllocCategory, int]]:
+        """Linear scan over intervals: the new address of each value and the slots used per category."""
+        renamed: List[int] = [0] * len(intervals)
+        counts: Dict[AllocCategory, int] = {AllocCategory.TEMP_INT: 0, AllocCategory.TEMP_FLOAT: 0}
+        free: Dict[AllocCategory, List[int]] = {AllocCategory.TEMP_INT: [], AllocCategory.TEMP_FLOAT: []}
+        active: List[Tuple[int, int, int]] = []  # (last quad, slot, category value)
+
+        # Values are numbered in order of their first quad already
+        for value, (start, end, address) in enumerate(intervals):
+            # Operands are read before the result is written, so a value whose
+            # last use is this quad can hand its slot to the quad's result
+            while active and active[0][0] <= start:
+                _, slot, category_value = heapq.heappop(active)
+                heapq.heappush(free[AllocCategory(category_value)], slot)
+
+            category = AllocCategory.get_category_from_address(address)
+            if free[category]:
+                slot = heapq.heappop(free[category])
+            else:
+                slot = counts[category]
+                counts[category] += 1
+            renamed[value] = (address & ~OFFSET_MASK) | slot
+            heapq.heappush(active, (end, slot, category.value))
+        return renamed, counts
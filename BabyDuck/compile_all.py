@@ -0,0 +1,135 @@
+"""
+Compile every .baby file in a directory in parallel.
+
+Files are spread over a process pool. Each worker loads the parser once and
+then runs gen_obj() on its share of the files, so the LALR tables aren't
+rebuilt per file. Besides the usual .obj and .ovejota outputs, a summary with
+each file's compile time and error goes to <output>/compile_summary.txt.
+--emit limits the outputs, e.g. --emit=obj to skip the listings or
+--emit=none to only check that every file compiles. --no-optimize skips the
+optimizer passes.
+
+Usage: python compile_all.py <source_dir> [--output DIR] [--jobs N]
+                             [--frontend lark|standalone|native] [--no-cache]
+                             [--emit obj,listing|none] [--no-optimize]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from gen_obj import gen_obj, parse_program, parse_emit, FRONTENDS, EMIT_KINDS
+
+SUMMARY_FILENAME = "compile_summary.txt"
+
+
+@dataclass
+class CompileResult:
+    filename: str
+    seconds: float
+    cached: bool = False
+    error: Optional[str] = None
+
+
+def init_worker(frontend: str) -> None:
+    """Load the parser for frontend before the worker gets its first file."""
+    parse_program("program warm; main { } end", frontend=frontend)
+
+
+def compile_file(source_dir: str, filename: str, output_dir: str, frontend: str, use_cache: bool,
+                 emit: Sequence[str] = EMIT_KINDS, optimize: bool = True) -> CompileResult:
+    start = time.perf_counter()
+    try:
+        cached = gen_obj(source_dir, filename, output_path=output_dir, frontend=frontend, use_cache=use_cache,
+                         emit=emit, optimize=optimize)
+    except Exception as e:
+        # Parse errors span several lines; the first one has the position
+        lines = str(e).strip().splitlines()
+        message = f"{type(e).__name__}: {lines[0]}" if lines else type(e).__name__
+        return CompileResult(filename, time.perf_counter() - start, error=message)
+    return CompileResult(filename, time.perf_counter() - start, cached=cached)
+
+
+def compile_all(
+        source_dir: str,
+        output_dir: str = "./output",
+        jobs: Optional[int] = None,
+        frontend: str = "lark",
+        use_cache: bool = True,
+        emit: Sequence[str] = EMIT_KINDS,
+        optimize: bool = True,
+        ) -> List[CompileResult]:
+    """Compile every .baby file in source_dir and return the results sorted by file name."""
+    filenames = [name for name in os.listdir(source_dir) if name.endswith(".baby")]
+    # Largest first, so a big file picked up last doesn't leave the other workers idle
+    filenames.sort(key=lambda name: os.path.getsize(os.path.join(source_dir, name)), reverse=True)
+    os.makedirs(output_dir, exist_ok=True)
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        init_worker(frontend)
+        results = [compile_file(source_dir, name, output_dir, frontend, use_cache, emit, optimize) for name in filenames]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(frontend,)) as executor:
+            futures = [
+                executor.submit(compile_file, source_dir, name, output_dir, frontend, use_cache, emit, optimize)
+                for name in filenames
+            ]
+            results = [future.result() for future in futures]
+
+    results.sort(key=lambda result: result.filename)
+    return results
+
+
+def write_summary(results: List[CompileResult], summary_path: str, wall_seconds: float, jobs: int) -> None:
+    errors = [result for result in results if result.error is not None]
+    cached = [result for result in results if result.cached]
+    width = max([len(result.filename) for result in results] + [4])
+
+    with open(summary_path, "w", encoding="utf-8") as summary_file:
+        summary_file.write(f"# BabyDuck batch compile: {len(results)} files, {jobs} jobs\n")
+        summary_file.write(f"# ok: {len(results) - len(errors)} (cached: {len(cached)}), errors: {len(errors)}\n")
+        summary_file.write(f"# wall time: {wall_seconds * 1000:.2f} ms, "
+                           f"compile time: {sum(result.seconds for result in results) * 1000:.2f} ms\n\n")
+        for result in results:
+            status = "error" if result.error is not None else "cached" if result.cached else "ok"
+            summary_file.write(f"{result.filename:<{width}}  {status:<6}  {result.seconds * 1000:10.2f} ms")
+            if result.error is not None:
+                summary_file.write(f"  {result.error}")
+            summary_file.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile every .baby file in a directory in parallel")
+    parser.add_argument("source_dir", help="Directory with the .baby files")
+    parser.add_argument("--output", default="./output", help="Directory for .obj, .ovejota and the summary")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--frontend", choices=FRONTENDS, default="lark", help="Parser frontend used to compile")
+    parser.add_argument("--no-cache", action="store_true", help="Always recompile instead of using the compile cache")
+    parser.add_argument("--emit", type=parse_emit, default=EMIT_KINDS,
+                        help="Outputs to write: a comma-separated list of obj and listing, or none (default: obj,listing)")
+    parser.add_argument("--no-optimize", action="store_true", help="Compile without the optimizer passes")
+    args = parser.parse_args()
+
+    jobs = args.jobs or os.cpu_count() or 1
+    start = time.perf_counter()
+    results = compile_all(args.source_dir, args.output, jobs=jobs, frontend=args.frontend, use_cache=not args.no_cache,
+                          emit=args.emit, optimize=not args.no_optimize)
+    wall_seconds = time.perf_counter() - start
+
+    summary_path = os.path.join(args.output, SUMMARY_FILENAME)
+    write_summary(results, summary_path, wall_seconds, jobs)
+
+    errors = [result for result in results if result.error is not None]
+    for result in errors:
+        print(f"{result.filename}: {result.error}")
+    print(f"Compiled {len(results) - len(errors)}/{len(results)} files in {wall_seconds * 1000:.2f} ms "
+          f"with {jobs} jobs, summary in {summary_path}")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
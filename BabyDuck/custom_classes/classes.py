@@ -1,5 +1,7 @@
-from dataclasses import dataclass
-from typing import Optional, Union
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from custom_classes.values import VariableType
 
 @dataclass
@@ -19,4 +21,143 @@ class Quad():
     vdir2: Optional[int] = None
     storage_vdir: Optional[int] = None
     label: Optional[str] = None
-    scope: str = "global"
\ No newline at end of file
+    scope: str = "global"
+
+
+# Stands for a missing operand (None) in the QuadBuffer columns
+NO_OPERAND = -1
+
+
+class QuadBuffer:
+    """
+    Quads stored column by column: one typed array per Quad field, plus side
+    tables for the few quads with a label and for the scope of each run of
+    quads. An instruction costs 13 bytes of columns instead of a Quad object,
+    and the VM reads operands as array items rather than attributes.
+
+    Missing operands are NO_OPERAND in the columns. Indexing returns a Quad
+    built from the columns, for tools that print or compare quads; writes go
+    through the columns, e.g. `buffer.vdir2[i] = target`.
+    """
+    # Typecode of each column; 'i' fits every tagged address and quad index
+    COLUMNS = (("op_vdir", "B"), ("vdir1", "i"), ("vdir2", "i"), ("storage_vdir", "i"))
+
+    def __init__(self):
+        self.op_vdir = array("B")
+        self.vdir1 = array("i")
+        self.vdir2 = array("i")
+        self.storage_vdir = array("i")
+        self.labels: Dict[int, str] = {}
+        # Runs like DebugInfo: quads from scope_starts[i] on were emitted in scope_names[i]
+        self.scope_starts: List[int] = []
+        self.scope_names: List[str] = []
+
+    def append(
+            self,
+            op_vdir: int,
+            vdir1: Optional[int] = None,
+            vdir2: Optional[int] = None,
+            storage_vdir: Optional[int] = None,
+            label: Optional[str] = None,
+            scope: str = "global",
+            ) -> int:
+        """Add a quad and return its index."""
+        index = len(self.op_vdir)
+        self.op_vdir.append(op_vdir)
+        self.vdir1.append(NO_OPERAND if vdir1 is None else vdir1)
+        self.vdir2.append(NO_OPERAND if vdir2 is None else vdir2)
+        self.storage_vdir.append(NO_OPERAND if storage_vdir is None else storage_vdir)
+        if label is not None:
+            self.labels[index] = label
+        if not self.scope_names or self.scope_names[-1] != scope:
+            self.scope_starts.append(index)
+            self.scope_names.append(scope)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.op_vdir)
+
+    def segment_at(self, index: int) -> tuple:
+        """
+        (first, end, op_vdir, vdir1, vdir2, storage_vdir) of the contiguous
+        run of quads holding index, which the VM executes from. An in-memory
+        buffer is a single segment; object files loaded lazily have several.
+        """
+        return 0, len(self), self.op_vdir, self.vdir1, self.vdir2, self.storage_vdir
+
+    def scope_at(self, index: int) -> str:
+        return self.scope_names[bisect_right(self.scope_starts, index) - 1]
+
+    def operand(self, index: int, field_name: str) -> Optional[int]:
+        value = getattr(self, field_name)[index]
+        return None if value == NO_OPERAND else value
+
+    def set_operand(self, index: int, field_name: str, value: Optional[int]) -> None:
+        getattr(self, field_name)[index] = NO_OPERAND if value is None else value
+
+    def __getitem__(self, index: int) -> Quad:
+        if index < 0:
+            index += len(self)
+        return Quad(
+            op_vdir=self.op_vdir[index],
+            vdir1=self.operand(index, "vdir1"),
+            vdir2=self.operand(index, "vdir2"),
+            storage_vdir=self.operand(index, "storage_vdir"),
+            label=self.labels.get(index),
+            scope=self.scope_at(index),
+        )
+
+    def __iter__(self) -> Iterator[Quad]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+@dataclass
+class DebugInfo:
+    """
+    Source positions of the quads, kept apart from the quads so the VM never
+    reads them while running.
+
+    Stored as runs: quads from starts[i] up to starts[i + 1] come from the
+    statement at lines[i], columns[i]. A None line marks quads that belong to
+    no statement (the jump to main, ENDFUNC, END).
+    """
+    starts: List[int] = field(default_factory=list)
+    lines: List[Optional[int]] = field(default_factory=list)
+    columns: List[Optional[int]] = field(default_factory=list)
+
+    def mark(self, quad_index: int, line: Optional[int], column: Optional[int]) -> None:
+        """Attribute the quads from quad_index onwards to line and column."""
+        if self.starts:
+            if self.lines[-1] == line and self.columns[-1] == column:
+                return
+            if self.starts[-1] == quad_index:
+                # The previous run never got a quad
+                self.lines[-1] = line
+                self.columns[-1] = column
+                return
+        self.starts.append(quad_index)
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def lookup(self, quad_index: int) -> Optional[Tuple[int, int]]:
+        """(line, column) of the statement that emitted a quad, if known."""
+        i = bisect_right(self.starts, quad_index) - 1
+        if i < 0 or self.lines[i] is None:
+            return None
+        return self.lines[i], self.columns[i]
+
+
+@dataclass(slots=True)
+class FunctionDescriptor:
+    """
+    What the VM needs to call a function: where its code starts, where its
+    arguments go and how big its frame is. Names and types of the symbols
+    are only kept in the object file's debug section.
+    """
+    entry: int
+    param_vdirs: List[int] = field(default_factory=list)
+    local_ints: int = 0
+    local_floats: int = 0
+    temp_ints: int = 0
+    temp_floats: int = 0
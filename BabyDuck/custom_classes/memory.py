@@ -1,6 +1,9 @@
+import math
 from dataclasses import dataclass
 from enum import Enum
-from typing import List, Optional, Union, Tuple, Literal
+from typing import Dict, List, Optional, Union, Tuple, Literal
+
+from custom_classes.values import TYPE_INT, TYPE_FLOAT
 
 class AllocCategory(Enum):
     GLOBAL_INT = 1
@@ -10,13 +13,14 @@ class AllocCategory(Enum):
     TEMP_INT = 5
     TEMP_FLOAT = 6
     CONSTANT = 7
+    IMMEDIATE = 8  # Literal stored in the address itself, see make_immediate()
 
     @classmethod
     def get_category_from_address(cls, address: int) -> 'AllocCategory':
-        for category, range_info in DATA_RANGES.items():
-            if range_info.start <= address <= range_info.end:
-                return category
-        raise ValueError(f"Invalid memory address: {address}")
+        category = CATEGORY_BY_CODE[address >> CATEGORY_SHIFT] if 0 <= address < ADDRESS_LIMIT else None
+        if category is None:
+            raise ValueError(f"Invalid memory address: {address}")
+        return category
     
     @property
     def is_local(self) -> bool:
@@ -27,6 +31,10 @@ class AllocCategory(Enum):
     def is_float(self) -> bool:
         return self in (AllocCategory.GLOBAL_FLOAT, AllocCategory.LOCAL_FLOAT, AllocCategory.TEMP_FLOAT)
 
+    @property
+    def is_temp(self) -> bool:
+        return self in (AllocCategory.TEMP_INT, AllocCategory.TEMP_FLOAT)
+
 class Operations(Enum):
     PLUS = 1
     MINUS = 2
@@ -46,90 +54,110 @@ class Operations(Enum):
     ENDFUNC = 16
     GOSUB = 17
 
+# Operand field that holds a quad index instead of an address, by operation
+JUMP_FIELDS: Dict[int, str] = {
+    Operations.GOTO.value: "vdir1",
+    Operations.GOSUB.value: "vdir1",
+    Operations.GOTOF.value: "vdir2",
+}
+
 @dataclass
 class AddressRange:
     start: int
     end: int
     current: int
 
-GLOBAL_INT_START = 1000
-RANGE_SIZE = 1000
-
-DATA_STARTS = {
-    AllocCategory.GLOBAL_INT: GLOBAL_INT_START,
-    AllocCategory.GLOBAL_FLOAT: GLOBAL_INT_START + RANGE_SIZE,
-    AllocCategory.LOCAL_INT: GLOBAL_INT_START + RANGE_SIZE * 2,
-    AllocCategory.LOCAL_FLOAT: GLOBAL_INT_START + RANGE_SIZE * 3,
-    AllocCategory.TEMP_INT: GLOBAL_INT_START + RANGE_SIZE * 4,
-    AllocCategory.TEMP_FLOAT: GLOBAL_INT_START + RANGE_SIZE * 5,
-    AllocCategory.CONSTANT: GLOBAL_INT_START + RANGE_SIZE * 6
-}
+# A virtual address carries its segment and value type in its high bits:
+#
+#   bits 26-29  category (AllocCategory value)
+#   bits 24-25  type code (TYPE_INT, TYPE_FLOAT or TYPE_STR)
+#   bits  0-23  offset inside the segment
+#
+# so decoding an address is a shift and a mask, and every segment holds
+# SEGMENT_SIZE entries. Constants share one offset counter whatever their type.
+# IMMEDIATE addresses have no segment: the low 24 bits are the literal itself,
+# a signed int, or a float in Q15.8 fixed point (the value times 256).
+OFFSET_BITS = 24
+TYPE_SHIFT = OFFSET_BITS
+TYPE_MASK = 0b11
+CATEGORY_SHIFT = TYPE_SHIFT + 2
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+SEGMENT_SIZE = 1 << OFFSET_BITS
+ADDRESS_LIMIT = (max(category.value for category in AllocCategory) + 1) << CATEGORY_SHIFT
+
+# Indexed by address >> CATEGORY_SHIFT
+CATEGORY_BY_CODE: Tuple[Optional[AllocCategory], ...] = tuple(
+    next((category for category in AllocCategory if category.value == code), None)
+    for code in range(ADDRESS_LIMIT >> CATEGORY_SHIFT)
+)
+
+def make_address(category: AllocCategory, type_code: int, offset: int) -> int:
+    return (category.value << CATEGORY_SHIFT) | (type_code << TYPE_SHIFT) | offset
+
+def address_type_code(address: int) -> int:
+    return (address >> TYPE_SHIFT) & TYPE_MASK
+
+def address_offset(address: int) -> int:
+    return address & OFFSET_MASK
+
+IMMEDIATE_CODE = AllocCategory.IMMEDIATE.value
+IMMEDIATE_SIGN = 1 << (OFFSET_BITS - 1)
+FLOAT_IMMEDIATE_SCALE = 256  # Q15.8
+
+def make_immediate(value: Union[int, float, str]) -> Optional[int]:
+    """Immediate address holding value, or None if value has to go in the constant pool."""
+    if isinstance(value, int):
+        type_code, payload = TYPE_INT, value
+    elif isinstance(value, float):
+        scaled = value * FLOAT_IMMEDIATE_SCALE
+        # -0.0 would come back as 0.0
+        if not scaled.is_integer() or (value == 0 and math.copysign(1.0, value) < 0):
+            return None
+        type_code, payload = TYPE_FLOAT, int(scaled)
+    else:
+        return None
+    if not -IMMEDIATE_SIGN <= payload < IMMEDIATE_SIGN:
+        return None
+    return make_address(AllocCategory.IMMEDIATE, type_code, payload & OFFSET_MASK)
+
+def is_immediate(address: int) -> bool:
+    return address >> CATEGORY_SHIFT == IMMEDIATE_CODE
 
-DATA_RANGES = {
-    AllocCategory.GLOBAL_INT: AddressRange(
-        DATA_STARTS[AllocCategory.GLOBAL_INT], 
-        DATA_STARTS[AllocCategory.GLOBAL_INT] + RANGE_SIZE - 1, 
-        current=DATA_STARTS[AllocCategory.GLOBAL_INT]
-    ),
-    AllocCategory.GLOBAL_FLOAT: AddressRange(
-        DATA_STARTS[AllocCategory.GLOBAL_FLOAT], 
-        DATA_STARTS[AllocCategory.GLOBAL_FLOAT] + RANGE_SIZE - 1, 
-        current=DATA_STARTS[AllocCategory.GLOBAL_FLOAT]
-    ),
-    AllocCategory.LOCAL_INT: AddressRange(
-        DATA_STARTS[AllocCategory.LOCAL_INT], 
-        DATA_STARTS[AllocCategory.LOCAL_INT] + RANGE_SIZE - 1, 
-        current=DATA_STARTS[AllocCategory.LOCAL_INT]
-    ),
-    AllocCategory.LOCAL_FLOAT: AddressRange(
-        DATA_STARTS[AllocCategory.LOCAL_FLOAT], 
-        DATA_STARTS[AllocCategory.LOCAL_FLOAT] + RANGE_SIZE - 1, 
-        current=DATA_STARTS[AllocCategory.LOCAL_FLOAT]
-    ),
-    AllocCategory.TEMP_INT: AddressRange(
-        DATA_STARTS[AllocCategory.TEMP_INT], 
-        DATA_STARTS[AllocCategory.TEMP_INT] + RANGE_SIZE - 1, 
-        current=DATA_STARTS[AllocCategory.TEMP_INT]
-    ),
-    AllocCategory.TEMP_FLOAT: AddressRange(
-        DATA_STARTS[AllocCategory.TEMP_FLOAT], 
-        DATA_STARTS[AllocCategory.TEMP_FLOAT] + RANGE_SIZE - 1, 
-        current=DATA_STARTS[AllocCategory.TEMP_FLOAT]
-    ),
-    AllocCategory.CONSTANT: AddressRange(
-        DATA_STARTS[AllocCategory.CONSTANT], 
-        DATA_STARTS[AllocCategory.CONSTANT] + RANGE_SIZE - 1, 
-        current=DATA_STARTS[AllocCategory.CONSTANT]
-    )
+def decode_immediate(address: int) -> Union[int, float]:
+    payload = address & OFFSET_MASK
+    if payload & IMMEDIATE_SIGN:
+        payload -= SEGMENT_SIZE
+    if (address >> TYPE_SHIFT) & TYPE_MASK == TYPE_FLOAT:
+        return payload / FLOAT_IMMEDIATE_SCALE
+    return payload
+
+def format_address(address: int) -> str:
+    """Hex form of an address for listings, so the tag bits stay readable. Immediates show their value."""
+    if is_immediate(address):
+        return f"#{decode_immediate(address)}"
+    return f"0x{address:08x}"
+
+# Layout of the address space: (first address, number of addresses) per
+# category. The first address has the type bits of the category's values;
+# constants start with TYPE_INT bits and get the bits of each value's type.
+MEMORY_LAYOUT: Dict[AllocCategory, Tuple[int, int]] = {
+    category: (make_address(category, TYPE_FLOAT if category.is_float else TYPE_INT, 0), SEGMENT_SIZE)
+    for category in AllocCategory if category != AllocCategory.IMMEDIATE
 }
 
+def build_address_ranges(layout: Dict[AllocCategory, Tuple[int, int]] = MEMORY_LAYOUT) -> Dict[AllocCategory, AddressRange]:
+    """Fresh AddressRange objects for a layout, with every range still empty."""
+    return {
+        category: AddressRange(start, start + size - 1, current=start)
+        for category, (start, size) in layout.items()
+    }
+
+# Reference copy of the default layout. Allocation never touches it: every
+# MemoryManager builds its own ranges, so its `current` values stay at the start.
+DATA_RANGES = build_address_ranges()
+
 # def get_category_from_address(address: int) -> AllocCategory:
 #     for category, range_info in DATA_RANGES.items():
 #         if range_info.start <= address <= range_info.end:
 #             return category
 #     raise ValueError(f"Invalid memory address: {address}")
-
-class MemorySegment(Enum):
-    GLOBAL_INT = (1000, 1999)
-    GLOBAL_FLOAT = (2000, 2999)
-    LOCAL_INT = (3000, 3999)
-    LOCAL_FLOAT = (4000, 4999)
-    TEMP_INT = (5000, 5999)
-    TEMP_FLOAT = (6000, 6999)
-    CONSTANT = (7000, 7999)
-    
-    @classmethod
-    def get_segment_by_address(cls, address: int) -> 'MemorySegment':
-        for segment in cls:
-            if segment.value[0] <= address <= segment.value[1]:
-                return segment
-        raise ValueError(f"Invalid memory address: {address}")
-    
-    @property
-    def is_local(self) -> bool:
-        return self in (MemorySegment.LOCAL_INT, MemorySegment.LOCAL_FLOAT, 
-                       MemorySegment.TEMP_INT, MemorySegment.TEMP_FLOAT)
-    
-    @property
-    def is_float(self) -> bool:
-        return self in (MemorySegment.GLOBAL_FLOAT, MemorySegment.LOCAL_FLOAT, MemorySegment.TEMP_FLOAT)
\ No newline at end of file
@@ -3,38 +3,38 @@ from typing import List, Optional, Union, Tuple, Literal
 from custom_classes.memory import Operations
 from custom_classes.values import VariableType
 
-@dataclass
+@dataclass(slots=True)
 class Expression():
     left_expr: 'Exp'
     op : Optional[Union[Literal[Operations.GREATER_THAN], Literal[Operations.LESS_THAN], Literal[Operations.NOT_EQUAL]]] = None
     right_expr: Optional['Exp'] = None  # Right-hand side expression (if any)
 
-@dataclass
+@dataclass(slots=True)
 class Exp():
     left_term: 'Term'
-    operations : List[ \
-        Tuple[Union[Literal[Operations.PLUS], Literal[Operations.MINUS]], 'Term'] \
-        ] = field(default_factory=list)  # List of tuples (operator, term)
+    operations : Tuple[ \
+        Tuple[Union[Literal[Operations.PLUS], Literal[Operations.MINUS]], 'Term'], ... \
+        ] = ()  # Tuple of (operator, term) pairs; the shared () when there are none
 
-@dataclass
+@dataclass(slots=True)
 class Term():
     left_factor: 'Factor'
-    operations: List[ \
-        Tuple[Union[Literal[Operations.MULT], Literal[Operations.DIV]], 'Factor'] \
-        ] = field(default_factory=list)  # List of tuples (operator, factor)
+    operations: Tuple[ \
+        Tuple[Union[Literal[Operations.MULT], Literal[Operations.DIV]], 'Factor'], ... \
+        ] = ()  # Tuple of (operator, factor) pairs; the shared () when there are none
 
-@dataclass
+@dataclass(slots=True)
 class Factor():
     value: Union[int, float, str, Expression] = 0
     sign: Optional[Union[Literal["+"], Literal["-"]]] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Statement():
     pass
 
 # Program
-@dataclass
+@dataclass(slots=True)
 class Program():
     id: str
     vars: Optional['Vars']
@@ -42,54 +42,64 @@ class Program():
     body: 'Body'
 
 # Variables
-@dataclass
+@dataclass(slots=True)
 class Vars():
     declarations: List['VarDeclaration']
 
-@dataclass
+@dataclass(slots=True)
 class VarDeclaration():
     type_: VariableType
     names: List[str]
 
 # Functions
-@dataclass
+@dataclass(slots=True)
 class Function():
     id: str
     params: List['Param']
     vars: Optional['Vars']
     body: 'Body'
 
-@dataclass
+@dataclass(slots=True)
 class Param():
     name: str
     type_: VariableType
 
 # Statements
-@dataclass
+@dataclass(slots=True)
 class Assign(Statement):
     id: str
     expr: Expression
+    line: Optional[int] = field(default=None, compare=False)  # Position of the statement's first token
+    column: Optional[int] = field(default=None, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class Print(Statement):
     contents: List[Union[Expression, str]]
+    line: Optional[int] = field(default=None, compare=False)
+    column: Optional[int] = field(default=None, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class Condition(Statement):
     expr: Expression
     if_body: 'Body'
     else_body: Optional['Body'] = None
+    line: Optional[int] = field(default=None, compare=False)
+    column: Optional[int] = field(default=None, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class Cycle(Statement):
     expr: Expression
     body: 'Body'
+    line: Optional[int] = field(default=None, compare=False)
+    column: Optional[int] = field(default=None, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class Body():
     statements: List[Statement]
 
-@dataclass
+@dataclass(slots=True)
 class FCall(Statement):
     id: str
-    args: List[Expression]
\ No newline at end of file
+    args: List[Expression]
+    line: Optional[int] = field(default=None, compare=False)
+    column: Optional[int] = field(default=None, compare=False)
\ No newline at end of file
@@ -1,9 +1,16 @@
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Optional, Union, Tuple, Literal
+from typing import Dict, List, Optional, Union, Tuple, Literal
 
 ValueType = Literal["int", "float", "str"]
 ConstantValue = Union[int, float, str]
 
 VariableType = Literal["int", "float"]
-VariableValues = Union[int, float]
\ No newline at end of file
+VariableValues = Union[int, float]
+
+# Integer codes for ValueType, used to index the flat SemanticCube table
+TYPE_INT = 0
+TYPE_FLOAT = 1
+TYPE_STR = 2
+TYPE_NAMES: Tuple[ValueType, ...] = ("int", "float", "str")
+TYPE_CODES: Dict[str, int] = {name: code for code, name in enumerate(TYPE_NAMES)}
@@ -1,65 +1,228 @@
-from dataclasses import dataclass
-from datetime import datetime
-import sys
-import pickle
 import os
-import contextlib
-from lark import Lark
-from BabyTransformer import BabyTransformer
+import tempfile
+import CompileCache
+import optimizer
 from BabyInterpreter import BabyInterpreter
-from SymbolTable import SymbolTable, Scope
+from SymbolTable import SymbolTable
 from MemoryManager import MemoryManager
-from typing import Dict, List
+from TempAllocator import TempAllocator
+from optimizer.program import QuadProgram
+from obj_format import ObjData, ObjectFileMetadata, write_obj
+from typing import Dict, List, Sequence, TextIO, Tuple
 
-from custom_classes.values import ConstantValue
-from custom_classes.memory import Operations, AllocCategory
-from custom_classes.classes import Quad
+from custom_classes.memory import Operations, AllocCategory, JUMP_FIELDS, address_offset, decode_immediate, format_address
+from custom_classes.classes import Quad, QuadBuffer, FunctionDescriptor, Symbol, NO_OPERAND
+from custom_classes.tree_nodes import Program
 
-    
-@dataclass
-class ObjectFileMetadata:
-    filename: str
-    timestamp: str
 
-@dataclass
-class ObjData:
-    metadata: ObjectFileMetadata
-    constants: Dict[int, ConstantValue]
-    functions: Dict[str, Scope]
-    quads: List[Quad]
+def build_function_descriptors(symbol_table: SymbolTable, mem_mgr: MemoryManager) -> Dict[str, FunctionDescriptor]:
+    """
+    Runtime descriptor of every function, plus one for main's frame under
+    "global". Temp sizes are the recycled ones from TempAllocator when it ran.
+    """
+    descriptors: Dict[str, FunctionDescriptor] = {}
+    for name, scope in symbol_table.scopes.items():
+        if name == "global":
+            sizes = {
+                category: range_info.current - range_info.start
+                for category, range_info in mem_mgr.address_ranges.items()
+            }
+            sizes[AllocCategory.LOCAL_INT] = sizes.pop(AllocCategory.GLOBAL_INT)
+            sizes[AllocCategory.LOCAL_FLOAT] = sizes.pop(AllocCategory.GLOBAL_FLOAT)
+        else:
+            sizes = dict(mem_mgr.size_per_local.get(name, {}))
+        sizes.update(scope.temp_counts)
+        descriptors[name] = FunctionDescriptor(
+            entry=scope.starting_quad,
+            param_vdirs=[param.vdir for param in scope.param_list],
+            local_ints=sizes.get(AllocCategory.LOCAL_INT, 0),
+            local_floats=sizes.get(AllocCategory.LOCAL_FLOAT, 0),
+            temp_ints=sizes.get(AllocCategory.TEMP_INT, 0),
+            temp_floats=sizes.get(AllocCategory.TEMP_FLOAT, 0),
+        )
+    return descriptors
 
 
-# Import grammar from file
-with open('grammar.lark', 'r') as file:
-    grammar = file.read()
+def build_debug_symbols(symbol_table: SymbolTable) -> Dict[str, List[Symbol]]:
+    """Every symbol by scope, parameters included, for the object file's debug section."""
+    return {name: list(scope.symbols.values()) for name, scope in symbol_table.scopes.items()}
 
 
 def get_symbol_name(symbol_table: SymbolTable, mem_mgr: MemoryManager, vdir: int, scope_name: str = "global") -> str:
-    if vdir < mem_mgr.address_ranges[AllocCategory.GLOBAL_INT].start:
-        raise ValueError("Invalid variable directory (vdir)")
-    if vdir < mem_mgr.address_ranges[AllocCategory.TEMP_INT].start:
-        return symbol_table.get_symbol(vdir, scope_name=scope_name).name
-    if vdir <= mem_mgr.address_ranges[AllocCategory.TEMP_INT].end:
-        return "ti"+str(vdir-mem_mgr.address_ranges[AllocCategory.TEMP_INT].start)
-    if vdir <= mem_mgr.address_ranges[AllocCategory.TEMP_FLOAT].end:
-        return "tf"+str(vdir-mem_mgr.address_ranges[AllocCategory.TEMP_FLOAT].start)
-    else:
+    category = AllocCategory.get_category_from_address(vdir)
+    if category == AllocCategory.TEMP_INT:
+        return "ti"+str(address_offset(vdir))
+    if category == AllocCategory.TEMP_FLOAT:
+        return "tf"+str(address_offset(vdir))
+    if category == AllocCategory.CONSTANT:
         return str(mem_mgr.constants[vdir])
+    if category == AllocCategory.IMMEDIATE:
+        return str(decode_immediate(vdir))
+    return symbol_table.get_symbol(vdir, scope_name=scope_name).name
     
 
-def gen_obj(file_path: str, filename: str, output_path: str = "./output") -> None:
+def format_operand(quad: Quad, field_name: str) -> str:
+    value = getattr(quad, field_name)
+    if value is None or JUMP_FIELDS.get(quad.op_vdir) == field_name:
+        return str(value)
+    return format_address(value)
+
+
+class OperandNames:
+    """
+    Names of quad operands for the listing, the same get_symbol_name() gives.
+
+    Each scope gets a map from address to name the first time it is asked
+    for, seeded with the global and local symbols; temps, constants and
+    immediates are added as they show up. Naming an operand is then a dict
+    lookup instead of a symbol table search.
+    """
+    def __init__(self, symbol_table: SymbolTable, mem_mgr: MemoryManager):
+        self.symbol_table = symbol_table
+        self.mem_mgr = mem_mgr
+        self.scopes: Dict[str, Dict[int, str]] = {}
+
+    def for_scope(self, scope_name: str) -> Dict[int, str]:
+        names = self.scopes.get(scope_name)
+        if names is None:
+            names = {vdir: symbol.name for vdir, symbol in self.symbol_table.get_scope("global").symbols_by_vdir.items()}
+            # Locals shadow globals, as in SymbolTable.get_symbol()
+            names.update((vdir, symbol.name) for vdir, symbol in self.symbol_table.get_scope(scope_name).symbols_by_vdir.items())
+            self.scopes[scope_name] = names
+        return names
+
+    def name(self, vdir: int, scope_name: str) -> str:
+        names = self.for_scope(scope_name)
+        name = names.get(vdir)
+        if name is None:
+            name = names[vdir] = get_symbol_name(self.symbol_table, self.mem_mgr, vdir, scope_name=scope_name)
+        return name
+
+
+def write_listing(output_file: TextIO, name: str, source_hash: str, symbol_table: SymbolTable,
+                  mem_mgr: MemoryManager, quads: QuadBuffer) -> None:
+    """
+    Write the .ovejota listing of a compiled program to output_file.
+
+    The quads are streamed straight from the buffer's columns, one scope run
+    at a time, with operands named through OperandNames, so the listing is a
+    single pass over the quads per section.
+    """
+    write = output_file.write
+    write(f"# BabyDuck Object File: {name}\n")
+    write(f"# Source hash: {source_hash}\n\n")
+
+    write("# Constants Table\n")
+    for addr, const_value in mem_mgr.constants.items():
+        write(f"{format_address(addr)} {repr(const_value)}\n")
+    write("\n")
+
+    write("# Function Directory\n")
+    write(symbol_table.to_string())
+    write("\n")
+
+    labels = quads.labels
+    columns = (quads.op_vdir, quads.vdir1, quads.vdir2, quads.storage_vdir)
+    field_names = ("vdir1", "vdir2", "storage_vdir")
+    # format_operand() of every address seen so far; jump targets are printed as plain numbers
+    raw = {NO_OPERAND: "None"}
+    write("# Quadruples\n")
+    for i, (op_vdir, *operands) in enumerate(zip(*columns)):
+        jump_field = JUMP_FIELDS.get(op_vdir)
+        line = f"<{i}> {op_vdir}"
+        for field_name, value in zip(field_names, operands):
+            text = raw.get(value)
+            if text is None:
+                text = raw[value] = format_address(value)
+            line += f" {value}" if field_name == jump_field and value != NO_OPERAND else f" {text}"
+        label = labels.get(i)
+        if label:
+            line += f" -> {label}"
+        write(line + "\n")
+
+    write("--------\n")
+
+    op_names = {operation.value: str(operation)[11:] for operation in Operations}
+    operand_names = OperandNames(symbol_table, mem_mgr)
+    run_ends = list(quads.scope_starts[1:]) + [len(quads)]
+    for start, end, scope_name in zip(quads.scope_starts, run_ends, quads.scope_names):
+        names = operand_names.for_scope(scope_name)
+        run = zip(range(start, end), *(column[start:end] for column in columns))
+        for i, op_vdir, *operands in run:
+            jump_field = JUMP_FIELDS.get(op_vdir)
+            line = f"<{i}> {op_names[op_vdir]}"
+            # Missing operands and address 0 are left out
+            for field_name, value in zip(field_names, operands):
+                if value == NO_OPERAND or not value:
+                    continue
+                if field_name == jump_field:
+                    line += f" {value}"
+                else:
+                    line += f" {names.get(value) or operand_names.name(value, scope_name)}"
+            label = labels.get(i)
+            if label:
+                line += f" -> {label}"
+            write(line + "\n")
+
 
-    with open('grammar.lark', 'r') as file:
-        grammar = file.read()
+EMIT_KINDS = ("obj", "listing")
 
-    babyParser = Lark(grammar, start='start', parser='lalr', debug=True)
-    baby = babyParser.parse
 
-    babyParser = Lark(grammar, start='start', parser='lalr', debug=True)
-    baby = babyParser.parse
+def parse_emit(value: str) -> Tuple[str, ...]:
+    """Outputs named by an --emit value: a comma-separated list of EMIT_KINDS, or "none"."""
+    kinds = tuple(kind.strip() for kind in value.split(",") if kind.strip())
+    if kinds == ("none",):
+        return ()
+    unknown = [kind for kind in kinds if kind not in EMIT_KINDS]
+    if unknown or not kinds:
+        raise ValueError(f"Unknown --emit value: {value}. Expected a comma-separated list of "
+                         f"{', '.join(EMIT_KINDS)}, or none")
+    return kinds
+
+
+FRONTENDS = ("lark", "standalone", "native")
+
+
+def parse_program(program: str, frontend: str = "lark") -> Program:
+    """
+    Parse BabyDuck source into its Program tree.
+
+    The frontends are imported lazily so the standalone one never loads lark.
+    """
+    if frontend == "native":
+        from BabyNativeParser import parse
+        return parse(program)
+    if frontend == "standalone":
+        from gen_parser import get_standalone_parser
+        return get_standalone_parser().parse(program)
+    if frontend == "lark":
+        # The transformer runs inside the LALR parser, so no lark.Tree is built
+        from BabyTransformer import get_parser
+        return get_parser().parse(program)
+    raise ValueError(f"Unknown frontend: {frontend}. Expected one of {', '.join(FRONTENDS)}")
+
+
+def gen_obj(
+        file_path: str,
+        filename: str,
+        output_path: str = "./output",
+        frontend: str = "lark",
+        use_cache: bool = True,
+        emit: Sequence[str] = EMIT_KINDS,
+        optimize: bool = True,
+        ) -> bool:
+    """
+    Compile file_path/filename into <name>.obj and <name>.ovejota in output_path.
+
+    emit picks which of the two to write (see EMIT_KINDS); with neither the
+    program is only checked. optimize runs the optimizer passes on the quads
+    before temps are allocated. With use_cache, unchanged programs are copied
+    from the compile cache instead of being parsed again. Returns True on a
+    cache hit.
+    """
 
     # tests_dir = "./input"
-    output_dir = "./output"
+    output_dir = output_path
 
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -68,78 +231,60 @@ def gen_obj(file_path: str, filename: str, output_path: str = "./output") -> Non
     input_filename = file_path + os.sep + filename
     output_filename = output_dir + os.sep + f"{base_name}.ovejota"
     output_object_filename = output_dir + os.sep + f"{base_name}.obj"
+    listing_path = output_filename if "listing" in emit else None
+    obj_path = output_object_filename if "obj" in emit else None
+
+    with open(input_filename, 'r', encoding='utf-8') as input_file:
+        program = input_file.read()
+
+    key = CompileCache.cache_key(base_name, program, options=f"optimize={optimize}")
+    if use_cache and CompileCache.lookup(key, obj_path, listing_path):
+        return True
+
+    memory_manager = MemoryManager()
+
+    symbol_table = SymbolTable(memory_manager=memory_manager)
+    ir = parse_program(program, frontend=frontend)
+
+    baby_interpreter = BabyInterpreter(symbol_table, memory_manager=memory_manager)
+    baby_interpreter.generate_quads(ir)
+    if optimize:
+        optimizer.optimize(QuadProgram(baby_interpreter.quads, symbol_table, memory_manager, baby_interpreter.debug_info))
+    TempAllocator(baby_interpreter.quads, symbol_table.scopes).allocate()
+
+    if listing_path is not None:
+        with open(listing_path, 'w', encoding='utf-8') as output_file:
+            write_listing(output_file, base_name, CompileCache.source_hash(program),
+                          symbol_table, memory_manager, baby_interpreter.quads)
+
+    if obj_path is not None or use_cache:
+        obj_data = ObjData(
+            metadata=ObjectFileMetadata(
+                filename=base_name,
+                source_hash=CompileCache.source_hash(program)
+            ),
+            constants=memory_manager.constants,
+            functions=build_function_descriptors(symbol_table, memory_manager),
+            quads=baby_interpreter.quads,
+            debug_info=baby_interpreter.debug_info,
+            debug_symbols=build_debug_symbols(symbol_table)
+        )
+        if obj_path is not None:
+            write_obj(obj_path, obj_data)
 
-    with open(output_filename, 'w', encoding='utf-8') as output_file:
-        with contextlib.redirect_stdout(output_file):
-            with open(input_filename, 'r', encoding='utf-8') as input_file:
-                program = input_file.read()
-                memory_manager = MemoryManager()
-
-                symbol_table = SymbolTable(memory_manager=memory_manager)
-                tree = baby(program)
-
-                baby_transformer = BabyTransformer()
-                ir = baby_transformer.transform(tree)
-
-                baby_interpreter = BabyInterpreter(symbol_table, memory_manager=memory_manager)
-                baby_interpreter.generate_quads(ir)
-
-                output_file.write(f"# BabyDuck Object File: {base_name}\n")
-                output_file.write(f"# Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                
-                output_file.write("# Constants Table\n")
-                for addr, const_value in memory_manager.constants.items():
-                    output_file.write(f"{addr} {repr(const_value)}\n")
-                output_file.write("\n")
-                
-                output_file.write("# Function Directory\n")
-                output_file.write(symbol_table.to_string())
-                output_file.write("\n")
-                
-                output_file.write("# Quadruples\n")
-                for i, quad in enumerate(baby_interpreter.quads):
-                    output_file.write(f"<{i}> {quad.op_vdir} {quad.vdir1} {quad.vdir2} {quad.storage_vdir}")
-                    if quad.label:
-                        output_file.write(f" -> {quad.label}")
-                    output_file.write("\n")
-
-                output_file.write("--------\n")
-
-                for i, quad in enumerate(baby_interpreter.quads):
-                    output_file.write(f"<{i}> {str(Operations(quad.op_vdir))[11:]}")
-                    if quad.vdir1:
-                        if quad.op_vdir == Operations.GOTO.value or quad.op_vdir == Operations.GOSUB.value:
-                            output_file.write(f" {quad.vdir1}")
-                        else:
-                            output_file.write(f" {get_symbol_name(symbol_table, memory_manager, vdir=quad.vdir1, scope_name=quad.scope)}")
-                    if quad.vdir2:
-                        if quad.op_vdir == Operations.GOTOF.value:
-                            output_file.write(f" {quad.vdir2}")
-                        else:
-                            output_file.write(f" {get_symbol_name(symbol_table, memory_manager, vdir=quad.vdir2, scope_name=quad.scope)}")
-
-                    if quad.storage_vdir:
-                        output_file.write(f" {get_symbol_name(symbol_table, memory_manager, vdir=quad.storage_vdir, scope_name=quad.scope)}")
-                    
-                    if quad.label:
-                        output_file.write(f" -> {quad.label}")
-
-                    output_file.write("\n")
-
-                with open(output_object_filename, 'wb') as binary_output:
-                    obj_data = ObjData(
-                        metadata=ObjectFileMetadata(
-                            filename=base_name,
-                            timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        ),
-                        constants=memory_manager.constants,
-                        functions=symbol_table.scopes,
-                        quads=baby_interpreter.quads
-                    )
-                    pickle.dump(obj_data, binary_output)
-
-
-        sys.stdout = sys.__stdout__
+    # A cache entry always holds the object file, so compiles that skip it can still hit later
+    if use_cache:
+        if obj_path is not None:
+            CompileCache.store(key, obj_path, listing_path)
+        else:
+            fd, cached_obj_path = tempfile.mkstemp(suffix=".obj")
+            os.close(fd)
+            try:
+                write_obj(cached_obj_path, obj_data)
+                CompileCache.store(key, cached_obj_path, listing_path)
+            finally:
+                os.remove(cached_obj_path)
+    return False
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+"""
+Build step for the standalone BabyDuck frontend.
+
+Turns grammar.lark and BabyTransformer.py into a single self-contained module,
+baby_standalone.py, that parses source text straight into a Program without
+importing lark. Run `python gen_parser.py` after editing either file.
+"""
+import hashlib
+import importlib
+import os
+import sys
+from typing import Any, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+GRAMMAR_PATH = os.path.join(BASE_DIR, "grammar.lark")
+TRANSFORMER_PATH = os.path.join(BASE_DIR, "BabyTransformer.py")
+STANDALONE_MODULE = "baby_standalone"
+STANDALONE_PATH = os.path.join(BASE_DIR, STANDALONE_MODULE + ".py")
+
+_standalone_parser: Optional[Any] = None
+
+
+def source_digest() -> str:
+    """Hash of the sources the standalone module is generated from."""
+    digest = hashlib.sha256()
+    for path in (GRAMMAR_PATH, TRANSFORMER_PATH):
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def build_standalone_parser(output_path: str = STANDALONE_PATH) -> None:
+    from lark import Lark
+    from lark.tools.standalone import gen_standalone
+
+    with open(GRAMMAR_PATH, "r") as file:
+        grammar = file.read()
+    lark_inst = Lark(grammar, start="start", parser="lalr")
+
+    # The transformer is copied in so the generated module only depends on
+    # the standalone runtime that gen_standalone writes above it
+    with open(TRANSFORMER_PATH, "r") as file:
+        transformer_source = "".join(
+            line for line in file if not line.startswith("from lark import")
+        )
+
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        gen_standalone(lark_inst, out=output_file)
+        output_file.write("\n# ---- BabyTransformer.py ----\n")
+        output_file.write(transformer_source)
+        output_file.write("\n\n")
+        output_file.write(f"GRAMMAR_HASH = {source_digest()!r}\n")
+        output_file.write("\n")
+        output_file.write("def new_parser():\n")
+        output_file.write("    return Lark_StandAlone(transformer=BabyTransformer())\n")
+
+
+def get_standalone_parser() -> Any:
+    """Return the generated parser, checking it matches the current sources."""
+    global _standalone_parser
+    if _standalone_parser is not None:
+        return _standalone_parser
+
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    try:
+        module = importlib.import_module(STANDALONE_MODULE)
+    except ImportError:
+        raise RuntimeError(f"{STANDALONE_MODULE}.py not found, run 'python gen_parser.py' first")
+
+    if module.GRAMMAR_HASH != source_digest():
+        raise RuntimeError(f"{STANDALONE_MODULE}.py is out of date, run 'python gen_parser.py' again")
+
+    _standalone_parser = module.new_parser()
+    return _standalone_parser
+
+
+if __name__ == "__main__":
+    output = sys.argv[1] if len(sys.argv) > 1 else STANDALONE_PATH
+    build_standalone_parser(output)
+    print(f"Standalone parser written to {output}")
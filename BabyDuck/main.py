@@ -1,19 +1,26 @@
 #!/usr/bin/env python3
+import argparse
 import os
 import sys
 from BabyVirtualMachine import BabyVirtualMachine
-from gen_obj import gen_obj
+from gen_obj import gen_obj, FRONTENDS
 from read_obj import read_obj_file
 
-def compile_and_run(file_path: str, filename: str):
+def compile_and_run(file_path: str, filename: str, frontend: str = "lark", use_cache: bool = True, listing: bool = True,
+                    optimize: bool = True):
     """
     Compiles a BabyDuck file and runs it immediately
     
     Args:
         input_file: Path to the .baby source file
+        frontend: Parser frontend used by gen_obj ("lark", "standalone" or "native")
+        use_cache: Reuse the compile cache entry when the source has not changed
+        listing: Also write the .ovejota listing next to the object file
+        optimize: Run the optimizer passes on the quads
     """
 
-    gen_obj(file_path, filename+".baby")
+    emit = ("obj", "listing") if listing else ("obj",)
+    gen_obj(file_path, filename+".baby", frontend=frontend, use_cache=use_cache, emit=emit, optimize=optimize)
     # Setup output paths
     obj_data = read_obj_file("output/" + filename+".obj")
 
@@ -31,14 +38,19 @@ def compile_and_run(file_path: str, filename: str):
         sys.exit(1)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python main.py <file.baby>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Compile and run a BabyDuck program from ./input")
+    parser.add_argument("filename", help="Program name inside ./input, without the .baby extension")
+    parser.add_argument("--frontend", choices=FRONTENDS, default="lark", help="Parser frontend used to compile")
+    parser.add_argument("--no-cache", action="store_true", help="Always recompile instead of using the compile cache")
+    parser.add_argument("--no-listing", action="store_true", help="Skip writing the .ovejota listing")
+    parser.add_argument("--no-optimize", action="store_true", help="Compile without the optimizer passes")
+    args = parser.parse_args()
     
     input_path = "./input"
     # filename = "recursion"
-    filename = sys.argv[1]
+    filename = args.filename
     input_file = os.path.join(input_path, filename)
 
         
-    compile_and_run(input_path, filename)
\ No newline at end of file
+    compile_and_run(input_path, filename, frontend=args.frontend, use_cache=not args.no_cache, listing=not args.no_listing,
+                    optimize=not args.no_optimize)
\ No newline at end of file
@@ -0,0 +1,649 @@
+"""
+Binary object file format for compiled BabyDuck programs.
+
+All integers are little-endian. A file starts with a fixed header and a
+section directory, followed by the sections themselves, each aligned to
+8 bytes:
+
+    header      magic "BDUCKOBJ", u16 version, u16 flags, u32 section count
+    directory   per section: 4-byte tag, u32 offset, u32 size
+
+    META  str filename, str source hash
+    CONS  u32 count, then per constant: u32 address, u8 type code and the
+          value as i64 (int), f64 (float) or str
+    FUNC  u32 count, the function names as a name list, then the entry
+          (i32), param count, local ints, local floats, temp ints and temp
+          floats columns (u32 per function), then u32 total params and the
+          param vdir column of every function in turn
+    CODE  one per function body (up to its ENDFUNC) and per stretch of
+          global code between them: u32 first quad, u32 count, the opcode
+          column (u8 per quad) padded to 4 bytes, then the vdir1, vdir2 and
+          storage_vdir columns (i32 per quad, -1 when the operand is
+          missing). Jump targets and labels use program-wide quad indices.
+    LABL  u32 count, the quad index column (u32 per label), then the labels
+          as a name list
+    SCOP  u32 count of scope runs, the first quad column (u32 per run), then
+          the scope names as a name list
+    DBUG  only with FLAG_DEBUG: u32 count of position runs, the start, line
+          and column columns (i32 per run, -1 for none), then u32 scope
+          count, the scope names as a name list and their symbol count column,
+          then u32 total symbols, their names and types as name lists and the
+          vdir, is_param and param index columns (i32, -1 for none)
+
+A str is a u32 byte length followed by UTF-8. A name list is a single str
+holding the names joined by NUL bytes, so a whole table is decoded at once.
+Symbol values are not stored: the compiler never sets them.
+
+load_obj() maps the file and only reads the directory of CODE sections. A
+section's columns become memoryviews over the mapping the first time the VM
+runs one of its quads, so a large program that calls few of its functions
+never touches the rest. Version 1 files, which kept every quad in a single
+QUAD section, have to be recompiled.
+
+Object files written with pickle by older compilers can be converted with
+`python obj_format.py convert <old.obj> [new.obj]`.
+"""
+import mmap
+import pickle
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from custom_classes.values import ConstantValue, TYPE_INT, TYPE_FLOAT, TYPE_STR
+from custom_classes.memory import AllocCategory, Operations, JUMP_FIELDS, CATEGORY_SHIFT, OFFSET_MASK, make_address, is_immediate
+from custom_classes.classes import QuadBuffer, DebugInfo, FunctionDescriptor, Symbol, NO_OPERAND
+
+MAGIC = b"BDUCKOBJ"
+FORMAT_VERSION = 2
+FLAG_DEBUG = 1
+
+HEADER = struct.Struct("<8sHHI")
+SECTION_ENTRY = struct.Struct("<4sII")
+U32 = struct.Struct("<I")
+I64 = struct.Struct("<q")
+F64 = struct.Struct("<d")
+CODE_HEADER = struct.Struct("<II")
+CONSTANT_ENTRY = struct.Struct("<IB")
+
+ALIGNMENT = 8
+# FunctionDescriptor fields stored as u32 columns in FUNC, after the param counts
+FRAME_SIZE_FIELDS = ("local_ints", "local_floats", "temp_ints", "temp_floats")
+# The quad columns can be used in place only if they match the file's layout
+NATIVE_COLUMNS = sys.byteorder == "little" and array("i").itemsize == 4
+
+
+@dataclass
+class ObjectFileMetadata:
+    filename: str
+    source_hash: str  # Instead of a timestamp, so the same source always gives the same bytes
+
+@dataclass
+class ObjData:
+    metadata: ObjectFileMetadata
+    constants: Dict[int, ConstantValue]
+    functions: Dict[str, FunctionDescriptor]
+    quads: QuadBuffer
+    debug_info: Optional[DebugInfo] = None  # Source positions, never read while the VM runs
+    debug_symbols: Optional[Dict[str, List[Symbol]]] = None  # Symbols of every scope, also debug only
+
+
+class ObjFormatError(ValueError):
+    pass
+
+
+# ---- Writing ----
+
+def _pack_str(out: bytearray, value: str) -> None:
+    data = value.encode("utf-8")
+    out += U32.pack(len(data))
+    out += data
+
+def _pack_names(out: bytearray, names) -> None:
+    _pack_str(out, "\0".join(names))
+
+def _column_bytes(column, typecode: str = None) -> bytes:
+    data = array(typecode or column.typecode, column)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+def _meta_section(obj_data: ObjData) -> bytearray:
+    out = bytearray()
+    _pack_str(out, obj_data.metadata.filename)
+    _pack_str(out, obj_data.metadata.source_hash)
+    return out
+
+def _constants_section(constants: Dict[int, ConstantValue]) -> bytearray:
+    out = bytearray(U32.pack(len(constants)))
+    for address, value in constants.items():
+        if isinstance(value, str):
+            out += CONSTANT_ENTRY.pack(address, TYPE_STR)
+            _pack_str(out, value)
+        elif isinstance(value, float):
+            out += CONSTANT_ENTRY.pack(address, TYPE_FLOAT)
+            out += F64.pack(value)
+        else:
+            out += CONSTANT_ENTRY.pack(address, TYPE_INT)
+            try:
+                out += I64.pack(value)
+            except struct.error:
+                raise ObjFormatError(f"Integer constant {value} does not fit in 64 bits")
+    return out
+
+def _functions_section(functions: Dict[str, FunctionDescriptor]) -> bytearray:
+    out = bytearray(U32.pack(len(functions)))
+    _pack_names(out, functions.keys())
+    out += _column_bytes(array("i", (function.entry for function in functions.values())))
+    out += _column_bytes(array("I", (len(function.param_vdirs) for function in functions.values())))
+    for field_name in FRAME_SIZE_FIELDS:
+        out += _column_bytes(array("I", (getattr(function, field_name) for function in functions.values())))
+    param_vdirs = array("I", (vdir for function in functions.values() for vdir in function.param_vdirs))
+    out += U32.pack(len(param_vdirs))
+    out += _column_bytes(param_vdirs)
+    return out
+
+def code_segments(quads: QuadBuffer, functions: Dict[str, FunctionDescriptor]) -> List[Tuple[int, int]]:
+    """(first, end) quad ranges of the CODE sections: every function body and the global code around them."""
+    opcodes = bytes(quads.op_vdir)
+    endfunc = bytes([Operations.ENDFUNC.value])
+    bounds = {0, len(quads)}
+    for name, function in functions.items():
+        if name == "global":
+            continue
+        end = opcodes.find(endfunc, function.entry)
+        bounds.add(function.entry)
+        bounds.add(len(quads) if end < 0 else end + 1)
+    bounds = sorted(bounds)
+    return [(first, end) for first, end in zip(bounds, bounds[1:]) if first < end]
+
+def _code_section(quads: QuadBuffer, first: int, end: int) -> bytearray:
+    out = bytearray(CODE_HEADER.pack(first, end - first))
+    for (field_name, typecode) in QuadBuffer.COLUMNS:
+        out += _column_bytes(getattr(quads, field_name)[first:end], typecode)
+        # Keeps the i32 columns after the opcodes aligned
+        out += bytes(-len(out) % 4)
+    return out
+
+def _labels_section(quads: QuadBuffer) -> bytearray:
+    out = bytearray(U32.pack(len(quads.labels)))
+    out += _column_bytes(array("I", quads.labels.keys()))
+    _pack_names(out, quads.labels.values())
+    return out
+
+def _scopes_section(quads: QuadBuffer) -> bytearray:
+    out = bytearray(U32.pack(len(quads.scope_starts)))
+    out += _column_bytes(array("I", quads.scope_starts))
+    _pack_names(out, quads.scope_names)
+    return out
+
+def _debug_section(debug_info: Optional[DebugInfo], debug_symbols: Optional[Dict[str, List[Symbol]]]) -> bytearray:
+    runs = debug_info or DebugInfo()
+    out = bytearray(U32.pack(len(runs.starts)))
+    out += _column_bytes(array("i", runs.starts))
+    for column in (runs.lines, runs.columns):
+        out += _column_bytes(array("i", (-1 if value is None else value for value in column)))
+
+    scopes = debug_symbols or {}
+    out += U32.pack(len(scopes))
+    _pack_names(out, scopes.keys())
+    out += _column_bytes(array("I", (len(scope_symbols) for scope_symbols in scopes.values())))
+    symbols = [symbol for scope_symbols in scopes.values() for symbol in scope_symbols]
+    out += U32.pack(len(symbols))
+    _pack_names(out, (symbol.name for symbol in symbols))
+    _pack_names(out, (symbol.data_type for symbol in symbols))
+    out += _column_bytes(array("i", (symbol.vdir for symbol in symbols)))
+    out += _column_bytes(array("i", (symbol.is_param for symbol in symbols)))
+    out += _column_bytes(array("i", (-1 if symbol.param_index is None else symbol.param_index for symbol in symbols)))
+    return out
+
+def dump_obj(obj_data: ObjData) -> bytes:
+    """Serialize obj_data in the binary object format."""
+    sections: List[Tuple[bytes, bytearray]] = [
+        (b"META", _meta_section(obj_data)),
+        (b"CONS", _constants_section(obj_data.constants)),
+        (b"FUNC", _functions_section(obj_data.functions)),
+        (b"LABL", _labels_section(obj_data.quads)),
+        (b"SCOP", _scopes_section(obj_data.quads)),
+    ]
+    sections += [
+        (b"CODE", _code_section(obj_data.quads, first, end))
+        for first, end in code_segments(obj_data.quads, obj_data.functions)
+    ]
+    flags = 0
+    if obj_data.debug_info is not None or obj_data.debug_symbols is not None:
+        flags |= FLAG_DEBUG
+        sections.append((b"DBUG", _debug_section(obj_data.debug_info, obj_data.debug_symbols)))
+
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, flags, len(sections)))
+    directory_at = len(out)
+    out += bytes(SECTION_ENTRY.size * len(sections))
+    for i, (tag, body) in enumerate(sections):
+        out += bytes(-len(out) % ALIGNMENT)
+        SECTION_ENTRY.pack_into(out, directory_at + i * SECTION_ENTRY.size, tag, len(out), len(body))
+        out += body
+    return bytes(out)
+
+def write_obj(path: str, obj_data: ObjData) -> None:
+    with open(path, "wb") as file:
+        file.write(dump_obj(obj_data))
+
+
+# ---- Reading ----
+
+class _Reader:
+    """Sequential reads from one section of the file."""
+    def __init__(self, view: memoryview, offset: int, size: int):
+        self.view = view
+        self.pos = offset
+        self.end = offset + size
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        if self.pos + fmt.size > self.end:
+            raise ObjFormatError("Truncated section")
+        values = fmt.unpack_from(self.view, self.pos)
+        self.pos += fmt.size
+        return values
+
+    def u32(self) -> int:
+        return self.unpack(U32)[0]
+
+    def str(self) -> str:
+        length = self.u32()
+        if self.pos + length > self.end:
+            raise ObjFormatError("Truncated section")
+        value = str(self.view[self.pos:self.pos + length], "utf-8")
+        self.pos += length
+        return value
+
+    def take(self, size: int) -> memoryview:
+        if self.pos + size > self.end:
+            raise ObjFormatError("Truncated section")
+        chunk = self.view[self.pos:self.pos + size]
+        self.pos += size
+        return chunk
+
+    def names(self, count: int) -> List[str]:
+        joined = self.str()
+        names = joined.split("\0") if count else []
+        if len(names) != count:
+            raise ObjFormatError(f"Expected {count} names, found {len(names)}")
+        return names
+
+    def column(self, typecode: str, count: int) -> List[int]:
+        return _column(self.take(4 * count), typecode).tolist()
+
+    def align(self, boundary: int) -> None:
+        self.pos += -self.pos % boundary
+
+def _column(chunk: memoryview, typecode: str):
+    if NATIVE_COLUMNS:
+        return chunk.cast(typecode)
+    data = array(typecode)
+    data.frombytes(chunk)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data
+
+class LazyQuadBuffer(QuadBuffer):
+    """
+    Quads of a mapped object file, read one CODE section at a time.
+
+    segment_at() casts a section's columns over the mapping the first time it
+    is asked for a quad in it. The full op_vdir/vdir1/vdir2/storage_vdir
+    columns are only built, by joining every section, when a tool reads them.
+    """
+    def __init__(self, view: memoryview, segments: List[Tuple[int, int, int, int]], labels: Dict[int, str],
+                 scope_starts: List[int], scope_names: List[str]):
+        # No QuadBuffer.__init__: the column attributes stay unset until __getattr__ builds them
+        self._view = view
+        self._segments = segments  # (first quad, count, columns offset, section end) per section
+        self._segment_firsts = [first for first, _, _, _ in segments]
+        self._loaded: Dict[int, tuple] = {}
+        self._length = sum(count for _, count, _, _ in segments)
+        self.labels = labels
+        self.scope_starts = scope_starts
+        self.scope_names = scope_names
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def loaded_segments(self) -> int:
+        return len(self._loaded)
+
+    def segment_at(self, index: int) -> tuple:
+        position = bisect_right(self._segment_firsts, index) - 1
+        segment = self._loaded.get(position)
+        if segment is None:
+            segment = self._loaded[position] = self._read_segment(position)
+        return segment
+
+    def _read_segment(self, position: int) -> tuple:
+        first, count, offset, end = self._segments[position]
+        reader = _Reader(self._view, offset, end - offset)
+        op_vdir = _column(reader.take(count), "B")
+        reader.align(4)
+        operand_columns = [_column(reader.take(4 * count), "i") for _ in range(3)]
+        return (first, first + count, op_vdir, *operand_columns)
+
+    def __getattr__(self, name: str):
+        # Only called for attributes that aren't set, i.e. columns nobody has read yet
+        typecodes = dict(QuadBuffer.COLUMNS)
+        if name not in typecodes or "_segments" not in self.__dict__:
+            raise AttributeError(name)
+        columns = {field_name: array(typecode) for field_name, typecode in QuadBuffer.COLUMNS}
+        for first, _, _, _ in self._segments:
+            _, _, *segment_columns = self.segment_at(first)
+            for column, part in zip(columns.values(), segment_columns):
+                column.frombytes(part.tobytes())
+        self.__dict__.update(columns)
+        return columns[name]
+
+def _code_directory(view: memoryview, entries: List[Tuple[int, int]]) -> List[Tuple[int, int, int, int]]:
+    """(first quad, count, columns offset, section end) of every code section, checked to cover the program."""
+    segments = []
+    for offset, size in entries:
+        if size < CODE_HEADER.size:
+            raise ObjFormatError("Truncated code section")
+        first, count = CODE_HEADER.unpack_from(view, offset)
+        segments.append((first, count, offset + CODE_HEADER.size, offset + size))
+    segments.sort()
+    expected = 0
+    for first, count, _, _ in segments:
+        if first != expected:
+            raise ObjFormatError(f"Code sections leave a gap or overlap at quad {expected}")
+        expected += count
+    return segments
+
+def _read_constants(reader: _Reader) -> Dict[int, ConstantValue]:
+    constants: Dict[int, ConstantValue] = {}
+    for _ in range(reader.u32()):
+        address, type_code = reader.unpack(CONSTANT_ENTRY)
+        if type_code == TYPE_STR:
+            constants[address] = reader.str()
+        elif type_code == TYPE_FLOAT:
+            constants[address] = reader.unpack(F64)[0]
+        elif type_code == TYPE_INT:
+            constants[address] = reader.unpack(I64)[0]
+        else:
+            raise ObjFormatError(f"Unknown constant type {type_code}")
+    return constants
+
+def _read_functions(reader: _Reader) -> Dict[str, FunctionDescriptor]:
+    count = reader.u32()
+    names = reader.names(count)
+    entries = reader.column("i", count)
+    param_counts = reader.column("I", count)
+    frame_sizes = [reader.column("I", count) for _ in FRAME_SIZE_FIELDS]
+    param_vdirs = reader.column("I", reader.u32())
+    if sum(param_counts) != len(param_vdirs):
+        raise ObjFormatError("Parameter counts don't match the parameter table")
+
+    functions: Dict[str, FunctionDescriptor] = {}
+    position = 0
+    for name, entry, param_count, *sizes in zip(names, entries, param_counts, *frame_sizes):
+        functions[name] = FunctionDescriptor(entry, param_vdirs[position:position + param_count], *sizes)
+        position += param_count
+    return functions
+
+class LazyDebugInfo(DebugInfo):
+    """Position runs of a mapped object file, decoded the first time anything reads them."""
+    def __init__(self, runs: memoryview, count: int):
+        # No DebugInfo.__init__: starts, lines and columns stay unset until __getattr__ decodes them
+        self._runs = runs
+        self._count = count
+
+    def __getattr__(self, name: str):
+        if name not in ("starts", "lines", "columns") or "_runs" not in self.__dict__:
+            raise AttributeError(name)
+        size = 4 * self._count
+        starts, lines, columns = (
+            _column(self._runs[k * size:(k + 1) * size], "i").tolist() for k in range(3)
+        )
+        self.starts = starts
+        self.lines = [None if line < 0 else line for line in lines]
+        self.columns = [None if column < 0 else column for column in columns]
+        return getattr(self, name)
+
+def _read_debug(reader: _Reader) -> Tuple[DebugInfo, Dict[str, List[Symbol]]]:
+    count = reader.u32()
+    # The VM only needs positions to report an error, so they are decoded on demand
+    debug_info = LazyDebugInfo(reader.take(3 * 4 * count), count)
+
+    scope_count = reader.u32()
+    scope_names = reader.names(scope_count)
+    symbol_counts = reader.column("I", scope_count)
+    count = reader.u32()
+    if sum(symbol_counts) != count:
+        raise ObjFormatError("Symbol counts don't match the symbol table")
+    names = reader.names(count)
+    data_types = reader.names(count)
+    vdirs, is_params, param_indices = (reader.column("i", count) for _ in range(3))
+    symbols = [
+        Symbol(name=name, data_type=data_type, vdir=vdir, is_param=bool(is_param),
+               param_index=None if param_index < 0 else param_index)
+        for name, data_type, vdir, is_param, param_index in zip(names, data_types, vdirs, is_params, param_indices)
+    ]
+    debug_symbols: Dict[str, List[Symbol]] = {}
+    position = 0
+    for scope_name, symbol_count in zip(scope_names, symbol_counts):
+        debug_symbols[scope_name] = symbols[position:position + symbol_count]
+        position += symbol_count
+    return debug_info, debug_symbols
+
+def loads_obj(data) -> ObjData:
+    """Parse an object file held in data (bytes, mmap or memoryview)."""
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ObjFormatError("File too short for an object file header")
+    magic, version, flags, section_count = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ObjFormatError("Not a BabyDuck object file")
+    if version != FORMAT_VERSION:
+        raise ObjFormatError(f"Unsupported object file version {version}, expected {FORMAT_VERSION}")
+
+    sections: Dict[bytes, Tuple[int, int]] = {}
+    code_entries: List[Tuple[int, int]] = []
+    if HEADER.size + section_count * SECTION_ENTRY.size > len(view):
+        raise ObjFormatError("Section directory runs past the end of the file")
+    for i in range(section_count):
+        tag, offset, size = SECTION_ENTRY.unpack_from(view, HEADER.size + i * SECTION_ENTRY.size)
+        if offset + size > len(view):
+            raise ObjFormatError(f"Section {tag.decode('ascii', 'replace')} runs past the end of the file")
+        if tag == b"CODE":
+            code_entries.append((offset, size))
+        else:
+            sections[tag] = (offset, size)
+    segments = _code_directory(view, code_entries)
+
+    def section(tag: bytes) -> _Reader:
+        if tag not in sections:
+            raise ObjFormatError(f"Missing section {tag.decode('ascii')}")
+        return _Reader(view, *sections[tag])
+
+    meta = section(b"META")
+    metadata = ObjectFileMetadata(filename=meta.str(), source_hash=meta.str())
+
+    labels_reader = section(b"LABL")
+    label_count = labels_reader.u32()
+    label_indices = labels_reader.column("I", label_count)
+    labels = dict(zip(label_indices, labels_reader.names(label_count)))
+
+    scopes_reader = section(b"SCOP")
+    scope_count = scopes_reader.u32()
+    scope_starts = scopes_reader.column("I", scope_count)
+    scope_names = scopes_reader.names(scope_count)
+
+    obj_data = ObjData(
+        metadata=metadata,
+        constants=_read_constants(section(b"CONS")),
+        functions=_read_functions(section(b"FUNC")),
+        quads=LazyQuadBuffer(view, segments, labels, scope_starts, scope_names),
+    )
+    if flags & FLAG_DEBUG and b"DBUG" in sections:
+        obj_data.debug_info, obj_data.debug_symbols = _read_debug(section(b"DBUG"))
+    return obj_data
+
+def load_obj(path: str) -> ObjData:
+    """
+    Load an object file through a read-only memory map.
+
+    Code sections are read on first use and their columns stay views over
+    the mapping, which lives as long as the returned ObjData references it.
+    """
+    with open(path, "rb") as file:
+        try:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            raise ObjFormatError("File too short for an object file header")
+    return loads_obj(mapping)
+
+def is_legacy_pickle(path: str) -> bool:
+    """Whether path looks like an object file from the pickle-based compilers."""
+    with open(path, "rb") as file:
+        return file.read(1) == b"\x80"
+
+
+# ---- Conversion from pickle object files ----
+
+LEGACY_RANGE_SIZE = 1000  # Addresses were category * 1000 + offset before the tagged encoding
+
+def _legacy_address(address: int, constants: Dict[int, ConstantValue]) -> int:
+    category = AllocCategory(address // LEGACY_RANGE_SIZE)
+    offset = address % LEGACY_RANGE_SIZE
+    if category == AllocCategory.CONSTANT:
+        value = constants[address]
+        type_code = TYPE_STR if isinstance(value, str) else TYPE_FLOAT if isinstance(value, float) else TYPE_INT
+    else:
+        type_code = TYPE_FLOAT if category.is_float else TYPE_INT
+    return make_address(category, type_code, offset)
+
+def _slots_needed(addresses, categories) -> Tuple[int, int]:
+    """Int and float slots needed to hold addresses of the given categories."""
+    sizes = [0, 0]
+    for address in addresses:
+        category = AllocCategory.get_category_from_address(address)
+        if category in categories:
+            sizes[category.is_float] = max(sizes[category.is_float], (address & OFFSET_MASK) + 1)
+    return sizes[0], sizes[1]
+
+def convert_legacy(legacy) -> ObjData:
+    """
+    Build an ObjData from an unpickled legacy object: quads as a list of
+    Quad, functions as Scopes, and addresses in the old category * 1000 +
+    offset numbering are all upgraded.
+    """
+    quads = legacy.quads
+    if not isinstance(quads, QuadBuffer):
+        buffer = QuadBuffer()
+        for quad in quads:
+            buffer.append(quad.op_vdir, quad.vdir1, quad.vdir2, quad.storage_vdir, quad.label, quad.scope)
+        quads = buffer
+
+    constants = dict(legacy.constants)
+    operands = [
+        (field_name, i)
+        for field_name in ("vdir1", "vdir2", "storage_vdir")
+        for i in range(len(quads))
+        if getattr(quads, field_name)[i] != NO_OPERAND and JUMP_FIELDS.get(quads.op_vdir[i]) != field_name
+    ]
+    # Tagged addresses all have category bits set, old ones are below 8000
+    legacy_numbering = any(0 < address < (1 << CATEGORY_SHIFT) for address in constants) or any(
+        0 < getattr(quads, field_name)[i] < (1 << CATEGORY_SHIFT) for field_name, i in operands
+    )
+    remap = (lambda address: _legacy_address(address, legacy.constants)) if legacy_numbering else (lambda address: address)
+
+    if legacy_numbering:
+        for field_name, i in operands:
+            column = getattr(quads, field_name)
+            column[i] = remap(column[i])
+        constants = {remap(address): value for address, value in constants.items()}
+
+    # Pickled Scopes carry no temp counts, so every frame gets room for the widest temp in the program
+    temp_ints, temp_floats = _slots_needed(
+        (getattr(quads, field_name)[i] for field_name, i in operands if not is_immediate(getattr(quads, field_name)[i])),
+        (AllocCategory.TEMP_INT, AllocCategory.TEMP_FLOAT),
+    )
+    variable_categories = (AllocCategory.GLOBAL_INT, AllocCategory.GLOBAL_FLOAT,
+                           AllocCategory.LOCAL_INT, AllocCategory.LOCAL_FLOAT)
+
+    functions: Dict[str, FunctionDescriptor] = {}
+    debug_symbols = getattr(legacy, "debug_symbols", None)
+    for name, function in legacy.functions.items():
+        if isinstance(function, FunctionDescriptor):
+            functions[name] = function
+            continue
+        # A Scope: keep what the VM needs, and its symbols for the debug section
+        local_ints, local_floats = _slots_needed(
+            (remap(symbol.vdir) for symbol in function.symbols.values()), variable_categories
+        )
+        functions[name] = FunctionDescriptor(
+            entry=function.starting_quad,
+            param_vdirs=[remap(param.vdir) for param in function.param_list],
+            local_ints=local_ints,
+            local_floats=local_floats,
+            temp_ints=temp_ints,
+            temp_floats=temp_floats,
+        )
+        if debug_symbols is None:
+            debug_symbols = {}
+        debug_symbols[name] = [
+            Symbol(name=symbol.name, data_type=symbol.data_type, vdir=remap(symbol.vdir),
+                   is_param=symbol.is_param, param_index=symbol.param_index)
+            for symbol in function.symbols.values()
+        ]
+
+    metadata = legacy.metadata
+    source_hash = getattr(metadata, "source_hash", None) or f"timestamp {getattr(metadata, 'timestamp', '')}"
+    return ObjData(
+        metadata=ObjectFileMetadata(filename=metadata.filename, source_hash=source_hash),
+        constants=constants,
+        functions=functions,
+        quads=quads,
+        debug_info=getattr(legacy, "debug_info", None),
+        debug_symbols=debug_symbols,
+    )
+
+class _LegacyRecord:
+    """Stand-in for classes that moved or changed shape since a legacy file was pickled."""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        # Plain classes pickle a dict, slotted ones a (dict, slots dict) pair
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        self.__dict__.update(state or {})
+
+class _LegacyUnpickler(pickle.Unpickler):
+    # ObjData lived in gen_obj, and the AST nodes some files carry are not needed
+    RECORD_MODULES = ("gen_obj", "custom_classes.tree_nodes")
+
+    def find_class(self, module, name):
+        if module in self.RECORD_MODULES:
+            return _LegacyRecord
+        return super().find_class(module, name)
+
+def convert_file(source_path: str, target_path: str) -> None:
+    """Convert a pickle object file. Only run it on files you trust: unpickling runs code."""
+    with open(source_path, "rb") as file:
+        legacy = _LegacyUnpickler(file).load()
+    write_obj(target_path, convert_legacy(legacy))
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != "convert":
+        print("Usage: python obj_format.py convert <old.obj> [new.obj]")
+        sys.exit(1)
+    source_path = sys.argv[2]
+    target_path = sys.argv[3] if len(sys.argv) > 3 else source_path
+    convert_file(source_path, target_path)
+    print(f"Converted {source_path} -> {target_path}")
+
+
+if __name__ == "__main__":
+    main()
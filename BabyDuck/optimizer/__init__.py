@@ -0,0 +1,34 @@
+"""
+Optimization passes over the quads BabyInterpreter generates.
+
+The passes run after codegen and before TempAllocator, on a QuadProgram:
+the quads plus the symbol table, memory manager and debug positions that
+refer to them. A pass rewrites operands in place and drops quads through
+QuadProgram.remove_quads() or move_quads(), which renumber jump targets,
+function entries, labels and debug positions to match. optimizer.cfg splits the
+quads into basic blocks for the passes that work on the control-flow graph,
+and optimizer.dataflow runs liveness and assignment analyses over them.
+"""
+from typing import Callable, Dict, List, Tuple
+
+from optimizer.program import QuadProgram
+from optimizer.constants import fold_constants
+from optimizer.controlflow import simplify_control_flow
+from optimizer.numbering import number_values
+from optimizer.deadcode import propagate_copies, eliminate_dead_code
+from optimizer.loops import hoist_invariants
+
+# (name, pass) in the order they run; each returns the number of quads it removed, or moved
+PASSES: List[Tuple[str, Callable[[QuadProgram], int]]] = [
+    ("constants", fold_constants),
+    ("controlflow", simplify_control_flow),
+    ("numbering", number_values),
+    ("copies", propagate_copies),
+    ("deadcode", eliminate_dead_code),
+    ("loops", hoist_invariants),
+]
+
+
+def optimize(program: QuadProgram) -> Dict[str, int]:
+    """Run every pass over program in place; returns the quads each pass removed, by name."""
+    return {name: optimization_pass(program) for name, optimization_pass in PASSES}
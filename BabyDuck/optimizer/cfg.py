@@ -0,0 +1,138 @@
+"""
+Basic blocks and the control-flow graph of a QuadProgram.
+
+A block is a run of quads that is only entered at its first quad and only
+left after its last one. Blocks start at quad 0, at every jump target and
+function entry, and after every GOTO, GOTOF, ENDFUNC and END. A GOSUB does
+not end a block: control comes back to the next quad, and passes that care
+about the callee treat the call as one instruction that may write globals.
+
+Edges only follow control inside a frame. ENDFUNC and END have no
+successors, and every function entry is a root of the graph besides
+quad 0, whether or not anything calls it.
+
+The graph is a snapshot: once a pass removes or moves quads it has to
+build a new one.
+"""
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Set
+
+from custom_classes.classes import QuadBuffer
+from custom_classes.memory import Operations, JUMP_FIELDS
+from optimizer.program import QuadProgram
+
+GOTO = Operations.GOTO.value
+GOTOF = Operations.GOTOF.value
+ENDFUNC = Operations.ENDFUNC.value
+END = Operations.END.value
+
+# Quads after which control never falls through to the next one
+BLOCK_ENDS = frozenset((GOTO, GOTOF, ENDFUNC, END))
+
+
+@dataclass
+class BasicBlock:
+    index: int
+    start: int
+    # One past the last quad
+    end: int
+    # Name of the function whose frame the block runs in, "global" for main
+    function: str
+    successors: List[int] = field(default_factory=list)
+    predecessors: List[int] = field(default_factory=list)
+
+    @property
+    def last(self) -> int:
+        return self.end - 1
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.start, self.end))
+
+    def __reversed__(self) -> Iterator[int]:
+        return reversed(range(self.start, self.end))
+
+
+def function_entries(program: QuadProgram) -> Dict[int, str]:
+    """First quad of every function, by quad index."""
+    return {
+        scope.starting_quad: name for name, scope in program.symbol_table.scopes.items() if name != "global"
+    }
+
+
+def find_leaders(quads: QuadBuffer, entries) -> List[int]:
+    """Sorted indices of the quads that start a block."""
+    leaders = {0}
+    leaders.update(entries)
+    for i, op_vdir in enumerate(quads.op_vdir):
+        field_name = JUMP_FIELDS.get(op_vdir)
+        if field_name is not None:
+            leaders.add(getattr(quads, field_name)[i])
+        if op_vdir in BLOCK_ENDS:
+            leaders.add(i + 1)
+    return sorted(leader for leader in leaders if 0 <= leader < len(quads))
+
+
+class ControlFlowGraph:
+    def __init__(self, program: QuadProgram):
+        self.program = program
+        quads = program.quads
+        entries = function_entries(program)
+        self.starts = find_leaders(quads, entries)
+        self.blocks: List[BasicBlock] = []
+        self.block_at: Dict[int, int] = {}  # first quad -> block index
+
+        function = "global"
+        ends = self.starts[1:] + [len(quads)]
+        for index, (start, end) in enumerate(zip(self.starts, ends)):
+            # Quads between a function's ENDFUNC and the next entry belong to main
+            function = entries.get(start, function)
+            self.blocks.append(BasicBlock(index, start, end, function))
+            self.block_at[start] = index
+            if quads.op_vdir[end - 1] == ENDFUNC:
+                function = "global"
+
+        self.entries: List[int] = [0] + [self.block_at[start] for start in sorted(entries) if start in self.block_at]
+        for block in self.blocks:
+            for successor in self.successor_quads(block):
+                target = self.block_at[successor]
+                if target not in block.successors:
+                    block.successors.append(target)
+                    self.blocks[target].predecessors.append(block.index)
+
+    def successor_quads(self, block: BasicBlock) -> List[int]:
+        """First quads of the blocks control can go to after block, fall-through first."""
+        quads = self.program.quads
+        op_vdir = quads.op_vdir[block.last]
+        if op_vdir == GOTO:
+            return [quads.vdir1[block.last]]
+        if op_vdir in (ENDFUNC, END) or block.end >= len(quads):
+            return []
+        if op_vdir == GOTOF:
+            return [block.end, quads.vdir2[block.last]]
+        return [block.end]
+
+    def block_of(self, quad_index: int) -> BasicBlock:
+        """Block holding the quad at quad_index."""
+        return self.blocks[bisect_right(self.starts, quad_index) - 1]
+
+    def reachable(self) -> Set[int]:
+        """Indices of the blocks some path from an entry reaches."""
+        seen = set(self.entries)
+        stack = list(self.entries)
+        while stack:
+            for successor in self.blocks[stack.pop()].successors:
+                if successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+        return seen
+
+    def function_blocks(self) -> Dict[str, List[BasicBlock]]:
+        """Blocks of every function in quad order, by function name."""
+        result: Dict[str, List[BasicBlock]] = {}
+        for block in self.blocks:
+            result.setdefault(block.function, []).append(block)
+        return result
@@ -0,0 +1,146 @@
+"""
+Constant folding and propagation.
+
+Within a basic block, an address written from constants holds a known
+value until it is written again. Reads of it are replaced by that value,
+and an operation whose operands are all constant is computed here instead
+of in the VM: its result becomes known, and when it goes to a temp the quad
+is dropped, since codegen only reads a temp inside the block that computed
+it. A GOTOF on a known condition becomes a GOTO or disappears.
+
+Folding mirrors the VM exactly, including the conversion on store: the
+value is computed with the same Python operation, then turned into float()
+or int() by the type of the address it is stored in, which is the type the
+SemanticCube picked for it. An operation the VM would fail on, like a
+division by zero, is left alone so it still fails at runtime.
+"""
+import math
+import operator
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from custom_classes.classes import NO_OPERAND
+from custom_classes.memory import Operations, CATEGORY_SHIFT
+from optimizer.cfg import ControlFlowGraph
+from optimizer.program import QuadProgram, GLOBAL_CODES, TEMP_CODES
+
+Number = Union[int, float]
+
+# Same operations as the VM's handlers
+BINARY_OPERATIONS: Dict[int, Callable[[Number, Number], Number]] = {
+    Operations.PLUS.value: operator.add,
+    Operations.MINUS.value: operator.sub,
+    Operations.MULT.value: operator.mul,
+    Operations.DIV.value: operator.truediv,
+    Operations.LESS_THAN.value: lambda a, b: 1 if a < b else 0,
+    Operations.GREATER_THAN.value: lambda a, b: 1 if a > b else 0,
+    Operations.NOT_EQUAL.value: lambda a, b: 1 if a != b else 0,
+}
+
+# Operand columns each operation reads values from
+READ_FIELDS: Dict[int, tuple] = {op_vdir: ("vdir1", "vdir2") for op_vdir in BINARY_OPERATIONS}
+READ_FIELDS.update({
+    Operations.ASSIGN.value: ("vdir2",),
+    Operations.PRINT.value: ("vdir1",),
+    Operations.PARAM.value: ("vdir1",),
+    Operations.GOTOF.value: ("vdir1",),
+})
+
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def representable(value: Number) -> bool:
+    """Whether value comes back unchanged from a constant in an object file."""
+    if isinstance(value, int):
+        return INT64_MIN <= value <= INT64_MAX
+    # The constant pool keys floats by value, so -0.0 would turn into 0.0
+    return math.isfinite(value) and not (value == 0 and math.copysign(1.0, value) < 0)
+
+
+def store(value: Number, stores_float: bool) -> Optional[Number]:
+    """value as the VM would store it, or None if that fails or can't be a constant."""
+    try:
+        stored = float(value) if stores_float else int(value)
+    except (OverflowError, ValueError):
+        return None
+    return stored if representable(stored) else None
+
+
+def fold(op_vdir: int, left: Number, right: Number, stores_float: bool) -> Optional[Number]:
+    """Result of a binary operation on constants as stored by the VM, or None to leave it to the VM."""
+    if isinstance(left, str) or isinstance(right, str):
+        return None
+    if op_vdir == Operations.DIV.value and right == 0:
+        return None
+    try:
+        result = BINARY_OPERATIONS[op_vdir](left, right)
+    except ArithmeticError:
+        return None
+    return store(result, stores_float)
+
+
+def fold_constants(program: QuadProgram) -> int:
+    """Fold and propagate constants in place; returns the number of quads removed."""
+    quads = program.quads
+    op_column, vdir1, vdir2, storage = quads.op_vdir, quads.vdir1, quads.vdir2, quads.storage_vdir
+    columns = {"vdir1": vdir1, "vdir2": vdir2}
+    assign, gotof, goto, gosub = (Operations.ASSIGN.value, Operations.GOTOF.value,
+                                  Operations.GOTO.value, Operations.GOSUB.value)
+    known: Dict[int, Number] = {}
+    removed: List[int] = []
+    # 1 and 1.0 are equal dict keys but different constants
+    addresses: Dict[Tuple[type, Number], int] = {}
+
+    def constant_address(value: Number) -> int:
+        key = (type(value), value)
+        address = addresses.get(key)
+        if address is None:
+            address = addresses[key] = program.constant_address(value)
+        return address
+
+    for block in ControlFlowGraph(program).blocks:
+        known.clear()
+        for i in block:
+            op_vdir = op_column[i]
+            for field_name in READ_FIELDS.get(op_vdir, ()):
+                column = columns[field_name]
+                if column[i] in known:
+                    column[i] = constant_address(known[column[i]])
+
+            if op_vdir in BINARY_OPERATIONS:
+                target = storage[i]
+                value = None
+                if program.is_constant(vdir1[i]) and program.is_constant(vdir2[i]):
+                    value = fold(op_vdir, program.constant_value(vdir1[i]), program.constant_value(vdir2[i]),
+                                 program.stores_float(target))
+                if value is None:
+                    known.pop(target, None)
+                elif target >> CATEGORY_SHIFT in TEMP_CODES:
+                    known[target] = value
+                    removed.append(i)
+                else:
+                    # Only temps are dropped; a variable may be read in another block
+                    op_column[i], vdir1[i], vdir2[i] = assign, target, constant_address(value)
+                    storage[i] = NO_OPERAND
+                    known[target] = value
+            elif op_vdir == assign:
+                target = vdir1[i]
+                value = None
+                if program.is_constant(vdir2[i]):
+                    value = store(program.constant_value(vdir2[i]), program.stores_float(target))
+                if value is None:
+                    known.pop(target, None)
+                else:
+                    known[target] = value
+                    if target >> CATEGORY_SHIFT in TEMP_CODES:
+                        removed.append(i)
+            elif op_vdir == gotof and program.is_constant(vdir1[i]):
+                if program.constant_value(vdir1[i]) == 0:
+                    op_column[i], vdir1[i], vdir2[i] = goto, vdir2[i], NO_OPERAND
+                else:
+                    removed.append(i)
+            elif op_vdir == gosub:
+                # The callee runs in its own frame but may assign any global
+                for address in [address for address in known if address >> CATEGORY_SHIFT in GLOBAL_CODES]:
+                    del known[address]
+
+    return program.remove_quads(removed)
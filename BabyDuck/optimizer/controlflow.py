@@ -0,0 +1,65 @@
+"""
+Jump threading, unreachable-code removal and block merging.
+
+gen_quads_condition() and gen_quads_cycle() jump to wherever the statement
+after them starts, which is often another jump: the end of an if/else at
+the end of a loop body jumps to the loop's closing GOTO. Threading points
+such jumps straight at their final target. Blocks no path reaches, like
+the branch of an if the constant pass decided, are removed. So is a jump
+to the quad right after it, after which the two blocks it separated run
+as one.
+
+Blocks are only merged where they already sit next to each other. Moving
+code is left out: a function's quads have to stay between its entry and
+its ENDFUNC, which TempAllocator and the object file's code sections rely
+on, so ENDFUNC and END are also kept when they can't be reached.
+"""
+from typing import List
+
+from custom_classes.classes import QuadBuffer
+from optimizer.cfg import ControlFlowGraph, GOTO, GOTOF, ENDFUNC, END
+from optimizer.program import QuadProgram
+
+JUMP_TARGET_FIELDS = {GOTO: "vdir1", GOTOF: "vdir2"}
+
+
+def thread_jumps(quads: QuadBuffer) -> int:
+    """Point every GOTO and GOTOF that lands on a GOTO at where that one goes; returns the jumps changed."""
+    op_column, goto_targets = quads.op_vdir, quads.vdir1
+    changed = 0
+    for i, op_vdir in enumerate(op_column):
+        field_name = JUMP_TARGET_FIELDS.get(op_vdir)
+        if field_name is None:
+            continue
+        column = getattr(quads, field_name)
+        target = column[i]
+        seen = {i}
+        # A chain that loops back on itself is an endless loop, so it keeps its first jump
+        while op_column[target] == GOTO and target not in seen:
+            seen.add(target)
+            target = goto_targets[target]
+        if target != column[i] and target not in seen:
+            column[i] = target
+            changed += 1
+    return changed
+
+
+def simplify_control_flow(program: QuadProgram) -> int:
+    """Thread jumps and drop unreachable code and jumps to the next quad; returns the quads removed."""
+    op_column = program.quads.op_vdir
+    total = 0
+    while True:
+        thread_jumps(program.quads)
+        cfg = ControlFlowGraph(program)
+        reachable = cfg.reachable()
+        removed: List[int] = []
+        for block in cfg.blocks:
+            if block.index not in reachable:
+                removed.extend(i for i in block if op_column[i] not in (ENDFUNC, END))
+            elif len(block.successors) == 1 and op_column[block.last] in JUMP_TARGET_FIELDS \
+                    and cfg.blocks[block.successors[0]].start == block.end:
+                removed.append(block.last)
+        if not removed:
+            return total
+        total += program.remove_quads(removed)
+        op_column = program.quads.op_vdir
@@ -0,0 +1,201 @@
+"""
+Dataflow analyses over the control-flow graph.
+
+Liveness tells, at every quad, which addresses hold a value some later
+quad may still read. It runs backwards over a function's blocks:
+- An address is live before a quad that reads it. It is dead before a
+  quad that writes it without reading it.
+- A GOSUB reads every global, since the callee may.
+- After an ENDFUNC the caller may read any global, while the function's
+  locals and temps go away with its frame.
+- Nothing is live after END.
+
+Assignment is the forward counterpart: the variables every path to a quad
+has written. Parameters count as written at their function's entry. The
+VM fails on reading a variable that was never written, so a pass that
+drops or moves a quad asks may_fail() first, to keep every runtime error
+where it was.
+
+Both are snapshots of the quads they were built on, like the graph.
+"""
+from typing import Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from custom_classes.memory import Operations, CATEGORY_SHIFT, address_type_code
+from custom_classes.values import TYPE_FLOAT
+from optimizer.cfg import BasicBlock, ControlFlowGraph, ENDFUNC
+from optimizer.constants import BINARY_OPERATIONS, READ_FIELDS
+from optimizer.program import QuadProgram, CONSTANT_CODES, GLOBAL_CODES, TEMP_CODES
+
+ASSIGN = Operations.ASSIGN.value
+DIV = Operations.DIV.value
+GOSUB = Operations.GOSUB.value
+# Python compares ints and floats exactly, without converting either
+COMPARISONS = frozenset(op.value for op in (Operations.LESS_THAN, Operations.GREATER_THAN, Operations.NOT_EQUAL))
+
+
+def reads(program: QuadProgram, i: int) -> List[int]:
+    """Addresses of the variables and temps the quad at i reads."""
+    quads = program.quads
+    return [
+        address for address in (getattr(quads, field_name)[i] for field_name in READ_FIELDS.get(quads.op_vdir[i], ()))
+        if address >> CATEGORY_SHIFT not in CONSTANT_CODES
+    ]
+
+
+def written(program: QuadProgram, i: int) -> Optional[int]:
+    """Address the quad at i writes, if any."""
+    quads = program.quads
+    op_vdir = quads.op_vdir[i]
+    if op_vdir == ASSIGN:
+        return quads.vdir1[i]
+    if op_vdir in BINARY_OPERATIONS:
+        return quads.storage_vdir[i]
+    return None
+
+
+def global_addresses(program: QuadProgram) -> FrozenSet[int]:
+    return frozenset(
+        vdir for vdir in program.symbol_table.get_scope("global").symbols_by_vdir
+        if vdir >> CATEGORY_SHIFT in GLOBAL_CODES
+    )
+
+
+class Liveness:
+    def __init__(self, cfg: ControlFlowGraph):
+        self.cfg = cfg
+        self.program = cfg.program
+        self.globals = global_addresses(self.program)
+        blocks = cfg.blocks
+        self.live_in: List[Set[int]] = [set() for _ in blocks]
+        self.live_out: List[Set[int]] = [set() for _ in blocks]
+
+        # What each block reads before writing it, and what it writes
+        uses: List[Set[int]] = []
+        kills: List[Set[int]] = []
+        for block in blocks:
+            live: Set[int] = set()
+            killed: Set[int] = set()
+            for i in reversed(block):
+                target = self.transfer(live, i)
+                if target is not None:
+                    killed.add(target)
+            uses.append(live)
+            kills.append(killed)
+
+        exits = {block.index for block in blocks if self.program.quads.op_vdir[block.last] == ENDFUNC}
+        pending = list(range(len(blocks)))
+        queued = set(pending)
+        while pending:
+            index = pending.pop()
+            queued.discard(index)
+            block = blocks[index]
+            live_out = set(self.globals) if index in exits else set()
+            for successor in block.successors:
+                live_out |= self.live_in[successor]
+            self.live_out[index] = live_out
+            live_in = uses[index] | (live_out - kills[index])
+            if live_in != self.live_in[index]:
+                self.live_in[index] = live_in
+                for predecessor in block.predecessors:
+                    if predecessor not in queued:
+                        queued.add(predecessor)
+                        pending.append(predecessor)
+
+    def transfer(self, live: Set[int], i: int) -> Optional[int]:
+        """Turn live, the addresses live after the quad at i, into those live before it; returns what i writes."""
+        target = written(self.program, i)
+        if target is not None:
+            live.discard(target)
+        live.update(reads(self.program, i))
+        if self.program.quads.op_vdir[i] == GOSUB:
+            live |= self.globals
+        return target
+
+    def backwards(self, block: BasicBlock) -> Iterator[Tuple[int, Set[int]]]:
+        """
+        (quad index, addresses live after it) for the quads of block, last
+        one first. The set is updated in place as the walk goes on.
+        """
+        live = set(self.live_out[block.index])
+        for i in reversed(block):
+            yield i, live
+            self.transfer(live, i)
+
+
+class Assignment:
+    def __init__(self, cfg: ControlFlowGraph):
+        self.cfg = cfg
+        program = cfg.program
+        blocks = cfg.blocks
+        entry_writes: Dict[int, Set[int]] = {0: set()}
+        for name, scope in program.symbol_table.scopes.items():
+            if name != "global" and scope.starting_quad in cfg.block_at:
+                entry_writes[cfg.block_at[scope.starting_quad]] = {symbol.vdir for symbol in scope.param_list}
+
+        writes = [{written(program, i) for i in block} - {None} for block in blocks]
+        # None stands for every address, until some path reaches the block
+        self.assigned_in: List[Optional[Set[int]]] = [None] * len(blocks)
+        pending = sorted(entry_writes, reverse=True)
+        for index, params in entry_writes.items():
+            self.assigned_in[index] = set(params)
+        while pending:
+            index = pending.pop()
+            assigned_out = self.assigned_in[index] | writes[index]
+            for successor in blocks[index].successors:
+                current = self.assigned_in[successor]
+                merged = set(assigned_out) if current is None else current & assigned_out
+                if merged != current:
+                    self.assigned_in[successor] = merged
+                    pending.append(successor)
+
+    def forwards(self, block: BasicBlock) -> Iterator[Tuple[int, Optional[Set[int]]]]:
+        """
+        (quad index, variables assigned before it) for the quads of block,
+        first one first. The set is updated in place; it is None in blocks
+        no path reaches.
+        """
+        assigned = self.assigned_in[block.index]
+        assigned = None if assigned is None else set(assigned)
+        for i in block:
+            yield i, assigned
+            target = written(self.cfg.program, i)
+            if assigned is not None and target is not None:
+                assigned.add(target)
+
+
+def may_fail(program: QuadProgram, i: int, assigned: Optional[Set[int]]) -> bool:
+    """
+    Whether running the quad at i could raise, given the variables
+    assigned before it.
+
+    Reading an unassigned variable fails, and so can any division. Python
+    ints are unbounded, so turning one into a float can overflow: that
+    covers int/float arithmetic and ASSIGN between the two types, where
+    float to int also fails on inf and nan. Constants are known to fit,
+    and comparisons never convert.
+    """
+    quads = program.quads
+    op_vdir = quads.op_vdir[i]
+    operands = [getattr(quads, field_name)[i] for field_name in READ_FIELDS.get(op_vdir, ())]
+    if assigned is not None:
+        for address in operands:
+            code = address >> CATEGORY_SHIFT
+            if code not in CONSTANT_CODES and code not in TEMP_CODES and address not in assigned:
+                return True
+    if op_vdir == DIV:
+        return True
+    target = written(program, i)
+    if target is None:
+        return False
+    variable_types = {
+        address_type_code(address) for address in operands if address >> CATEGORY_SHIFT not in CONSTANT_CODES
+    }
+    if op_vdir == ASSIGN:
+        return bool(variable_types) and variable_types != {address_type_code(target)}
+    if op_vdir in COMPARISONS:
+        return False
+    if op_vdir in BINARY_OPERATIONS:
+        types = {address_type_code(address) for address in operands}
+        # An int operand next to a float is converted, unless it is a small constant
+        return len(types) > 1 and any(code != TYPE_FLOAT for code in variable_types)
+    return False
@@ -0,0 +1,88 @@
+"""
+Copy propagation and dead code elimination, driven by liveness.
+
+gen_quads_assign() computes the expression into a temp and then copies
+it into the variable with an ASSIGN. When nothing else reads the temp,
+propagate_copies() has the expression write the variable instead and
+drops the ASSIGN. That only holds if the variable isn't read or written
+between the two quads, and no call in between could read it as a global.
+Both must also have the same type, since an ASSIGN converts between int
+and float where the operation would not.
+
+eliminate_dead_code() removes every write to an address that is dead
+after it: stores a later store overwrites first, globals nothing reads
+before END, and temps whose only reader went away. A quad that may_fail()
+stays, so a program that failed at runtime still fails the same way.
+"""
+from typing import Dict, List, Set
+
+from custom_classes.memory import CATEGORY_SHIFT, address_type_code
+from optimizer.cfg import ControlFlowGraph
+from optimizer.constants import BINARY_OPERATIONS
+from optimizer.dataflow import Assignment, Liveness, reads, written, may_fail, ASSIGN, GOSUB
+from optimizer.program import QuadProgram, GLOBAL_CODES, TEMP_CODES
+
+
+def propagate_copies(program: QuadProgram) -> int:
+    """Write expressions straight into the variable they are assigned to; returns the ASSIGNs removed."""
+    quads = program.quads
+    op_column, vdir1, vdir2, storage = quads.op_vdir, quads.vdir1, quads.vdir2, quads.storage_vdir
+    cfg = ControlFlowGraph(program)
+    liveness = Liveness(cfg)
+    removed: List[int] = []
+    for block in cfg.blocks:
+        # ASSIGNs whose temp nothing reads afterwards
+        last_reads = {i for i, live in liveness.backwards(block) if op_column[i] == ASSIGN and vdir2[i] not in live}
+
+        computed_at: Dict[int, int] = {}  # temp -> operation that wrote it, while it is unread
+        touched_at: Dict[int, int] = {}  # address -> last quad that read or wrote it
+        last_call = -1
+        for i in block:
+            op_vdir = op_column[i]
+            source = vdir2[i]
+            if op_vdir == ASSIGN and i in last_reads and source in computed_at:
+                target = vdir1[i]
+                j = computed_at[source]
+                if address_type_code(target) == address_type_code(source) and touched_at.get(target, -1) <= j \
+                        and not (target >> CATEGORY_SHIFT in GLOBAL_CODES and last_call > j):
+                    storage[j] = target
+                    removed.append(i)
+                    del computed_at[source]
+                    touched_at[target] = i
+                    continue
+
+            for address in reads(program, i):
+                computed_at.pop(address, None)
+                touched_at[address] = i
+            target = written(program, i)
+            if target is not None:
+                computed_at.pop(target, None)
+                touched_at[target] = i
+                if op_vdir in BINARY_OPERATIONS and target >> CATEGORY_SHIFT in TEMP_CODES:
+                    computed_at[target] = i
+            if op_vdir == GOSUB:
+                last_call = i
+    return program.remove_quads(removed)
+
+
+def eliminate_dead_code(program: QuadProgram) -> int:
+    """Remove writes nothing reads, until there are none left; returns the number of quads removed."""
+    total = 0
+    while True:
+        cfg = ControlFlowGraph(program)
+        liveness = Liveness(cfg)
+        assignment = Assignment(cfg)
+        removed: Set[int] = set()
+        for block in cfg.blocks:
+            safe = {i for i, assigned in assignment.forwards(block) if not may_fail(program, i, assigned)}
+            live = set(liveness.live_out[block.index])
+            for i in reversed(block):
+                target = written(program, i)
+                if target is not None and target not in live and i in safe:
+                    # Its operands aren't read by it any more, so they don't become live
+                    removed.add(i)
+                    continue
+                liveness.transfer(live, i)
+        if not removed:
+            return total
+        total += program.remove_quads(removed)
@@ -0,0 +1,144 @@
+"""
+Loop-invariant code motion.
+
+gen_quads_cycle() lays a while out as its condition, a GOTOF out, the body
+and a GOTO back to the condition, so everything in the condition and body
+runs again on every iteration. A loop here is a natural loop of the
+control-flow graph: a header block, and every block that gets back to it
+without passing through it again. The header has to be the only way in.
+
+An operation whose operands no quad in the loop writes computes the same
+value on every iteration; so does one reading only such results. It is
+moved to a preheader: QuadProgram.move_quads() puts it right before the
+header, where code entering the loop falls through or jumps, while the
+jumps back from the loop still go to the header itself. That is only done
+when its result has no other writer in the loop and nothing reads the
+address's previous value: not inside the loop before the operation, and
+not after the loop, which may run zero times. A call in the loop may read
+and write any global, so globals stay put in loops with a GOSUB.
+
+A moved operation runs even if the loop never does, so it must not fail.
+may_fail() rules out divisions, conversions that can overflow and reads
+of variables that are not assigned before the loop.
+
+Inner loops are done first. What they move out lands in the enclosing
+loop, and goes further out on the next round if it is invariant there too.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+from custom_classes.memory import CATEGORY_SHIFT
+from optimizer.cfg import ControlFlowGraph
+from optimizer.constants import BINARY_OPERATIONS
+from optimizer.dataflow import Assignment, Liveness, reads, written, may_fail, ASSIGN, GOSUB
+from optimizer.program import QuadProgram, GLOBAL_CODES
+
+
+@dataclass
+class Loop:
+    header: int  # block index
+    blocks: Set[int]  # block indices, header included
+    back_edges: List[int] = field(default_factory=list)  # quads that jump back to the header
+
+
+def find_loops(cfg: ControlFlowGraph) -> List[Loop]:
+    """Natural loops of the graph with a single way in, smallest first."""
+    loops: Dict[int, Loop] = {}
+    for block in cfg.blocks:
+        for successor in block.successors:
+            header = cfg.blocks[successor]
+            # Falling through only goes forward, so going back is always a jump
+            if header.start > block.start:
+                continue
+            loop = loops.setdefault(header.index, Loop(header.index, {header.index}))
+            loop.back_edges.append(block.last)
+            stack = [block.index]
+            while stack:
+                index = stack.pop()
+                if index not in loop.blocks:
+                    loop.blocks.add(index)
+                    stack.extend(cfg.blocks[index].predecessors)
+
+    result = []
+    for loop in loops.values():
+        header = cfg.blocks[loop.header]
+        # Every way into the loop goes through the header, so it dominates the rest,
+        # and what falls through into the header comes from outside, through the preheader
+        if all(set(cfg.blocks[index].predecessors) <= loop.blocks for index in loop.blocks if index != loop.header) \
+                and not (header.index > 0 and header.index - 1 in loop.blocks):
+            result.append(loop)
+    result.sort(key=lambda loop: len(loop.blocks))
+    return result
+
+
+def invariant_quads(program: QuadProgram, cfg: ControlFlowGraph, loop: Loop,
+                    liveness: Liveness, assignment: Assignment) -> List[int]:
+    """Quads of loop that can run once before it instead, in quad order."""
+    assigned = assignment.assigned_in[loop.header]
+    if assigned is None:
+        return []
+    assigned = set(assigned)
+    op_column = program.quads.op_vdir
+    indices = sorted(i for index in loop.blocks for i in cfg.blocks[index])
+    has_call = any(op_column[i] == GOSUB for i in indices)
+    writers: Dict[int, List[int]] = {}
+    for i in indices:
+        target = written(program, i)
+        if target is not None:
+            writers.setdefault(target, []).append(i)
+
+    # Addresses whose earlier value someone may read: before the loop runs its first quad, or after it
+    exits = {successor for index in loop.blocks for successor in cfg.blocks[index].successors} - loop.blocks
+    needed = set(liveness.live_in[loop.header])
+    for index in exits:
+        needed |= liveness.live_in[index]
+
+    def moves_with_call(address: int) -> bool:
+        return has_call and address >> CATEGORY_SHIFT in GLOBAL_CODES
+
+    hoisted: List[int] = []
+    moved: Set[int] = set()
+    changed = True
+    while changed:
+        changed = False
+        for i in indices:
+            if i in moved or not (op_column[i] in BINARY_OPERATIONS or op_column[i] == ASSIGN):
+                continue
+            target = written(program, i)
+            if len(writers[target]) > 1 or target in needed or moves_with_call(target):
+                continue
+            if any(moves_with_call(address) or any(j not in moved for j in writers.get(address, ()))
+                   for address in reads(program, i)):
+                continue
+            if may_fail(program, i, assigned):
+                continue
+            hoisted.append(i)
+            moved.add(i)
+            assigned.add(target)
+            changed = True
+    # A quad only reads operations moved before it, so quad order keeps them computed first
+    return sorted(hoisted)
+
+
+def hoist_invariants(program: QuadProgram) -> int:
+    """Move loop-invariant operations out of while loops; returns the number of quads moved."""
+    total = 0
+    while True:
+        cfg = ControlFlowGraph(program)
+        liveness = Liveness(cfg)
+        assignment = Assignment(cfg)
+        moves: Dict[int, List[int]] = {}
+        looping: List[int] = []
+        taken: Set[int] = set()
+        for loop in find_loops(cfg):
+            # An enclosing loop waits for the next round, when its inner loops are done
+            if loop.blocks & taken:
+                continue
+            hoisted = invariant_quads(program, cfg, loop, liveness, assignment)
+            if hoisted:
+                moves[cfg.blocks[loop.header].start] = hoisted
+                looping.extend(loop.back_edges)
+                taken |= loop.blocks
+        if not moves:
+            return total
+        total += program.move_quads(moves, looping)
@@ -0,0 +1,133 @@
+"""
+Local value numbering: common subexpression elimination inside a block.
+
+Every value a block computes gets a number. Two operations on the same
+numbered operands compute the same value, so the second one can read the
+first one's result instead, as long as some address still holds it. An
+address keeps its number until it is written again. A GOSUB renumbers
+every global, since the callee may assign any of them; the caller's
+locals and temps live in its own frame and survive the call.
+
+Only quads that write a temp are removed. Later reads of that temp then
+go to an address holding the same value. In rare cases that address is
+overwritten before such a read, e.g. by call arguments, whose temps come
+from the callee's counter and can reuse a caller temp's address. The
+block is then numbered again with that quad kept.
+
+ASSIGN between addresses of the same type copies the value number. An
+ASSIGN that converts between int and float is numbered like an
+operation, so repeated conversions of one value are shared too.
+"""
+import itertools
+from typing import Dict, List, Optional, Set, Tuple
+
+from custom_classes.memory import Operations, CATEGORY_SHIFT, address_type_code
+from optimizer.cfg import BasicBlock, ControlFlowGraph
+from optimizer.constants import BINARY_OPERATIONS, READ_FIELDS
+from optimizer.program import QuadProgram, GLOBAL_CODES, TEMP_CODES
+
+# a op b == b op a, for ints and floats alike
+COMMUTATIVE = frozenset(op.value for op in (Operations.PLUS, Operations.MULT, Operations.NOT_EQUAL))
+
+ASSIGN = Operations.ASSIGN.value
+GOSUB = Operations.GOSUB.value
+
+
+class _Conflict(Exception):
+    def __init__(self, quad_index: int):
+        self.quad_index = quad_index
+
+
+def number_block(program: QuadProgram, block: BasicBlock,
+                 keep: Set[int]) -> Tuple[List[Tuple[str, int, int]], List[int]]:
+    """
+    Value-number the quads of block without changing them.
+
+    Returns the operand rewrites as (field name, quad index, new address)
+    and the quads to remove. Quads in keep are never removed. Raises
+    _Conflict with a removed quad whose result would be lost.
+    """
+    quads = program.quads
+    op_column, storage = quads.op_vdir, quads.storage_vdir
+    columns = {"vdir1": quads.vdir1, "vdir2": quads.vdir2}
+    numbers: Dict[int, int] = {}  # address -> number of the value it holds
+    holders: Dict[int, int] = {}  # number -> an address that held it
+    expressions: Dict[tuple, int] = {}  # (op, operand numbers, stores float) -> number
+    # Removed temps that are still to be read: address -> (number, quad that computed it)
+    pending: Dict[int, Tuple[int, int]] = {}
+    rewrites: List[Tuple[str, int, int]] = []
+    removed: List[int] = []
+    new_number = itertools.count(1).__next__
+
+    def number_of(address: int) -> int:
+        number = numbers.get(address)
+        if number is None:
+            number = numbers[address] = new_number()
+            holders.setdefault(number, address)
+        return number
+
+    def holder_of(number: int) -> Optional[int]:
+        address = holders.get(number)
+        return address if address is not None and numbers.get(address) == number else None
+
+    def write(address: int, number: int) -> None:
+        pending.pop(address, None)
+        numbers[address] = number
+        if holder_of(number) is None:
+            holders[number] = address
+
+    def read(field_name: str, i: int) -> int:
+        address = columns[field_name][i]
+        if address not in pending:
+            return number_of(address)
+        number, computed_at = pending[address]
+        holder = holder_of(number)
+        if holder is None:
+            raise _Conflict(computed_at)
+        rewrites.append((field_name, i, holder))
+        return number
+
+    for i in block:
+        op_vdir = op_column[i]
+        operands = [read(field_name, i) for field_name in READ_FIELDS.get(op_vdir, ())]
+
+        if op_vdir in BINARY_OPERATIONS or op_vdir == ASSIGN:
+            target = columns["vdir1"][i] if op_vdir == ASSIGN else storage[i]
+            if op_vdir == ASSIGN and address_type_code(columns["vdir2"][i]) == address_type_code(target):
+                write(target, operands[0])
+                continue
+            if op_vdir in COMMUTATIVE:
+                operands.sort()
+            key = (op_vdir, *operands, address_type_code(target))
+            number = expressions.get(key)
+            if number is not None and holder_of(number) is not None \
+                    and target >> CATEGORY_SHIFT in TEMP_CODES and i not in keep:
+                removed.append(i)
+                numbers.pop(target, None)
+                pending[target] = (number, i)
+                continue
+            if number is None:
+                number = expressions[key] = new_number()
+            write(target, number)
+        elif op_vdir == GOSUB:
+            for address in [address for address in numbers if address >> CATEGORY_SHIFT in GLOBAL_CODES]:
+                del numbers[address]
+    return rewrites, removed
+
+
+def number_values(program: QuadProgram) -> int:
+    """Remove recomputations of values a block already has; returns the number of quads removed."""
+    quads = program.quads
+    removed: List[int] = []
+    for block in ControlFlowGraph(program).blocks:
+        keep: Set[int] = set()
+        while True:
+            try:
+                rewrites, block_removed = number_block(program, block, keep)
+                break
+            except _Conflict as conflict:
+                keep.add(conflict.quad_index)
+        for field_name, i, address in rewrites:
+            getattr(quads, field_name)[i] = address
+        removed.extend(block_removed)
+    return program.remove_quads(removed)
@@ -0,0 +1,174 @@
+"""
+The quads of one compiled program, together with everything that points
+into them, so a pass can drop or move quads without leaving a stale index
+behind.
+"""
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from MemoryManager import MemoryManager
+from SymbolTable import SymbolTable
+from custom_classes.classes import QuadBuffer, DebugInfo
+from custom_classes.memory import (
+    AllocCategory, JUMP_FIELDS, CATEGORY_SHIFT, IMMEDIATE_CODE, address_type_code, decode_immediate,
+)
+from custom_classes.values import TYPE_FLOAT
+
+CONSTANT_CODES = frozenset((AllocCategory.CONSTANT.value, IMMEDIATE_CODE))
+GLOBAL_CODES = frozenset((AllocCategory.GLOBAL_INT.value, AllocCategory.GLOBAL_FLOAT.value))
+TEMP_CODES = frozenset((AllocCategory.TEMP_INT.value, AllocCategory.TEMP_FLOAT.value))
+
+
+@dataclass
+class QuadProgram:
+    quads: QuadBuffer
+    symbol_table: SymbolTable
+    memory_manager: MemoryManager
+    debug_info: Optional[DebugInfo] = None
+
+    def is_constant(self, address: int) -> bool:
+        return address >> CATEGORY_SHIFT in CONSTANT_CODES
+
+    def constant_value(self, address: int) -> Union[int, float, str]:
+        if address >> CATEGORY_SHIFT == IMMEDIATE_CODE:
+            return decode_immediate(address)
+        return self.memory_manager.constants[address]
+
+    def constant_address(self, value: Union[int, float]) -> int:
+        """Address of value in the constant pool or as an immediate, allocating it if needed."""
+        return self.memory_manager.allocate(AllocCategory.CONSTANT, local_name="global", const_value=value)
+
+    @staticmethod
+    def stores_float(address: int) -> bool:
+        """Whether the VM converts values stored at address to float."""
+        return address_type_code(address) == TYPE_FLOAT
+
+    def remove_quads(self, removed: Iterable[int]) -> int:
+        """
+        Drop the quads at the given indices and renumber the rest.
+
+        A jump, function entry, label or debug run that pointed at a removed
+        quad moves to the first quad after it that is kept, which is where
+        control would have fallen through to. Returns the number removed.
+        """
+        removed = set(removed)
+        if not removed:
+            return 0
+        quads = self.quads
+        count = len(quads)
+        # new_index[i] is the number of kept quads before i
+        new_index: List[int] = []
+        kept: List[int] = []
+        for i in range(count):
+            new_index.append(len(kept))
+            if i not in removed:
+                kept.append(i)
+        new_index.append(len(kept))
+
+        for field_name, typecode in QuadBuffer.COLUMNS:
+            column = getattr(quads, field_name)
+            setattr(quads, field_name, array(typecode, [column[i] for i in kept]))
+        for i, op_vdir in enumerate(quads.op_vdir):
+            field_name = JUMP_FIELDS.get(op_vdir)
+            if field_name is not None:
+                column = getattr(quads, field_name)
+                if 0 <= column[i] <= count:
+                    column[i] = new_index[column[i]]
+
+        quads.labels = {new_index[i]: label for i, label in quads.labels.items() if i not in removed}
+
+        ends = quads.scope_starts[1:] + [count]
+        scope_starts: List[int] = []
+        scope_names: List[str] = []
+        for start, end, name in zip(quads.scope_starts, ends, quads.scope_names):
+            if new_index[start] == new_index[end]:
+                continue
+            if not scope_names or scope_names[-1] != name:
+                scope_starts.append(new_index[start])
+                scope_names.append(name)
+        quads.scope_starts, quads.scope_names = scope_starts, scope_names
+
+        for scope in self.symbol_table.scopes.values():
+            scope.starting_quad = new_index[scope.starting_quad]
+
+        if self.debug_info is not None:
+            old = self.debug_info
+            debug_info = DebugInfo()
+            for start, line, column in zip(old.starts, old.lines, old.columns):
+                debug_info.mark(new_index[min(start, count)], line, column)
+            old.starts, old.lines, old.columns = debug_info.starts, debug_info.lines, debug_info.columns
+        return len(removed)
+
+    def move_quads(self, moves: Dict[int, List[int]], looping: Iterable[int] = ()) -> int:
+        """
+        Move the quads listed in moves[position], in that order, to just
+        before the quad at position, and renumber the rest.
+
+        Falling through into position, a call to a function starting there
+        and any jump to it run the moved quads first, except jumps from the
+        quads in looping, which still go to the quad that was at position.
+        A jump to a moved quad goes to whatever followed it. Moved quads keep
+        their scope and source position. Returns the number moved.
+        """
+        moved = {i for sources in moves.values() for i in sources}
+        if not moved:
+            return 0
+        looping = set(looping)
+        quads = self.quads
+        count = len(quads)
+        scopes = [quads.scope_at(i) for i in range(count)]
+        positions = self._debug_positions(count)
+
+        # entry[i]: where control arriving at old quad i now goes; after[i]: the same past the quads moved there
+        order: List[int] = []
+        entry: List[int] = []
+        after: List[int] = []
+        for i in range(count + 1):
+            entry.append(len(order))
+            order.extend(moves.get(i, ()))
+            after.append(len(order))
+            if i < count and i not in moved:
+                order.append(i)
+
+        old_op = quads.op_vdir
+        for field_name, typecode in QuadBuffer.COLUMNS:
+            column = getattr(quads, field_name)
+            setattr(quads, field_name, array(typecode, [column[i] for i in order]))
+        for new, old in enumerate(order):
+            field_name = JUMP_FIELDS.get(old_op[old])
+            if field_name is not None:
+                column = getattr(quads, field_name)
+                target = column[new]
+                if 0 <= target <= count:
+                    column[new] = after[target] if old in looping else entry[target]
+
+        new_position = {old: new for new, old in enumerate(order)}
+        quads.labels = {new_position[i]: label for i, label in quads.labels.items()}
+
+        quads.scope_starts, quads.scope_names = [], []
+        for new, old in enumerate(order):
+            if not quads.scope_names or quads.scope_names[-1] != scopes[old]:
+                quads.scope_starts.append(new)
+                quads.scope_names.append(scopes[old])
+
+        for scope in self.symbol_table.scopes.values():
+            scope.starting_quad = entry[scope.starting_quad]
+
+        if self.debug_info is not None:
+            debug_info = DebugInfo()
+            for new, old in enumerate(order):
+                debug_info.mark(new, *positions[old])
+            old_info = self.debug_info
+            old_info.starts, old_info.lines, old_info.columns = debug_info.starts, debug_info.lines, debug_info.columns
+        return len(moved)
+
+    def _debug_positions(self, count: int) -> List[Tuple[Optional[int], Optional[int]]]:
+        """(line, column) of every quad, None for both where unknown."""
+        positions: List[Tuple[Optional[int], Optional[int]]] = [(None, None)] * count
+        if self.debug_info is not None:
+            info = self.debug_info
+            ends = info.starts[1:] + [count]
+            for start, end, line, column in zip(info.starts, ends, info.lines, info.columns):
+                positions[start:end] = [(line, column)] * max(0, min(end, count) - start)
+        return positions
@@ -1,59 +1,79 @@
-import pickle
 import sys
-from gen_obj import ObjData
+from gen_obj import format_operand
+from obj_format import ObjData, ObjFormatError, load_obj, is_legacy_pickle
+from custom_classes.memory import format_address
 
 def read_obj_file(obj_path: str) -> ObjData:
     try:
-        with open(obj_path, 'rb') as file:
-            obj_data = pickle.load(file)
-            return obj_data
+        return load_obj(obj_path)
     except FileNotFoundError:
         print(f"Error: Object file '{obj_path}' not found")
         sys.exit(1)
-    except pickle.UnpicklingError:
-        print(f"Error: '{obj_path}' is not a valid BabyDuck object file")
+    except ObjFormatError:
+        if is_legacy_pickle(obj_path):
+            print(f"Error: '{obj_path}' is an old pickled object file, "
+                  f"run 'python obj_format.py convert {obj_path}' to upgrade it")
+        else:
+            print(f"Error: '{obj_path}' is not a valid BabyDuck object file")
         sys.exit(1)
 
 def display_obj_info(obj_data: ObjData):
     print("===== BabyDuck Object File =====")
     print(f"Program: {obj_data.metadata.filename}")
-    print(f"Compiled: {obj_data.metadata.timestamp}")
+    # Object files from before the compile cache carry a timestamp instead
+    source_hash = getattr(obj_data.metadata, "source_hash", None)
+    if source_hash is not None:
+        print(f"Source hash: {source_hash}")
+    else:
+        print(f"Compiled: {obj_data.metadata.timestamp}")
     print()
     
     # Display constants
     print("===== Constants Table =====")
     for addr, value in obj_data.constants.items():
         value_str = repr(value)
-        print(f"[{addr}] = {value_str}")
+        print(f"[{format_address(addr)}] = {value_str}")
     print()
     
     # Display functions/scopes
     print("===== Function Directory =====")
-    for name, scope in obj_data.functions.items():
+    debug_symbols = getattr(obj_data, "debug_symbols", None) or {}
+    for name, function in obj_data.functions.items():
         if name == "global":
-            print(f"Global Scope: {len(scope.symbols)} symbols")
+            print(f"Global Scope: {function.local_ints + function.local_floats} variables")
         else:
             print(f"Function: {name}")
-            print(f"  Parameters: {len(scope.param_list)}")
-            print(f"  Local Variables: {len(scope.symbols) - len(scope.param_list)}")
+            print(f"  Entry: {function.entry}")
+            print(f"  Parameters: {len(function.param_vdirs)}")
+            print(f"  Local Variables: {function.local_ints + function.local_floats - len(function.param_vdirs)}")
+        print(f"  Frame: {function.local_ints} int / {function.local_floats} float locals, "
+              f"{function.temp_ints} int / {function.temp_floats} float temps")
+        for symbol in debug_symbols.get(name, []):
+            kind = "param" if symbol.is_param else "var"
+            print(f"  {kind} {symbol.name}: {symbol.data_type} @ {format_address(symbol.vdir)}")
     print()
     
     # Display quads
     print("===== Quadruples =====")
+    debug_info = getattr(obj_data, "debug_info", None)
     for i, quad in enumerate(obj_data.quads):
         quad_str = f"{i}: {quad.op_vdir}"
         
         if quad.vdir1 is not None:
-            quad_str += f" {quad.vdir1}"
+            quad_str += f" {format_operand(quad, 'vdir1')}"
             
         if quad.vdir2 is not None:
-            quad_str += f" {quad.vdir2}"
+            quad_str += f" {format_operand(quad, 'vdir2')}"
             
         if quad.storage_vdir is not None:
-            quad_str += f" -> {quad.storage_vdir}"
+            quad_str += f" -> {format_operand(quad, 'storage_vdir')}"
             
         if quad.label is not None:
             quad_str += f" [{quad.label}]"
+
+        position = debug_info.lookup(i) if debug_info is not None else None
+        if position is not None:
+            quad_str += f"  ; line {position[0]}:{position[1]}"
             
         print(quad_str)
 